@@ -0,0 +1,43 @@
+"""add hot lookup indexes
+
+Revision ID: 7c3e51d2a9f4
+Revises: 0a187be0f534
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7c3e51d2a9f4'
+down_revision: Union[str, Sequence[str], None] = '0a187be0f534'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Before the unique index can be built, keep only one participant row per
+    # (room_id, user_id); earlier versions could insert duplicates on reconnect.
+    op.execute(sa.text(
+        "DELETE FROM room_participants WHERE id NOT IN ("
+        "SELECT MIN(id) FROM room_participants GROUP BY room_id, user_id)"
+    ))
+    # A unique index rather than ALTER TABLE ... ADD CONSTRAINT: SQLite does not
+    # support the latter, and the index also serves the (room_id, user_id) lookup.
+    op.create_index('uq_room_participants_room_id_user_id', 'room_participants',
+                    ['room_id', 'user_id'], unique=True)
+    op.create_index('ix_room_participants_room_id_connected', 'room_participants',
+                    ['room_id', 'connected'], unique=False)
+    op.create_index('ix_messages_room_id_timestamp', 'messages',
+                    ['room_id', 'timestamp'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_messages_room_id_timestamp', table_name='messages')
+    op.drop_index('ix_room_participants_room_id_connected', table_name='room_participants')
+    op.drop_index('uq_room_participants_room_id_user_id', table_name='room_participants')
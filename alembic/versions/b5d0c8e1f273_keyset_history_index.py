@@ -0,0 +1,34 @@
+"""keyset history index
+
+Revision ID: b5d0c8e1f273
+Revises: 7c3e51d2a9f4
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b5d0c8e1f273'
+down_revision: Union[str, Sequence[str], None] = '7c3e51d2a9f4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # History pages are keyed on (timestamp, id); include id so the tie-breaker
+    # is resolved from the index as well.
+    op.create_index('ix_messages_room_id_timestamp_id', 'messages',
+                    ['room_id', 'timestamp', 'id'], unique=False)
+    op.drop_index('ix_messages_room_id_timestamp', table_name='messages')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.create_index('ix_messages_room_id_timestamp', 'messages',
+                    ['room_id', 'timestamp'], unique=False)
+    op.drop_index('ix_messages_room_id_timestamp_id', table_name='messages')
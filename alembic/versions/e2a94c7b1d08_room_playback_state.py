@@ -0,0 +1,35 @@
+"""room playback state
+
+Revision ID: e2a94c7b1d08
+Revises: b5d0c8e1f273
+Create Date: 2026-10-18 16:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e2a94c7b1d08'
+down_revision: Union[str, Sequence[str], None] = 'b5d0c8e1f273'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('rooms', sa.Column('playback_state', sa.String(), nullable=True))
+    op.add_column('rooms', sa.Column('playback_position', sa.Float(), nullable=True))
+    op.add_column('rooms', sa.Column('playback_rate', sa.Float(), nullable=True))
+    op.add_column('rooms', sa.Column('playback_updated_at', sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('rooms') as batch_op:
+        batch_op.drop_column('playback_updated_at')
+        batch_op.drop_column('playback_rate')
+        batch_op.drop_column('playback_position')
+        batch_op.drop_column('playback_state')
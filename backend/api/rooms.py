@@ -1,26 +1,49 @@
 # backend/api/rooms.py
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
 
+from backend.config import CHAT_HISTORY_PAGE_SIZE, CHAT_HISTORY_MAX_PAGE_SIZE
 from backend.db import crud
-from backend.db.session import get_db
+from backend.db.session import get_async_db
+from backend.services.chat import chat_payload
 
 router = APIRouter(prefix="/api/rooms")
 
 
 @router.post("/create")
-def create_room(db: Session = Depends(get_db)):
+async def create_room(db: AsyncSession = Depends(get_async_db)):
     """Create a new room and persist it to the database."""
 
-    room = crud.create_room(db)
+    room = await crud.create_room(db)
     return {"room_id": room.id, "room_url": f"/?room={room.id}"}
 
 
 @router.get("/{room_id}")
-def get_room(room_id: str, db: Session = Depends(get_db)):
+async def get_room(room_id: str, db: AsyncSession = Depends(get_async_db)):
     """Retrieve room information by its identifier."""
 
-    room = crud.get_room(db, room_id)
+    room = await crud.get_room(db, room_id)
     if not room:
         raise HTTPException(status_code=404, detail="Room not found")
     return {"room_id": room.id}
+
+
+@router.get("/{room_id}/messages")
+async def get_messages(
+    room_id: str,
+    before: str | None = None,
+    limit: int = Query(CHAT_HISTORY_PAGE_SIZE, ge=1, le=CHAT_HISTORY_MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """Return a page of chat history older than the ``before`` cursor."""
+
+    try:
+        cursor = crud.decode_cursor(before) if before else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    messages, next_cursor = await crud.get_messages(db, room_id, before=cursor, limit=limit)
+    return {
+        "messages": [chat_payload(m.user_id, m.username, m.text, m.timestamp) for m in messages],
+        "next_cursor": next_cursor,
+    }
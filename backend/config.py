@@ -1,55 +1,117 @@
 import logging
-import logging.config
 import os
 
+from backend.logging_setup import configure_logging
+
 # Абсолютный путь до logs/cinemate.log
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 LOG_DIR = os.path.join(BASE_DIR, "logs")
 os.makedirs(LOG_DIR, exist_ok=True)
 SQLALCHEMY_DATABASE_URL = "sqlite:///./cinemate.db"
+# Та же база через асинхронный драйвер (aiosqlite локально, asyncpg для PostgreSQL)
+ASYNC_SQLALCHEMY_DATABASE_URL = os.getenv(
+    "ASYNC_DATABASE_URL",
+    SQLALCHEMY_DATABASE_URL.replace("sqlite://", "sqlite+aiosqlite://", 1),
+)
+# Сколько секунд писатель SQLite ждёт освобождения блокировки
+SQLITE_BUSY_TIMEOUT = float(os.getenv("SQLITE_BUSY_TIMEOUT", "15"))
 TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
 LIVEKIT_API_KEY = os.getenv("LIVEKIT_API_KEY")
 LIVEKIT_API_SECRET = os.getenv("LIVEKIT_API_SECRET")
 LIVEKIT_URL = os.getenv("LIVEKIT_URL")
 USE_LIVEKIT = os.getenv("USE_LIVEKIT", "false").lower() == "true"
+# Сборщик метрик LiveKit: опрос раз в LIVEKIT_METRICS_INTERVAL сек.; пока данные не меняются или
+# сервер недоступен, интервал растёт до LIVEKIT_METRICS_MAX_INTERVAL
+LIVEKIT_METRICS_URL = os.getenv("LIVEKIT_METRICS_URL", "http://livekit:7880/metrics")
+LIVEKIT_METRICS_INTERVAL = float(os.getenv("LIVEKIT_METRICS_INTERVAL", "5"))
+LIVEKIT_METRICS_MAX_INTERVAL = float(os.getenv("LIVEKIT_METRICS_MAX_INTERVAL", "60"))
+LIVEKIT_METRICS_TIMEOUT = float(os.getenv("LIVEKIT_METRICS_TIMEOUT", "5"))
+# Токены LiveKit живут LIVEKIT_TOKEN_TTL сек. и выдаются повторно, пока до истечения больше
+# LIVEKIT_TOKEN_REFRESH_MARGIN сек.; в кэше не больше LIVEKIT_TOKEN_CACHE_SIZE токенов
+LIVEKIT_TOKEN_TTL = int(os.getenv("LIVEKIT_TOKEN_TTL", "3600"))
+LIVEKIT_TOKEN_REFRESH_MARGIN = int(os.getenv("LIVEKIT_TOKEN_REFRESH_MARGIN", "300"))
+LIVEKIT_TOKEN_CACHE_SIZE = int(os.getenv("LIVEKIT_TOKEN_CACHE_SIZE", "50000"))
+# Наибольшее число участников в одном запросе /livekit/tokens
+LIVEKIT_TOKEN_BATCH_MAX = int(os.getenv("LIVEKIT_TOKEN_BATCH_MAX", "5000"))
+# QoS комнат: пороги задержки (мс) и потерь (%) для уровней fair и poor, по которым подбираются
+# частота heartbeat'а синхронизации и допуск рассинхрона до seek
+QOS_RTT_FAIR_MS = float(os.getenv("QOS_RTT_FAIR_MS", "150"))
+QOS_RTT_POOR_MS = float(os.getenv("QOS_RTT_POOR_MS", "400"))
+QOS_LOSS_FAIR = float(os.getenv("QOS_LOSS_FAIR", "2"))
+QOS_LOSS_POOR = float(os.getenv("QOS_LOSS_POOR", "8"))
+# Комнаты больше QOS_P2P_MAX_PEERS участников начинают с LiveKit; выбранный транспорт держится,
+# пока в комнате есть участники, и не меньше QOS_DECISION_HOLD сек.
+QOS_P2P_MAX_PEERS = int(os.getenv("QOS_P2P_MAX_PEERS", "4"))
+QOS_DECISION_HOLD = float(os.getenv("QOS_DECISION_HOLD", "60"))
+# Сколько комнат помнит QoS и сколько последних решений хранится на комнату
+QOS_MAX_ROOMS = int(os.getenv("QOS_MAX_ROOMS", "10000"))
+QOS_DECISION_LOG = int(os.getenv("QOS_DECISION_LOG", "20"))
+# Максимальное время (сек.) на отправку одного кадра в сокет, после которого клиент считается зависшим
+WS_SEND_TIMEOUT = float(os.getenv("WS_SEND_TIMEOUT", "2.0"))
+# Размер исходящей очереди каждого соединения и политики при её переполнении (по порядку)
+WS_OUTBOUND_QUEUE_SIZE = int(os.getenv("WS_OUTBOUND_QUEUE_SIZE", "256"))
+WS_OUTBOUND_POLICY = os.getenv("WS_OUTBOUND_POLICY", "coalesce_seek,drop_oldest_chat,disconnect")
+# Окно (сек.) схлопывания play/pause/seek одной комнаты: дальше уходит только последнее событие
+WS_SYNC_COALESCE_WINDOW = float(os.getenv("WS_SYNC_COALESCE_WINDOW", "0.1"))
+# Окно (сек.) сбора trickle-ICE кандидатов одному адресату в один кадр voice-candidates (0 — без пачек)
+WS_SIGNAL_BATCH_WINDOW = float(os.getenv("WS_SIGNAL_BATCH_WINDOW", "0.02"))
+# Лимиты входящих кадров на пользователя: сообщений в секунду и допустимый всплеск (0 — без лимита)
+WS_CHAT_RATE = float(os.getenv("WS_CHAT_RATE", "5"))
+WS_CHAT_BURST = float(os.getenv("WS_CHAT_BURST", "10"))
+WS_SYNC_RATE = float(os.getenv("WS_SYNC_RATE", "20"))
+WS_SYNC_BURST = float(os.getenv("WS_SYNC_BURST", "40"))
+# permessage-deflate: сжимаются кадры от WS_COMPRESSION_MIN_SIZE байт, типы из WS_COMPRESSION_TYPES —
+# всегда, из WS_COMPRESSION_SKIP_TYPES — никогда
+WS_COMPRESSION = os.getenv("WS_COMPRESSION", "true").lower() == "true"
+WS_COMPRESSION_MIN_SIZE = int(os.getenv("WS_COMPRESSION_MIN_SIZE", "64"))
+WS_COMPRESSION_TYPES = os.getenv("WS_COMPRESSION_TYPES", "history,users_update")
+WS_COMPRESSION_SKIP_TYPES = os.getenv("WS_COMPRESSION_SKIP_TYPES", "")
+# Уровень zlib (1–9) и размер окна (9–15 бит): выше — лучше сжатие, но больше CPU и памяти на соединение
+WS_COMPRESSION_LEVEL = int(os.getenv("WS_COMPRESSION_LEVEL", "6"))
+WS_COMPRESSION_WINDOW_BITS = int(os.getenv("WS_COMPRESSION_WINDOW_BITS", "12"))
+# Keepalive: сервер шлёт ping раз в WS_PING_INTERVAL сек. и рвёт соединение без pong за WS_PING_TIMEOUT (0 — выкл.)
+WS_PING_INTERVAL = float(os.getenv("WS_PING_INTERVAL", "20"))
+WS_PING_TIMEOUT = float(os.getenv("WS_PING_TIMEOUT", "20"))
+# Соединение без входящих кадров дольше WS_IDLE_TIMEOUT сек. закрывается (0 — без лимита);
+# уборщик проверяет соединения и участников раз в WS_REAPER_INTERVAL сек.
+WS_IDLE_TIMEOUT = float(os.getenv("WS_IDLE_TIMEOUT", "120"))
+WS_REAPER_INTERVAL = float(os.getenv("WS_REAPER_INTERVAL", "30"))
+# Возобновление сессии: место участника держится WS_RESUME_GRACE сек. после обрыва (0 — выкл.),
+# пропущенное досылается из последних WS_REPLAY_BUFFER_SIZE событий комнаты
+WS_RESUME_GRACE = float(os.getenv("WS_RESUME_GRACE", "30"))
+WS_REPLAY_BUFFER_SIZE = int(os.getenv("WS_REPLAY_BUFFER_SIZE", "256"))
+# Транспорт комнатных событий между узлами: memory (один процесс) или redis (несколько воркеров/нод)
+WS_BROKER = os.getenv("WS_BROKER", "memory")
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+REDIS_CHANNEL_PREFIX = os.getenv("REDIS_CHANNEL_PREFIX", "cinemate")
+# Шардированный pub/sub (SPUBLISH/SSUBSCRIBE) для Redis Cluster
+REDIS_SHARDED_PUBSUB = os.getenv("REDIS_SHARDED_PUBSUB", "false").lower() == "true"
+# Шардирование комнат по процессам (python -m backend.supervisor): воркер SHARD_INDEX из SHARD_COUNT
+# обслуживает свою часть кольца консистентного хэширования (SHARD_VNODES точек на воркер) и,
+# если SHARD_BASE_PORT не 0, слушает 127.0.0.1:SHARD_BASE_PORT+SHARD_INDEX для проверок и метрик
+SHARD_COUNT = int(os.getenv("SHARD_COUNT", "1"))
+SHARD_INDEX = int(os.getenv("SHARD_INDEX", "0"))
+SHARD_VNODES = int(os.getenv("SHARD_VNODES", "64"))
+SHARD_BASE_PORT = int(os.getenv("SHARD_BASE_PORT", "8100"))
+# Сообщения чата пишутся в БД пачками: до CHAT_BATCH_SIZE штук или раз в CHAT_FLUSH_INTERVAL сек.
+CHAT_BATCH_SIZE = int(os.getenv("CHAT_BATCH_SIZE", "100"))
+CHAT_FLUSH_INTERVAL = float(os.getenv("CHAT_FLUSH_INTERVAL", "0.05"))
+CHAT_QUEUE_SIZE = int(os.getenv("CHAT_QUEUE_SIZE", "10000"))
+# Неудавшуюся запись пачки повторяем CHAT_PERSIST_RETRIES раз, начиная с паузы CHAT_RETRY_DELAY сек. (удваивается)
+CHAT_PERSIST_RETRIES = int(os.getenv("CHAT_PERSIST_RETRIES", "5"))
+CHAT_RETRY_DELAY = float(os.getenv("CHAT_RETRY_DELAY", "0.1"))
+# Размер страницы истории чата: при входе в комнату и по умолчанию в API (и верхний предел для API)
+CHAT_HISTORY_PAGE_SIZE = int(os.getenv("CHAT_HISTORY_PAGE_SIZE", "50"))
+CHAT_HISTORY_MAX_PAGE_SIZE = int(os.getenv("CHAT_HISTORY_MAX_PAGE_SIZE", "200"))
+# Метрики Prometheus отдаются на /metrics приложения и, если порт не 0, ещё и на отдельном порту
+METRICS_PORT = int(os.getenv("METRICS_PORT", "8001"))
+# Как часто (сек.) замерять задержку event loop; 0 — не замерять
+EVENT_LOOP_LAG_INTERVAL = float(os.getenv("EVENT_LOOP_LAG_INTERVAL", "0.5"))
 
-LOG_FILE = os.path.join(LOG_DIR, "cinemate.log")
-
-LOGGING_CONFIG = {
-    "version": 1,
-    "disable_existing_loggers": False,  # обязательно, чтобы не сбивать логгер FastAPI
-    "formatters": {
-        "default": {
-            "format": "[%(asctime)s] %(levelname)s - %(message)s",
-            "datefmt": "%Y-%m-%d %H:%M:%S",
-        },
-    },
-    "handlers": {
-        "console": {
-            "class": "logging.StreamHandler",
-            "formatter": "default",
-            "level": "INFO",
-        },
-        "file": {
-            "class": "logging.FileHandler",
-            "formatter": "default",
-            "filename": LOG_FILE,
-            "encoding": "utf-8",
-            "level": "INFO",
-        },
-    },
-    "root": {
-        "handlers": ["console", "file"],
-        "level": "INFO",
-    },
-    "loggers": {
-        "cinemate": {
-            "handlers": ["console", "file"],
-            "level": "INFO",
-            "propagate": False,
-        },
-    },
-}
+# Логирование настраивается из log_config.yaml; записи уходят в очередь и пишутся фоновым потоком
+LOG_CONFIG = os.getenv("LOG_CONFIG", os.path.join(BASE_DIR, "log_config.yaml"))
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
 
-logging.config.dictConfig(LOGGING_CONFIG)
+# RotatingFileHandler не рассчитан на несколько процессов: у каждого воркера свой файл лога
+configure_logging(LOG_CONFIG, LOG_QUEUE_SIZE, f".worker{SHARD_INDEX}" if SHARD_COUNT > 1 else "")
 logger = logging.getLogger("cinemate")
@@ -1,11 +1,16 @@
-"""CRUD operations for Room model."""
+"""CRUD operations for Room and Message models."""
 
-from sqlalchemy.orm import Session
+import base64
+import binascii
+from datetime import datetime
+
+from sqlalchemy import and_, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from . import models
 
 
-def create_room(db: Session) -> models.Room:
+async def create_room(db: AsyncSession) -> models.Room:
     """Create a new room in the database.
 
     A fresh :class:`Room` instance is added to the session and committed.  The
@@ -20,12 +25,11 @@ def create_room(db: Session) -> models.Room:
 
     room = models.Room()
     db.add(room)
-    db.commit()
-    db.refresh(room)
+    await db.commit()
     return room
 
 
-def get_room(db: Session, room_id: str) -> models.Room | None:
+async def get_room(db: AsyncSession, room_id: str) -> models.Room | None:
     """Retrieve a room by its identifier.
 
     Args:
@@ -36,5 +40,66 @@ def get_room(db: Session, room_id: str) -> models.Room | None:
         The :class:`Room` instance if found, otherwise ``None``.
     """
 
-    return db.query(models.Room).filter(models.Room.id == room_id).first()
+    return await db.get(models.Room, room_id)
+
+
+def encode_cursor(timestamp: datetime, message_id: str) -> str:
+    """Build an opaque pagination cursor pointing at the given message."""
+
+    raw = f"{timestamp.isoformat()}|{message_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, str]:
+    """Decode a cursor produced by :func:`encode_cursor`.
+
+    Raises:
+        ValueError: If the cursor is malformed.
+    """
+
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        timestamp, message_id = raw.split("|", 1)
+        return datetime.fromisoformat(timestamp), message_id
+    except (binascii.Error, UnicodeDecodeError, ValueError) as e:
+        raise ValueError(f"Invalid cursor: {cursor!r}") from e
+
+
+async def get_messages(
+    db: AsyncSession,
+    room_id: str,
+    before: tuple[datetime, str] | None = None,
+    limit: int = 50,
+) -> tuple[list[models.Message], str | None]:
+    """Return a page of a room's chat history.
+
+    Keyset pagination over ``(timestamp, id)``: the page holds the ``limit``
+    messages immediately older than ``before`` (the newest ones if ``before``
+    is ``None``), so its cost does not grow with the depth of the history.
+
+    Args:
+        db: Active database session.
+        room_id: Identifier of the room.
+        before: Decoded cursor; only messages strictly older are returned.
+        limit: Maximum number of messages in the page.
+
+    Returns:
+        The messages in chronological order and the cursor of the next (older)
+        page, or ``None`` if there is nothing older.
+    """
+
+    query = select(models.Message).filter_by(room_id=room_id)
+    if before is not None:
+        timestamp, message_id = before
+        query = query.filter(or_(
+            models.Message.timestamp < timestamp,
+            and_(models.Message.timestamp == timestamp, models.Message.id < message_id),
+        ))
+    query = query.order_by(models.Message.timestamp.desc(), models.Message.id.desc()).limit(limit + 1)
 
+    page = list((await db.scalars(query)).all())
+    has_more = len(page) > limit
+    page = page[:limit]
+    next_cursor = encode_cursor(page[-1].timestamp, page[-1].id) if has_more else None
+    page.reverse()
+    return page, next_cursor
@@ -1,8 +1,78 @@
-from sqlalchemy import create_engine
+from prometheus_client import Histogram
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
-from backend.config import SQLALCHEMY_DATABASE_URL
+from sqlalchemy.pool import NullPool
+from backend.config import SQLALCHEMY_DATABASE_URL, ASYNC_SQLALCHEMY_DATABASE_URL, SQLITE_BUSY_TIMEOUT
 
 engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+if ASYNC_SQLALCHEMY_DATABASE_URL.startswith("sqlite"):
+    # Соединение aiosqlite привязано к event loop, в котором было открыто, поэтому
+    # не держим пул: открытие файла SQLite дешёвое, а приложение (и каждый TestClient)
+    # может работать в своём loop. busy timeout заставляет писателей ждать
+    # блокировку вместо мгновенного "database is locked".
+    async_engine = create_async_engine(
+        ASYNC_SQLALCHEMY_DATABASE_URL,
+        poolclass=NullPool,
+        connect_args={"timeout": SQLITE_BUSY_TIMEOUT},
+    )
+
+    @event.listens_for(async_engine.sync_engine, "connect")
+    def _sqlite_pragmas(dbapi_connection, connection_record):
+        # WAL: читатели не блокируют писателя; synchronous=NORMAL — один fsync на checkpoint,
+        # а не на каждый commit (в WAL-режиме это безопасно при сбое процесса).
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.close()
+else:
+    async_engine = create_async_engine(ASYNC_SQLALCHEMY_DATABASE_URL, pool_pre_ping=True)
+
+_DB_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+db_query_seconds = Histogram(
+    "cinemate_db_query_seconds",
+    "Time of one database query, by the code that ran it",
+    ["method"],
+    buckets=_DB_BUCKETS,
+)
+db_commit_seconds = Histogram(
+    "cinemate_db_commit_seconds",
+    "Time of one database commit (including the flush), by the code that ran it",
+    ["method"],
+    buckets=_DB_BUCKETS,
+)
+
+
+class TimedSession(AsyncSession):
+    """AsyncSession that records query and commit latency labelled with ``method``."""
+
+    def __init__(self, *args, method: str = "other", **kwargs):
+        super().__init__(*args, **kwargs)
+        self.method = method
+
+    async def execute(self, *args, **kwargs):
+        # scalars() и stream() идут через execute() и считаются здесь же
+        with db_query_seconds.labels(method=self.method).time():
+            return await super().execute(*args, **kwargs)
+
+    async def scalar(self, *args, **kwargs):
+        with db_query_seconds.labels(method=self.method).time():
+            return await super().scalar(*args, **kwargs)
+
+    async def get(self, *args, **kwargs):
+        with db_query_seconds.labels(method=self.method).time():
+            return await super().get(*args, **kwargs)
+
+    async def commit(self):
+        with db_commit_seconds.labels(method=self.method).time():
+            await super().commit()
+
+
+AsyncSessionLocal = async_sessionmaker(
+    async_engine, class_=TimedSession, autoflush=False, expire_on_commit=False,
+)
+
 Base = declarative_base()
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Boolean, ForeignKey, DateTime, JSON, Text
+from sqlalchemy import Column, String, Boolean, ForeignKey, DateTime, JSON, Text, Index, Float
 from sqlalchemy.orm import relationship
 from datetime import datetime
 import uuid
@@ -13,6 +13,11 @@ class Room(Base):
     id = Column(String, primary_key=True, default=generate_uuid)
     created_at = Column(DateTime, default=datetime.utcnow)
     current_video_url = Column(String, nullable=True)
+    # Состояние плеера: позиция на момент playback_updated_at (UTC) и скорость
+    playback_state = Column(String, default="paused")
+    playback_position = Column(Float, default=0.0)
+    playback_rate = Column(Float, default=1.0)
+    playback_updated_at = Column(DateTime, nullable=True)
     messages = relationship("Message", back_populates="room", cascade="all, delete-orphan")
     users = relationship("User", back_populates="room", cascade="all, delete-orphan")
     participants = relationship("RoomParticipant", back_populates="room", cascade="all, delete-orphan")
@@ -31,6 +36,10 @@ class User(Base):
 # models.py
 class Message(Base):
     __tablename__ = "messages"
+    __table_args__ = (
+        # История комнаты: keyset-пагинация WHERE room_id = ? ORDER BY timestamp, id
+        Index("ix_messages_room_id_timestamp_id", "room_id", "timestamp", "id"),
+    )
 
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
     room_id = Column(String, ForeignKey("rooms.id"))
@@ -45,6 +54,11 @@ class Message(Base):
 
 class RoomParticipant(Base):
     __tablename__ = "room_participants"
+    __table_args__ = (
+        # Один участник на пару (комната, пользователь); индекс же обслуживает поиск по ней
+        Index("uq_room_participants_room_id_user_id", "room_id", "user_id", unique=True),
+        Index("ix_room_participants_room_id_connected", "room_id", "connected"),
+    )
 
     id = Column(String, primary_key=True, default=generate_uuid)
     room_id = Column(String, ForeignKey("rooms.id"))
@@ -1,4 +1,4 @@
-from backend.db.database import SessionLocal
+from backend.db.database import SessionLocal, AsyncSessionLocal
 
 def get_db():
     db = SessionLocal()
@@ -6,3 +6,8 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+async def get_async_db():
+    async with AsyncSessionLocal(method="api") as db:
+        yield db
@@ -1,39 +1,298 @@
+"""Collector of LiveKit server metrics.
+
+:class:`MetricsCollector` polls the LiveKit Prometheus endpoint and parses the
+response line by line as it streams in, keeping the RTT and packet-loss
+samples.  Every labelled series is kept (per room, participant and track), so
+values no longer overwrite each other; they are aggregated per room into
+min/avg/p95/max, available through :meth:`MetricsCollector.room_stats` and
+exported as gauges.  Histograms are reduced to their mean (``_sum / _count``).
+
+Polls are conditional (``ETag`` / ``Last-Modified``).  The delay starts at
+``interval``, grows by half while the data does not change, doubles with
+every failed poll up to ``max_interval`` and snaps back as soon as fresh data
+arrives.  ``cinemate_livekit_collector_up`` tells whether the last poll
+succeeded.
+"""
 import asyncio
-import os
+import math
+import random
 import re
+import time
+from dataclasses import dataclass
+from typing import Dict
 
 import httpx
-from prometheus_client import Gauge, start_http_server
+from prometheus_client import Counter, Gauge, Histogram, start_http_server
 
-LIVEKIT_METRICS_URL = os.getenv("LIVEKIT_METRICS_URL", "http://livekit:7880/metrics")
+from backend.config import (
+    logger, METRICS_PORT, LIVEKIT_METRICS_URL, LIVEKIT_METRICS_INTERVAL, LIVEKIT_METRICS_MAX_INTERVAL,
+    LIVEKIT_METRICS_TIMEOUT,
+)
 
 latency_ms = Gauge("livekit_latency_ms", "LiveKit average round trip time in ms")
 packet_loss = Gauge("livekit_packet_loss", "LiveKit packet loss percentage")
+room_latency_ms = Gauge(
+    "livekit_room_latency_ms",
+    "LiveKit round trip time over the series of a room, in ms",
+    ["room", "stat"],
+)
+room_packet_loss = Gauge(
+    "livekit_room_packet_loss",
+    "LiveKit packet loss percentage over the series of a room",
+    ["room", "stat"],
+)
+collector_up = Gauge(
+    "cinemate_livekit_collector_up",
+    "1 if the last poll of the LiveKit metrics endpoint succeeded",
+)
+collector_failures = Counter(
+    "cinemate_livekit_collector_failures_total",
+    "Failed polls of the LiveKit metrics endpoint",
+    ["reason"],
+)
+collector_interval = Gauge(
+    "cinemate_livekit_collector_interval_seconds",
+    "Current delay between polls of the LiveKit metrics endpoint",
+)
+collector_series = Gauge(
+    "cinemate_livekit_collector_series",
+    "LiveKit series kept from the last poll",
+    ["kind"],
+)
+scrape_seconds = Histogram(
+    "cinemate_livekit_collector_scrape_seconds",
+    "Time to download and parse the LiveKit metrics page",
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+)
+
+RTT = "rtt_ms"
+LOSS = "packet_loss"
+# Вид серии: шаблон имени метрики LiveKit и множитель к единицам сборщика
+KINDS = {
+    RTT: (re.compile(r"livekit_\w*rtt_seconds"), 1000.0),
+    LOSS: (re.compile(r"livekit_\w*packet_loss_percent"), 1.0),
+}
+PREFIX = "livekit_"
+ROOM_LABELS = ("room", "room_name", "room_id")
+STATS = ("min", "avg", "p95", "max")
+_LABEL = re.compile(r'(\w+)="((?:[^"\\]|\\.)*)"')
+
+Labels = tuple[tuple[str, str], ...]
+
+
+@dataclass(frozen=True)
+class Aggregate:
+    count: int
+    min: float
+    avg: float
+    p95: float
+    max: float
+
+    @classmethod
+    def of(cls, values: list[float]) -> "Aggregate":
+        ordered = sorted(values)
+        p95 = ordered[max(0, math.ceil(0.95 * len(ordered)) - 1)]
+        return cls(len(ordered), ordered[0], sum(ordered) / len(ordered), p95, ordered[-1])
+
+
+def parse_sample(line: str) -> tuple[str, Labels, float] | None:
+    """Parse one sample line of the Prometheus text format; ``None`` for comments and junk."""
+    line = line.strip()
+    if not line or line[0] == "#":
+        return None
+    brace = line.find("{")
+    if brace != -1:
+        close = line.rfind("}")
+        if close < brace:
+            return None
+        name = line[:brace]
+        labels = tuple(sorted(
+            (key, value.replace('\\"', '"').replace("\\n", "\n").replace("\\\\", "\\"))
+            for key, value in _LABEL.findall(line, brace + 1, close)
+        ))
+        rest = line[close + 1:].split()
+    else:
+        name, *rest = line.split()
+        labels = ()
+    if not rest:
+        return None
+    try:
+        return name, labels, float(rest[0])
+    except ValueError:
+        return None
+
+
+def room_of(labels: Labels) -> str:
+    values = dict(labels)
+    return next((values[key] for key in ROOM_LABELS if values.get(key)), "")
+
+
+class ScrapeParser:
+    """Feed the lines of one scrape; :meth:`result` returns the series of every kind."""
+
+    def __init__(self):
+        self.series: Dict[str, Dict[Labels, float]] = {kind: {} for kind in KINDS}
+        self._sums: Dict[tuple[str, Labels], float] = {}
+        self._counts: Dict[tuple[str, Labels], float] = {}
+
+    def feed(self, line: str):
+        # Страница LiveKit в основном состоит из чужих метрик — отсекаем их без разбора
+        if not line.startswith(PREFIX):
+            return
+        sample = parse_sample(line)
+        if sample is None or math.isnan(sample[2]):
+            return
+        name, labels, value = sample
+        for kind, (pattern, scale) in KINDS.items():
+            if pattern.fullmatch(name):
+                self.series[kind][labels] = value * scale
+                return
+            if name.endswith("_sum") and pattern.fullmatch(name[:-4]):
+                self._sums[(kind, labels)] = value * scale
+                return
+            if name.endswith("_count") and pattern.fullmatch(name[:-6]):
+                self._counts[(kind, labels)] = value
+                return
 
+    def result(self) -> Dict[str, Dict[Labels, float]]:
+        for (kind, labels), total in self._sums.items():
+            count = self._counts.get((kind, labels))
+            if count:
+                self.series[kind].setdefault(labels, total / count)
+        return self.series
 
-async def _poll_metrics():
-    pattern_latency = re.compile(r"livekit_.*rtt_seconds")
-    pattern_packet = re.compile(r"livekit_.*packet_loss_percent")
-    async with httpx.AsyncClient() as client:
-        while True:
-            try:
-                resp = await client.get(LIVEKIT_METRICS_URL, timeout=5)
-                text = resp.text.splitlines()
-                for line in text:
-                    if pattern_latency.match(line) and not line.startswith("#"):
-                        value = float(line.split()[-1]) * 1000
-                        latency_ms.set(value)
-                    if pattern_packet.match(line) and not line.startswith("#"):
-                        value = float(line.split()[-1])
-                        packet_loss.set(value)
-            except Exception:
-                pass
-            await asyncio.sleep(5)
+
+class MetricsCollector:
+    def __init__(
+        self,
+        url: str = LIVEKIT_METRICS_URL,
+        interval: float = LIVEKIT_METRICS_INTERVAL,
+        max_interval: float = LIVEKIT_METRICS_MAX_INTERVAL,
+        timeout: float = LIVEKIT_METRICS_TIMEOUT,
+    ):
+        self.url = url
+        self.interval = interval
+        self.max_interval = max(interval, max_interval)
+        self.timeout = timeout
+        self.delay = interval
+        self.series: Dict[str, Dict[Labels, float]] = {kind: {} for kind in KINDS}
+        self.rooms: Dict[str, Dict[str, Aggregate]] = {}  # room -> kind -> aggregate
+        self.healthy = False
+        self.failures = 0
+        self.last_success: float | None = None  # Unix time of the last successful poll
+        self._validators: Dict[str, str] = {}
+        self._task: asyncio.Task | None = None
+
+    def room_stats(self, room_id: str) -> Dict[str, Aggregate]:
+        """Aggregates of the room's series by kind; kinds with no series are missing."""
+        return self.rooms.get(room_id, {})
+
+    async def poll(self, client: httpx.AsyncClient) -> bool:
+        """Fetch and parse the metrics page once; return whether the series changed."""
+        headers = {}
+        if "etag" in self._validators:
+            headers["If-None-Match"] = self._validators["etag"]
+        if "last-modified" in self._validators:
+            headers["If-Modified-Since"] = self._validators["last-modified"]
+
+        with scrape_seconds.time():
+            async with client.stream("GET", self.url, headers=headers, timeout=self.timeout) as resp:
+                if resp.status_code == 304:
+                    return False
+                resp.raise_for_status()
+                parser = ScrapeParser()
+                async for line in resp.aiter_lines():
+                    parser.feed(line)
+                self._validators = {key: resp.headers[key] for key in ("etag", "last-modified") if key in resp.headers}
+
+        series = parser.result()
+        if series == self.series:
+            return False
+        self.series = series
+        self._export()
+        return True
+
+    async def run_once(self, client: httpx.AsyncClient) -> float:
+        """Poll once, update health and the adaptive delay; return the delay before the next poll."""
+        try:
+            changed = await self.poll(client)
+        except Exception as e:
+            self.failures += 1
+            collector_failures.labels(reason=type(e).__name__).inc()
+            if self.failures == 1:
+                logger.warning(f"[LiveKit] Metrics poll of {self.url} failed: {e!r}, backing off")
+            self.healthy = False
+            self.delay = min(self.max_interval, self.interval * 2 ** self.failures)
+        else:
+            if self.failures:
+                logger.info(f"[LiveKit] Metrics poll recovered after {self.failures} failures")
+            self.failures = 0
+            self.healthy = True
+            self.last_success = time.time()
+            # Данные не меняются — опрашиваем всё реже; изменились — снова с базовой частотой
+            self.delay = self.interval if changed else min(self.max_interval, self.delay * 1.5)
+        collector_up.set(1 if self.healthy else 0)
+        collector_interval.set(self.delay)
+        return self.delay
+
+    def _export(self):
+        rooms: Dict[str, Dict[str, Aggregate]] = {}
+        for kind, gauge, overall in ((RTT, room_latency_ms, latency_ms), (LOSS, room_packet_loss, packet_loss)):
+            values = self.series[kind]
+            collector_series.labels(kind=kind).set(len(values))
+            if values:
+                overall.set(sum(values.values()) / len(values))
+            by_room: Dict[str, list[float]] = {}
+            for labels, value in values.items():
+                room = room_of(labels)
+                if room:
+                    by_room.setdefault(room, []).append(value)
+            for room, room_values in by_room.items():
+                aggregate = rooms.setdefault(room, {})[kind] = Aggregate.of(room_values)
+                for stat in STATS:
+                    gauge.labels(room=room, stat=stat).set(getattr(aggregate, stat))
+            # Комнаты, исчезнувшие из LiveKit, убираем из экспорта
+            for room in self.rooms:
+                if kind in self.rooms[room] and room not in by_room:
+                    for stat in STATS:
+                        gauge.remove(room, stat)
+        self.rooms = rooms
+
+    def start(self):
+        """Start polling in the running loop (no-op if it already runs there)."""
+        loop = asyncio.get_running_loop()
+        if self._task is not None and not self._task.done() and self._task.get_loop() is loop:
+            return
+        self._task = loop.create_task(self._run())
+
+    async def stop(self):
+        task, self._task = self._task, None
+        if task is None or task.done():
+            return
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+    async def _run(self):
+        async with httpx.AsyncClient() as client:
+            while True:
+                delay = await self.run_once(client)
+                # Разброс, чтобы воркеры не опрашивали LiveKit в один и тот же момент
+                await asyncio.sleep(delay * random.uniform(0.9, 1.1))
+
+
+collector = MetricsCollector()
 
 
 def start_collector():
-    if getattr(start_collector, "_started", False):
-        return
-    start_http_server(8001)
-    asyncio.create_task(_poll_metrics())
-    start_collector._started = True
+    if METRICS_PORT and not getattr(start_collector, "_port_started", False):
+        # Отдельный порт для старых конфигураций Prometheus; те же метрики есть на /metrics
+        start_http_server(METRICS_PORT)
+        start_collector._port_started = True
+    collector.start()
+
+
+async def stop_collector():
+    await collector.stop()
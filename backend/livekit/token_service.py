@@ -1,39 +1,123 @@
+"""LiveKit access tokens (HS256 JWT).
+
+:class:`TokenService` keeps everything that does not depend on the
+participant precomputed: the encoded header segment, the JSON of each role's
+grants and an HMAC keyed with the API secret, which is copied rather than
+re-keyed for every signature.  Issued tokens are cached per
+``(user, room, role)`` and handed out again until they are within
+``refresh_margin`` seconds of expiry, so a room full of participants
+reconnecting at once costs dictionary lookups instead of signatures.
+"""
 import base64
 import hmac
 import hashlib
 import json
+import threading
 import time
-from typing import Dict
+from collections import OrderedDict
+from typing import Dict, Iterable
+
+from prometheus_client import REGISTRY, Counter
 
-from backend.config import LIVEKIT_API_KEY, LIVEKIT_API_SECRET
+from backend.config import (
+    LIVEKIT_API_KEY, LIVEKIT_API_SECRET, LIVEKIT_TOKEN_TTL, LIVEKIT_TOKEN_REFRESH_MARGIN, LIVEKIT_TOKEN_CACHE_SIZE,
+)
 from .roles import ROLES
 
+tokens_issued = Counter(
+    "cinemate_livekit_tokens_total",
+    "LiveKit tokens handed out, freshly signed or reused from the cache",
+    ["result"],
+    registry=None,
+)
+try:
+    REGISTRY.register(tokens_issued)
+except ValueError:
+    # Модуль импортирован повторно (его перезагружают вместе с конфигом) — счётчик уже зарегистрирован
+    pass
+
+_signed = tokens_issued.labels(result="signed")
+_cached = tokens_issued.labels(result="cached")
+
 
 def _b64encode(data: bytes) -> str:
     return base64.urlsafe_b64encode(data).decode().rstrip("=")
 
 
+def _compact(value) -> str:
+    return json.dumps(value, separators=(",", ":"))
+
+
+class TokenService:
+    def __init__(
+        self,
+        api_key: str | None,
+        api_secret: str | None,
+        ttl: int = LIVEKIT_TOKEN_TTL,
+        refresh_margin: int = LIVEKIT_TOKEN_REFRESH_MARGIN,
+        cache_size: int = LIVEKIT_TOKEN_CACHE_SIZE,
+        roles: Dict[str, Dict[str, bool]] = ROLES,
+    ):
+        self.ttl = ttl
+        self.refresh_margin = refresh_margin
+        self.cache_size = cache_size
+        self._header = _b64encode(_compact({"alg": "HS256", "typ": "JWT"}).encode()) + "."
+        self._issuer = _compact(api_key)
+        # Гранты роли без закрывающей скобки: комната дописывается последним полем
+        self._grants = {role: _compact(grants)[:-1] for role, grants in roles.items()}
+        self._mac = hmac.new(api_secret.encode(), digestmod=hashlib.sha256) if api_secret else None
+        self._cache: OrderedDict[tuple[str, str, str], tuple[str, int]] = OrderedDict()
+        # Синхронные роуты FastAPI выполняются в пуле потоков
+        self._lock = threading.Lock()
+
+    def sign(self, user_id: str, room_id: str, role: str, now: float | None = None) -> tuple[str, int]:
+        """Sign a new token; return it with its expiry (Unix seconds)."""
+        grants = self._grants.get(role)
+        if grants is None:
+            raise ValueError("Unknown role")
+        if self._mac is None:
+            raise RuntimeError("LIVEKIT_API_SECRET is not set")
+
+        iat = int(time.time() if now is None else now)
+        exp = iat + self.ttl
+        # Поля в том же порядке, что и у json.dumps словаря, — токен совпадает байт в байт
+        payload = (
+            f'{{"iss":{self._issuer},"sub":{_compact(user_id)},"iat":{iat},"exp":{exp},'
+            f'"video":{grants},"room":{_compact(room_id)}}}}}'
+        )
+        signing_input = self._header + _b64encode(payload.encode())
+        mac = self._mac.copy()
+        mac.update(signing_input.encode())
+        return f"{signing_input}.{_b64encode(mac.digest())}", exp
+
+    def issue(self, user_id: str, room_id: str, role: str, now: float | None = None) -> str:
+        """Return a cached token that is not about to expire, or sign a new one."""
+        now = time.time() if now is None else now
+        key = (user_id, room_id, role)
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None and cached[1] - now > self.refresh_margin:
+                self._cache.move_to_end(key)
+                _cached.inc()
+                return cached[0]
+
+        token, exp = self.sign(user_id, room_id, role, now)
+        with self._lock:
+            self._cache[key] = (token, exp)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        _signed.inc()
+        return token
+
+    def issue_many(self, room_id: str, participants: Iterable[tuple[str, str]]) -> Dict[str, str]:
+        """Tokens for ``(user_id, role)`` pairs of one room, keyed by user id."""
+        now = time.time()
+        return {user_id: self.issue(user_id, room_id, role, now) for user_id, role in participants}
+
+
+token_service = TokenService(LIVEKIT_API_KEY, LIVEKIT_API_SECRET)
+
+
 def create_livekit_token(user_id: str, room_id: str, role: str) -> str:
-    grants: Dict[str, bool] = ROLES.get(role)
-    if grants is None:
-        raise ValueError("Unknown role")
-
-    header = {"alg": "HS256", "typ": "JWT"}
-    iat = int(time.time())
-    payload = {
-        "iss": LIVEKIT_API_KEY,
-        "sub": user_id,
-        "iat": iat,
-        "exp": iat + 3600,
-        "video": {**grants, "room": room_id},
-    }
-
-    segments = [
-        _b64encode(json.dumps(header, separators=(",", ":")).encode()),
-        _b64encode(json.dumps(payload, separators=(",", ":")).encode()),
-    ]
-    signing_input = ".".join(segments).encode()
-    signature = hmac.new(
-        LIVEKIT_API_SECRET.encode(), signing_input, hashlib.sha256
-    ).digest()
-    return ".".join(segments + [_b64encode(signature)])
+    return token_service.issue(user_id, room_id, role)
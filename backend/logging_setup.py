@@ -0,0 +1,154 @@
+"""Logging configuration: ``log_config.yaml`` behind a queue.
+
+:func:`configure_logging` applies the YAML file with ``dictConfig`` and then
+moves the handlers it created (console, rotating files, ...) off the calling
+thread: each logger gets a :class:`DroppingQueueHandler` instead, and a
+:class:`~logging.handlers.QueueListener` thread formats and writes the records.
+Logging from the event loop thus costs one ``put_nowait``; if the writer falls
+behind, records are dropped and counted rather than blocking the loop.
+
+The YAML can use two helpers of this module:
+
+* :class:`JsonFormatter` – one JSON object per line, with ``extra`` fields;
+* :class:`SamplingFilter` – attached to a hot-path logger, passes only a
+  fraction of its records below WARNING.
+"""
+import atexit
+import copy
+import json
+import logging
+import logging.config
+import os
+import queue
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+import yaml
+from prometheus_client import Counter
+
+dropped_records = Counter(
+    "cinemate_log_records_dropped_total",
+    "Log records dropped because the logging queue was full",
+)
+
+# Конфигурация на случай, если log_config.yaml не найден: только консоль
+FALLBACK_CONFIG = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "formatters": {"default": {"format": "[%(asctime)s] %(levelname)s - %(message)s"}},
+    "handlers": {"console": {"class": "logging.StreamHandler", "formatter": "default"}},
+    "root": {"handlers": ["console"], "level": "INFO"},
+}
+
+# Атрибуты, которые есть у любой LogRecord; всё остальное пришло через extra=
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime", "taskName"}
+
+
+class JsonFormatter(logging.Formatter):
+    """Format a record as one JSON line: time, level, logger, message and ``extra`` fields."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        if record.stack_info:
+            entry["stack"] = self.formatStack(record.stack_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """Pass one of every ``1 / rate`` records below WARNING; warnings and errors always pass."""
+
+    def __init__(self, rate: float = 1.0, name: str = ""):
+        super().__init__(name)
+        self.every = max(1, round(1 / rate)) if rate > 0 else 0
+        # Первая запись проходит, дальше — каждая every-я
+        self._skipped = self.every - 1
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        if not self.every:
+            return False
+        self._skipped += 1
+        if self._skipped < self.every:
+            return False
+        self._skipped = 0
+        return True
+
+
+class DroppingQueueHandler(QueueHandler):
+    """QueueHandler for an in-process bounded queue that drops records when it is full."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Запись не покидает процесс: достаточно зафиксировать текст сообщения,
+        # а форматирование (и исключение) оставить потоку QueueListener
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            dropped_records.inc()
+
+
+def _load(path: str, file_suffix: str = "") -> dict:
+    if not os.path.exists(path):
+        return copy.deepcopy(FALLBACK_CONFIG)
+    with open(path, encoding="utf-8") as f:
+        config = yaml.safe_load(f)
+    # Относительные пути файлов — от каталога конфигурации, а не от текущего каталога процесса
+    base = os.path.dirname(os.path.abspath(path))
+    for handler in config.get("handlers", {}).values():
+        filename = handler.get("filename")
+        if filename and not os.path.isabs(filename):
+            handler["filename"] = os.path.join(base, filename)
+        if filename and file_suffix:
+            # logs/cinemate.log -> logs/cinemate.worker1.log
+            root, ext = os.path.splitext(handler["filename"])
+            handler["filename"] = root + file_suffix + ext
+        if filename:
+            os.makedirs(os.path.dirname(handler["filename"]), exist_ok=True)
+    return config
+
+
+def configure_logging(path: str, queue_size: int = 10000, file_suffix: str = "") -> list[QueueListener]:
+    """Apply the YAML logging config at ``path`` and put its handlers behind queues.
+
+    ``file_suffix`` is inserted before the extension of every log file, so that
+    processes sharing one config write separate files.
+
+    Loggers sharing the same set of handlers share one queue and listener
+    thread.  Returns the started listeners; they are stopped (and flushed) at
+    interpreter exit.
+    """
+    config = _load(path, file_suffix)
+    logging.config.dictConfig(config)
+
+    loggers = [logging.getLogger()] + [logging.getLogger(name) for name in config.get("loggers", {})]
+    listeners: dict[tuple, QueueHandler] = {}
+    started = []
+    for logger in loggers:
+        handlers = tuple(h for h in logger.handlers if not isinstance(h, QueueHandler))
+        if not handlers:
+            continue
+        queue_handler = listeners.get(handlers)
+        if queue_handler is None:
+            queue_handler = listeners[handlers] = DroppingQueueHandler(queue.Queue(queue_size))
+            listener = QueueListener(queue_handler.queue, *handlers, respect_handler_level=True)
+            listener.start()
+            atexit.register(listener.stop)
+            started.append(listener)
+        logger.handlers = [queue_handler]
+    return started
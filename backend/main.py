@@ -1,16 +1,21 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from backend.ws_endpoint import router as ws_router
+from backend.ws_endpoint import router as ws_router, chat_writer, manager, reaper
 from backend.api.rooms import router as room_router
-from backend.config import logger  # ← обязательно инициализирует логгер
+from backend.config import logger, SHARD_COUNT  # ← обязательно инициализирует логгер
 from backend.routes import auth
 from backend.routers.livekit import router as livekit_router
 from backend.routers.config_router import router as config_router
-from backend.livekit.metrics_collector import start_collector
+from backend.routers.metrics import router as metrics_router
+from backend.livekit.metrics_collector import start_collector, stop_collector
+from backend.services.loop_monitor import LoopLagMonitor
+from backend.db.database import async_engine
+from backend.ws.sharding import CloseConnections
 
 logger.info("🚀 Cinemate API starting...")
 
 app = FastAPI()
+loop_monitor = LoopLagMonitor()
 
 app.add_middleware(
     CORSMiddleware,
@@ -19,6 +24,9 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+if SHARD_COUNT > 1:
+    # За роутером супервизора каждый HTTP-запрос должен маршрутизироваться заново
+    app.add_middleware(CloseConnections)
 logger.info("[MAIN] FastAPI init")
 
 logger.info("[MAIN] Router imported")
@@ -28,11 +36,25 @@ app.include_router(auth.router)
 app.include_router(room_router)
 app.include_router(livekit_router)
 app.include_router(config_router)
+app.include_router(metrics_router)
 
 
 @app.on_event("startup")
 async def _startup() -> None:
     start_collector()
+    chat_writer.start()
+    reaper.start()
+    loop_monitor.start()
+
+
+@app.on_event("shutdown")
+async def _shutdown() -> None:
+    await loop_monitor.stop()
+    await stop_collector()
+    await reaper.stop()
+    await chat_writer.stop()
+    await manager.broker.close()
+    await async_engine.dispose()
 
 @app.get("/")
 async def root():
@@ -1,22 +1,31 @@
 from fastapi import APIRouter, Query
-import hashlib
 
 from backend.config import USE_LIVEKIT
+from backend.services.qos import FAIR, LIVEKIT, PROFILES, qos
 
 
 router = APIRouter()
 
 
 @router.get("/config")
-def get_client_config(room_id: str | None = Query(default=None)):
+async def get_client_config(room_id: str | None = Query(default=None)):
     """Return client configuration.
 
     The LiveKit usage flag is determined globally by ``USE_LIVEKIT`` and, when
-    enabled, consistently for everyone in the same room based on ``room_id``.
+    enabled, per room by the QoS engine, consistently for everyone in the
+    room.  ``sync`` is the room's heartbeat interval and seek tolerance.
     """
-    use_livekit = USE_LIVEKIT
-    if USE_LIVEKIT and room_id:
-        digest = hashlib.sha256(room_id.encode()).hexdigest()
-        use_livekit = int(digest, 16) % 2 == 0
-    return {"use_livekit": use_livekit}
+    if not room_id:
+        return {"use_livekit": USE_LIVEKIT, "transport_reason": "global", "sync": PROFILES[FAIR].as_dict()}
+    if not USE_LIVEKIT:
+        use_livekit, reason = False, "disabled"
+    else:
+        decision = qos.choose_transport(room_id)
+        use_livekit, reason = decision.value == LIVEKIT, decision.reason
+    return {"use_livekit": use_livekit, "transport_reason": reason, "sync": qos.profile(room_id).as_dict()}
 
+
+@router.get("/qos/{room_id}")
+async def get_room_qos(room_id: str):
+    """Signals, sync profile and recent QoS decisions of a room."""
+    return qos.snapshot(room_id)
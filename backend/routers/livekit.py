@@ -1,9 +1,10 @@
-from fastapi import APIRouter, Request
-from pydantic import BaseModel
+from fastapi import APIRouter, HTTPException, Request
+from pydantic import BaseModel, Field
 from urllib.parse import urlparse, urlunparse
 
-from backend.livekit.token_service import create_livekit_token
-from backend.config import LIVEKIT_URL
+from backend.livekit.roles import ROLES
+from backend.livekit.token_service import create_livekit_token, token_service
+from backend.config import LIVEKIT_URL, LIVEKIT_TOKEN_BATCH_MAX
 
 router = APIRouter()
 
@@ -14,10 +15,18 @@ class TokenRequest(BaseModel):
     role: str = "publisher"
 
 
-@router.post("/livekit/token")
-def generate_token(req: TokenRequest, request: Request):
-    token = create_livekit_token(req.user_id, req.room_id, req.role)
+class BatchParticipant(BaseModel):
+    user_id: str
+    role: str | None = None
+
+
+class BatchTokenRequest(BaseModel):
+    room_id: str
+    role: str = "publisher"  # роль участников, для которых она не указана
+    participants: list[BatchParticipant] = Field(min_length=1)
+
 
+def _client_url(request: Request) -> str | None:
     url = LIVEKIT_URL
     if url:
         parsed = urlparse(url)
@@ -26,5 +35,22 @@ def generate_token(req: TokenRequest, request: Request):
             hostname = host.split(":")[0] if host else "localhost"
             netloc = f"{hostname}:{parsed.port}" if parsed.port else hostname
             url = urlunparse(parsed._replace(netloc=netloc))
+    return url
+
 
-    return {"token": token, "url": url}
+@router.post("/livekit/token")
+def generate_token(req: TokenRequest, request: Request):
+    token = create_livekit_token(req.user_id, req.room_id, req.role)
+    return {"token": token, "url": _client_url(request)}
+
+
+@router.post("/livekit/tokens")
+def generate_tokens(req: BatchTokenRequest, request: Request):
+    """Tokens for a whole room in one request, e.g. when a watch party starts."""
+    if len(req.participants) > LIVEKIT_TOKEN_BATCH_MAX:
+        raise HTTPException(status_code=413, detail=f"At most {LIVEKIT_TOKEN_BATCH_MAX} participants per request")
+    unknown = {p.role or req.role for p in req.participants} - ROLES.keys()
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown role: {', '.join(sorted(unknown))}")
+    tokens = token_service.issue_many(req.room_id, ((p.user_id, p.role or req.role) for p in req.participants))
+    return {"tokens": tokens, "url": _client_url(request)}
@@ -0,0 +1,11 @@
+from fastapi import APIRouter, Response
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+
+
+router = APIRouter()
+
+
+@router.get("/metrics", include_in_schema=False)
+def metrics():
+    """Prometheus metrics of this process: the app's own and the LiveKit gauges."""
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
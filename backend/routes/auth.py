@@ -1,8 +1,8 @@
 from fastapi import APIRouter, Request, Depends
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from backend.config import TELEGRAM_BOT_TOKEN
-from backend.db.session import get_db
-from backend.db.models import User, Room
+from backend.db.session import get_async_db
+from backend.db.models import User
 import hashlib
 import hmac
 import time
@@ -19,7 +19,7 @@ def check_telegram_auth(data: dict, token: str) -> bool:
     return hmac.compare_digest(calc_hash, hash_) and int(auth_data.get("auth_date", 0)) > (time.time() - 86400)
 
 @router.post("/auth/telegram")
-async def telegram_login(request: Request, db: Session = Depends(get_db)):
+async def telegram_login(request: Request, db: AsyncSession = Depends(get_async_db)):
     data = await request.json()
 
     if not check_telegram_auth(data, TELEGRAM_BOT_TOKEN):
@@ -28,23 +28,13 @@ async def telegram_login(request: Request, db: Session = Depends(get_db)):
     tg_id = str(data["id"])
     first_name = data.get("first_name", "User")
 
-    user = db.query(User).filter_by(id=tg_id).first()
+    user = await db.get(User, tg_id)
 
     if not user:
-        user = User(
-            id=tg_id,
-            name=first_name,
-            role="guest",
-            permissions={
-                "control_video": False,
-                "kick": False,
-                "change_video": False
-            },
-            connected=False
-        )
+        # Роль и права хранятся в RoomParticipant, у пользователя только имя
+        user = User(id=tg_id, name=first_name)
         db.add(user)
-        db.commit()
-        db.refresh(user)
+        await db.commit()
 
     return {
         "status": "ok",
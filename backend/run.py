@@ -1,5 +1,7 @@
 from backend.main import app
+from backend.ws.compression import CompressingWebSocketProtocol
 import uvicorn
 
 if __name__ == "__main__":
-    uvicorn.run(app, host="localhost", port=8000)  # без reload
+    # log_config=None: логирование uvicorn уже настроено из log_config.yaml при импорте приложения
+    uvicorn.run(app, host="localhost", port=8000, ws=CompressingWebSocketProtocol, log_config=None)  # без reload
@@ -0,0 +1,193 @@
+"""Write-behind persistence of chat messages.
+
+Chat frames are broadcast first and then handed to a :class:`ChatWriter`,
+whose background task inserts them in batches: a batch is committed as soon as
+``batch_size`` messages are pending or ``flush_interval`` seconds after the
+first of them arrived, whichever comes first.  One commit (one fsync on SQLite)
+is thus shared by a whole burst of messages.  A batch whose commit fails (a
+locked SQLite database, a dropped connection) is retried ``retries`` times with
+doubling delays before its messages are counted as dropped.  ``stop()``
+flushes everything still pending before returning.
+"""
+import asyncio
+import time
+from collections import deque
+from datetime import datetime
+from functools import partial
+from typing import Callable
+from uuid import uuid4
+
+from prometheus_client import Counter, Gauge, Histogram
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.config import (
+    logger, CHAT_BATCH_SIZE, CHAT_FLUSH_INTERVAL, CHAT_PERSIST_RETRIES, CHAT_QUEUE_SIZE, CHAT_RETRY_DELAY,
+)
+from backend.db.database import AsyncSessionLocal
+from backend.db.models import Message
+
+pending_messages = Gauge(
+    "cinemate_chat_persist_pending",
+    "Chat messages broadcast but not yet committed to the database",
+)
+persist_lag = Histogram(
+    "cinemate_chat_persist_lag_seconds",
+    "Time from enqueueing a chat message to its commit",
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+)
+batch_sizes = Histogram(
+    "cinemate_chat_persist_batch_size",
+    "Chat messages committed per batch",
+    buckets=(1, 2, 5, 10, 25, 50, 100, 250, 500),
+)
+persist_dropped = Counter(
+    "cinemate_chat_persist_dropped_total",
+    "Chat messages that were never persisted",
+    ["reason"],
+)
+persist_retries = Counter(
+    "cinemate_chat_persist_retries_total",
+    "Chat batch commits retried after a database error",
+)
+
+
+def chat_payload(user_id: str | None, username: str, text: str, timestamp: datetime) -> dict:
+    """Wire representation of one chat message (``chat`` frames and history pages)."""
+    return {
+        "type": "chat",
+        "user_id": user_id,
+        "username": username,
+        "message": text,
+        "timestamp": timestamp.isoformat(),
+    }
+
+
+class ChatWriter:
+    def __init__(
+        self,
+        session_factory: Callable[[], AsyncSession] = partial(AsyncSessionLocal, method="chat_writer"),
+        batch_size: int = CHAT_BATCH_SIZE,
+        flush_interval: float = CHAT_FLUSH_INTERVAL,
+        maxsize: int = CHAT_QUEUE_SIZE,
+        retries: int = CHAT_PERSIST_RETRIES,
+        retry_delay: float = CHAT_RETRY_DELAY,
+    ):
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.maxsize = maxsize
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self._pending: deque[tuple[float, dict]] = deque()
+        self._inflight: list[tuple[float, dict]] = []
+        self._task: asyncio.Task | None = None
+        self._wakeup: asyncio.Event | None = None
+        self._batch_ready: asyncio.Event | None = None
+        self._stopping = False
+
+    @property
+    def depth(self) -> int:
+        return len(self._pending)
+
+    def unsaved(self, room_id: str) -> list[dict]:
+        """Messages of a room not yet committed (queued or being written), oldest first."""
+        return [row for _, row in (*self._inflight, *self._pending) if row["room_id"] == room_id]
+
+    def start(self):
+        """Start the writer task in the running loop (no-op if it already runs there)."""
+        loop = asyncio.get_running_loop()
+        if self._task is not None and not self._task.done() and self._task.get_loop() is loop:
+            return
+        self._stopping = False
+        self._wakeup = asyncio.Event()
+        self._batch_ready = asyncio.Event()
+        self._task = loop.create_task(self._run())
+        if self._pending:
+            self._wakeup.set()
+
+    def put(self, room_id: str, user_id: str | None, username: str, text: str, timestamp: datetime) -> bool:
+        """Queue a message for persistence; return ``False`` if the queue is full.
+
+        The message id is assigned here so that unsaved messages can already be
+        addressed by a history cursor.
+        """
+        if len(self._pending) >= self.maxsize:
+            logger.warning(f"[Chat] Persistence queue full ({self.maxsize}), dropping message in room {room_id}")
+            persist_dropped.labels(reason="overflow").inc()
+            return False
+
+        self.start()
+        self._pending.append((time.monotonic(), {
+            "id": str(uuid4()),
+            "room_id": room_id,
+            "user_id": user_id,
+            "username": username,
+            "text": text,
+            "timestamp": timestamp,
+        }))
+        pending_messages.inc()
+        self._wakeup.set()
+        if len(self._pending) >= self.batch_size:
+            self._batch_ready.set()
+        return True
+
+    async def stop(self):
+        """Flush pending messages and stop the writer task."""
+        task = self._task
+        if task is None or task.done():
+            if self._pending:
+                await self._flush_all()
+            return
+        self._stopping = True
+        self._wakeup.set()
+        self._batch_ready.set()
+        await task
+        self._task = None
+
+    async def _run(self):
+        while not (self._stopping and not self._pending):
+            while not self._pending and not self._stopping:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+            if len(self._pending) < self.batch_size and not self._stopping:
+                # Ждём, пока наберётся пачка, но не дольше flush_interval
+                self._batch_ready.clear()
+                try:
+                    await asyncio.wait_for(self._batch_ready.wait(), timeout=self.flush_interval)
+                except asyncio.TimeoutError:
+                    pass
+            if self._pending:
+                await self._flush_batch()
+
+    async def _flush_all(self):
+        while self._pending:
+            await self._flush_batch()
+
+    async def _flush_batch(self):
+        batch = self._inflight = [self._pending.popleft() for _ in range(min(self.batch_size, len(self._pending)))]
+        pending_messages.dec(len(batch))
+        try:
+            for attempt in range(self.retries + 1):
+                try:
+                    async with self.session_factory() as db:
+                        await db.execute(insert(Message), [row for _, row in batch])
+                        await db.commit()
+                    break
+                except Exception as e:
+                    if attempt == self.retries:
+                        logger.error(f"[Chat] Failed to persist {len(batch)} messages: {e}")
+                        persist_dropped.labels(reason="db_error").inc(len(batch))
+                        return
+                    # Блокировка SQLite или обрыв соединения обычно проходят быстро — пачка остаётся в _inflight
+                    delay = self.retry_delay * 2 ** attempt
+                    logger.warning(f"[Chat] Failed to persist {len(batch)} messages ({e}), retrying in {delay:.2f}s")
+                    persist_retries.inc()
+                    await asyncio.sleep(delay)
+        finally:
+            self._inflight = []
+
+        committed_at = time.monotonic()
+        batch_sizes.observe(len(batch))
+        for enqueued_at, _ in batch:
+            persist_lag.observe(committed_at - enqueued_at)
@@ -0,0 +1,60 @@
+"""Event loop lag monitor.
+
+Every handler, broadcast and database call of the server shares one event
+loop, so a single slow callback delays all rooms at once.
+:class:`LoopLagMonitor` sleeps for ``interval`` seconds in a loop and records
+how much later than requested it woke up.
+"""
+import asyncio
+import time
+
+from prometheus_client import Gauge, Histogram
+
+from backend.config import EVENT_LOOP_LAG_INTERVAL
+
+loop_lag = Histogram(
+    "cinemate_event_loop_lag_seconds",
+    "How late the event loop ran a timer that was due",
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5),
+)
+loop_lag_last = Gauge(
+    "cinemate_event_loop_lag_last_seconds",
+    "Event loop lag measured by the latest probe",
+)
+
+
+class LoopLagMonitor:
+    def __init__(self, interval: float = EVENT_LOOP_LAG_INTERVAL):
+        self.interval = interval
+        self._task: asyncio.Task | None = None
+
+    def start(self):
+        """Start probing in the running loop (no-op if it already runs there or is disabled)."""
+        if self.interval <= 0:
+            return
+        loop = asyncio.get_running_loop()
+        if self._task is not None and not self._task.done() and self._task.get_loop() is loop:
+            return
+        self._task = loop.create_task(self._run())
+
+    async def stop(self):
+        task, self._task = self._task, None
+        if task is None or task.done():
+            return
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+    async def _run(self):
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.record(time.perf_counter() - started - self.interval)
+
+    @staticmethod
+    def record(lag: float):
+        lag = max(0.0, lag)
+        loop_lag.observe(lag)
+        loop_lag_last.set(lag)
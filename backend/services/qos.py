@@ -0,0 +1,245 @@
+"""Room quality of service.
+
+:class:`QoSEngine` keeps, per room, an EWMA of the sync heartbeat round trip
+time reported by clients (and of its jitter) and the number of connected
+participants, and combines them with the LiveKit round trip time and packet
+loss of the room collected by :mod:`backend.livekit.metrics_collector`.
+From that it derives:
+
+* the room's tier (``good``, ``fair`` or ``poor``) and its
+  :class:`SyncProfile`: how often clients send the sync heartbeat and how far
+  they may drift before seeking instead of nudging the playback rate;
+* the voice transport handed out by ``/config``: LiveKit or the legacy P2P
+  mesh, kept for as long as anyone is connected to the room.
+
+Every change of tier or transport goes to a short per-room decision log
+together with the numbers behind it, and is logged and counted.
+"""
+import hashlib
+import time
+from collections import OrderedDict, deque
+from dataclasses import asdict, dataclass, field
+
+from prometheus_client import Counter, Histogram
+
+from backend.config import (
+    logger, QOS_RTT_FAIR_MS, QOS_RTT_POOR_MS, QOS_LOSS_FAIR, QOS_LOSS_POOR, QOS_P2P_MAX_PEERS,
+    QOS_DECISION_HOLD, QOS_MAX_ROOMS, QOS_DECISION_LOG,
+)
+from backend.livekit.metrics_collector import LOSS, RTT, collector
+
+qos_logger = logger.getChild("qos")
+
+heartbeat_rtt = Histogram(
+    "cinemate_qos_heartbeat_rtt_ms",
+    "Sync heartbeat round trip time reported by clients, in ms",
+    buckets=(10, 25, 50, 100, 150, 250, 400, 700, 1000, 2500),
+)
+decisions = Counter(
+    "cinemate_qos_decisions_total",
+    "Changes of a room's QoS tier or voice transport",
+    ["kind", "value", "reason"],
+)
+
+GOOD, FAIR, POOR = "good", "fair", "poor"
+_RANK = {GOOD: 0, FAIR: 1, POOR: 2}
+
+TIER = "tier"
+TRANSPORT = "transport"
+LIVEKIT, P2P = "livekit", "p2p"
+
+
+@dataclass(frozen=True)
+class SyncProfile:
+    tier: str
+    interval_ms: int  # период heartbeat'а sync
+    seek_tolerance: float  # рассинхрон (сек.), после которого клиент делает seek
+
+    def as_dict(self) -> dict:
+        return asdict(self)
+
+
+# На стабильной сети heartbeat реже и допуск уже; на плохой — чаще, а допуск шире,
+# чтобы шум оценки RTT не превращался в серию seek'ов
+PROFILES = {
+    GOOD: SyncProfile(GOOD, 10000, 1.0),
+    FAIR: SyncProfile(FAIR, 5000, 2.0),
+    POOR: SyncProfile(POOR, 2000, 3.5),
+}
+
+
+@dataclass(frozen=True)
+class Decision:
+    kind: str  # TIER or TRANSPORT
+    value: str  # tier, or LIVEKIT / P2P
+    reason: str
+    at: float  # Unix time
+    rtt_ms: float | None
+    loss: float | None
+    peers: int
+
+    def as_dict(self) -> dict:
+        return asdict(self)
+
+
+@dataclass
+class RoomQoS:
+    rtt_ms: float | None = None  # EWMA RTT heartbeat'а
+    jitter_ms: float = 0.0  # EWMA отклонения отсчёта от rtt_ms
+    peers: int = 0
+    tier: str = FAIR
+    transport: Decision | None = None
+    log: deque = field(default_factory=lambda: deque(maxlen=QOS_DECISION_LOG))
+
+
+def _hash_split(room_id: str) -> bool:
+    # Прежнее правило: половина комнат по хэшу — одно и то же для всех участников
+    return int(hashlib.sha256(room_id.encode()).hexdigest(), 16) % 2 == 0
+
+
+class QoSEngine:
+    def __init__(
+        self,
+        source=collector,
+        rtt_fair: float = QOS_RTT_FAIR_MS,
+        rtt_poor: float = QOS_RTT_POOR_MS,
+        loss_fair: float = QOS_LOSS_FAIR,
+        loss_poor: float = QOS_LOSS_POOR,
+        p2p_max_peers: int = QOS_P2P_MAX_PEERS,
+        hold: float = QOS_DECISION_HOLD,
+        max_rooms: int = QOS_MAX_ROOMS,
+        alpha: float = 0.2,
+    ):
+        self.source = source  # что-то с room_stats(room_id), обычно сборщик метрик LiveKit
+        self.rtt_fair = rtt_fair
+        self.rtt_poor = rtt_poor
+        self.loss_fair = loss_fair
+        self.loss_poor = loss_poor
+        self.p2p_max_peers = p2p_max_peers
+        self.hold = hold
+        self.max_rooms = max_rooms
+        self.alpha = alpha
+        self._rooms: OrderedDict[str, RoomQoS] = OrderedDict()
+
+    def _room(self, room_id: str) -> RoomQoS:
+        room = self._rooms.get(room_id)
+        if room is None:
+            room = self._rooms[room_id] = RoomQoS()
+            while len(self._rooms) > self.max_rooms:
+                self._rooms.popitem(last=False)
+        else:
+            self._rooms.move_to_end(room_id)
+        return room
+
+    def observe(self, room_id: str, rtt_ms: float | None = None, peers: int | None = None) -> SyncProfile:
+        """Record a sync heartbeat of the room and return its current sync profile."""
+        room = self._room(room_id)
+        if peers is not None:
+            room.peers = peers
+        if rtt_ms is not None:
+            heartbeat_rtt.observe(rtt_ms)
+            if room.rtt_ms is None:
+                room.rtt_ms = rtt_ms
+            else:
+                room.jitter_ms += self.alpha * (abs(rtt_ms - room.rtt_ms) - room.jitter_ms)
+                room.rtt_ms += self.alpha * (rtt_ms - room.rtt_ms)
+        return self.profile(room_id)
+
+    def _signals(self, room_id: str, room: RoomQoS) -> tuple[float | None, float | None, float | None]:
+        """Heartbeat latency (RTT plus twice the jitter), LiveKit p95 RTT and LiveKit p95 loss."""
+        stats = self.source.room_stats(room_id)
+        heartbeat = room.rtt_ms + 2 * room.jitter_ms if room.rtt_ms is not None else None
+        livekit_rtt = stats[RTT].p95 if RTT in stats else None
+        loss = stats[LOSS].p95 if LOSS in stats else None
+        return heartbeat, livekit_rtt, loss
+
+    @staticmethod
+    def _grade(value: float | None, fair: float, poor: float) -> str | None:
+        if value is None:
+            return None
+        return POOR if value >= poor else FAIR if value >= fair else GOOD
+
+    def profile(self, room_id: str) -> SyncProfile:
+        """Sync profile for the room's current tier; unknown rooms get ``fair``."""
+        room = self._room(room_id)
+        heartbeat, livekit_rtt, loss = self._signals(room_id, room)
+        latency = max((v for v in (heartbeat, livekit_rtt) if v is not None), default=None)
+        by_latency = self._grade(latency, self.rtt_fair, self.rtt_poor)
+        by_loss = self._grade(loss, self.loss_fair, self.loss_poor)
+
+        if by_latency is None and by_loss is None:
+            tier, reason = FAIR, "no_data"
+        elif _RANK.get(by_loss, -1) > _RANK.get(by_latency, -1):
+            tier, reason = by_loss, "loss"
+        else:
+            tier, reason = by_latency, "latency"
+        if tier == GOOD:
+            reason = "stable"
+
+        if tier != room.tier:
+            room.tier = tier
+            self._record(room_id, room, TIER, tier, reason, latency, loss)
+        return PROFILES[tier]
+
+    def choose_transport(self, room_id: str) -> Decision:
+        """Pick LiveKit or P2P for the room's voice chat.
+
+        The choice is kept while the room has connected participants and for at
+        least ``hold`` seconds; only a fresh decision looks at the signals.
+        """
+        room = self._room(room_id)
+        previous = room.transport
+        heartbeat, livekit_rtt, loss = self._signals(room_id, room)
+        livekit_poor = (livekit_rtt is not None and livekit_rtt >= self.rtt_poor) or (
+            loss is not None and loss >= self.loss_poor
+        )
+
+        # /config клиент запрашивает раз за сессию: сменить транспорт при подключённых участниках —
+        # значит разделить голос комнаты на две группы, которые друг друга не слышат
+        if previous is not None and (room.peers > 0 or time.time() - previous.at < self.hold):
+            return previous
+        # Полносвязная P2P-сетка растёт квадратично — большие комнаты только через SFU
+        if room.peers > self.p2p_max_peers:
+            value, reason = LIVEKIT, "room_size"
+        elif livekit_poor:
+            value, reason = P2P, "livekit_degraded"
+        elif heartbeat is not None and heartbeat >= self.rtt_poor:
+            # Медленный канал участника: один поток до сервера вместо потока каждому соседу
+            value, reason = LIVEKIT, "high_latency"
+        elif previous is not None:
+            return previous
+        else:
+            value, reason = (LIVEKIT if _hash_split(room_id) else P2P), "hash"
+
+        if previous is not None and previous.value == value:
+            return previous
+        rtt_ms = heartbeat if heartbeat is not None else livekit_rtt
+        room.transport = self._record(room_id, room, TRANSPORT, value, reason, rtt_ms, loss)
+        return room.transport
+
+    def _record(self, room_id: str, room: RoomQoS, kind: str, value: str, reason: str,
+                rtt_ms: float | None, loss: float | None) -> Decision:
+        decision = Decision(kind, value, reason, time.time(), rtt_ms, loss, room.peers)
+        room.log.append(decision)
+        decisions.labels(kind=kind, value=value, reason=reason).inc()
+        qos_logger.info("[QoS] Room %s: %s -> %s (%s)", room_id, kind, value, reason,
+                        extra={"room_id": room_id, **decision.as_dict()})
+        return decision
+
+    def snapshot(self, room_id: str) -> dict:
+        """Current signals, profile, transport and decision log of the room."""
+        profile = self.profile(room_id)
+        room = self._room(room_id)
+        return {
+            "room_id": room_id,
+            "rtt_ms": room.rtt_ms,
+            "jitter_ms": room.jitter_ms,
+            "peers": room.peers,
+            "livekit": {kind: asdict(agg) for kind, agg in self.source.room_stats(room_id).items()},
+            "profile": profile.as_dict(),
+            "transport": room.transport.as_dict() if room.transport else None,
+            "decisions": [decision.as_dict() for decision in room.log],
+        }
+
+
+qos = QoSEngine()
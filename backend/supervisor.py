@@ -0,0 +1,312 @@
+"""Room sharding across worker processes on one host.
+
+``python -m backend.supervisor --workers N`` starts N uvicorn workers, each
+with its own event loop, and a router listening on the public port.  Rooms
+are spread over the workers by the consistent hash ring of
+:mod:`backend.ws.sharding`, and every connection of a room lands on the
+worker owning it.  A room's state therefore stays in one process and the
+workers need no broker between them.
+
+The router stays out of the data path.  It accepts a connection, peeks at the
+request line with ``MSG_PEEK`` so that nothing is consumed, and picks the
+worker: the owner of the request's room, or the next worker in turn for
+requests without a room.  It then passes the socket itself to that worker
+over a Unix socket (``SCM_RIGHTS``) and closes its copy.  The worker serves
+the connection as if it had accepted it.  Frames never cross the router.
+
+Each worker also listens on ``127.0.0.1:SHARD_BASE_PORT + index`` for health
+checks and its own ``/metrics``.  A worker that dies is restarted with the
+same index, so it takes back the same rooms.
+
+    python -m backend.supervisor --workers 4 --host 0.0.0.0 --port 8000
+"""
+import argparse
+import asyncio
+import os
+import signal
+import socket
+import sys
+
+from backend.config import logger, METRICS_PORT, SHARD_BASE_PORT
+from backend.ws.sharding import HashRing, route_key
+
+supervisor_logger = logger.getChild("supervisor")
+
+# Самая длинная строка запроса, которую роутер согласен ждать, и сколько её ждать
+MAX_REQUEST_LINE = 8192
+REQUEST_LINE_TIMEOUT = 10.0
+RESTART_DELAY = 1.0
+# Сколько соединение ждёт воркера, который ещё запускается или перезапускается
+WORKER_START_TIMEOUT = 30.0
+STOP_TIMEOUT = 10.0
+
+
+async def _wait_fd(fd_owner: socket.socket, writable: bool = False, timeout: float | None = None):
+    """Wait until the socket is readable (or writable); ``TimeoutError`` after ``timeout`` seconds."""
+    loop = asyncio.get_running_loop()
+    ready = loop.create_future()
+    add, remove = (loop.add_writer, loop.remove_writer) if writable else (loop.add_reader, loop.remove_reader)
+    add(fd_owner.fileno(), lambda: ready.done() or ready.set_result(None))
+    try:
+        await asyncio.wait_for(ready, timeout)
+    finally:
+        remove(fd_owner.fileno())
+
+
+async def peek_request_line(sock: socket.socket, timeout: float = REQUEST_LINE_TIMEOUT) -> bytes | None:
+    """First line of the HTTP request on ``sock``, read without consuming it.
+
+    ``None`` if the client closes the connection, sends no complete line of at
+    most :data:`MAX_REQUEST_LINE` bytes, or takes longer than ``timeout``.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while True:
+        try:
+            data = sock.recv(MAX_REQUEST_LINE, socket.MSG_PEEK)
+        except BlockingIOError:
+            data = None
+        except OSError:
+            return None
+        if data == b"":
+            return None
+        if data:
+            end = data.find(b"\r\n")
+            if end != -1:
+                return data[:end]
+            if len(data) >= MAX_REQUEST_LINE:
+                return None
+        remaining = deadline - loop.time()
+        if remaining <= 0:
+            return None
+        if data:
+            # Непрочитанные байты уже лежат в сокете — он «читаем» всегда, поэтому просто ждём остаток
+            await asyncio.sleep(min(0.005, remaining))
+        else:
+            try:
+                await _wait_fd(sock, timeout=remaining)
+            except asyncio.TimeoutError:
+                return None
+
+
+class Worker:
+    """One worker process and the Unix socket its connections are passed over."""
+
+    def __init__(self, index: int, count: int):
+        self.index = index
+        self.count = count
+        self.process: asyncio.subprocess.Process | None = None
+        self.channel: socket.socket | None = None
+        # Ждать места в канале может только одна задача: add_writer на один fd заменяет предыдущий
+        self._full = asyncio.Lock()
+        self.ready = asyncio.Event()  # канал открыт
+
+    async def start(self):
+        # SOCK_SEQPACKET сохраняет границы сообщений: один дескриптор — одно сообщение
+        parent, child = socket.socketpair(socket.AF_UNIX, socket.SOCK_SEQPACKET)
+        env = {**os.environ, "SHARD_INDEX": str(self.index), "SHARD_COUNT": str(self.count)}
+        if METRICS_PORT:
+            env["METRICS_PORT"] = str(METRICS_PORT + self.index)
+        try:
+            self.process = await asyncio.create_subprocess_exec(
+                sys.executable, "-m", "backend.supervisor", "--worker", str(child.fileno()),
+                pass_fds=(child.fileno(),), env=env,
+            )
+        finally:
+            child.close()
+        parent.setblocking(False)
+        self.channel = parent
+        self.ready.set()
+        supervisor_logger.info(f"[Supervisor] Worker {self.index} started, pid {self.process.pid}")
+
+    async def hand_over(self, sock: socket.socket):
+        """Pass an accepted connection to the worker; the caller closes its copy."""
+        async with self._full:
+            while True:
+                channel = self.channel
+                if channel is None:
+                    # Роутер принимает соединения сразу, а воркер может ещё запускаться
+                    try:
+                        await asyncio.wait_for(self.ready.wait(), WORKER_START_TIMEOUT)
+                    except asyncio.TimeoutError:
+                        raise ConnectionError(f"worker {self.index} is not running") from None
+                    continue
+                try:
+                    socket.send_fds(channel, [b"c"], [sock.fileno()])
+                    return
+                except BlockingIOError:
+                    # Воркер не успевает забирать соединения — ждём места в буфере канала
+                    await _wait_fd(channel, writable=True)
+
+    def close_channel(self):
+        self.ready.clear()
+        if self.channel is not None:
+            self.channel.close()
+            self.channel = None
+
+
+class Supervisor:
+    def __init__(self, host: str, port: int, workers: int):
+        self.host = host
+        self.port = port
+        self.ring = HashRing(workers)
+        self.workers = [Worker(index, workers) for index in range(workers)]
+        self._next = 0  # для запросов без комнаты — по кругу
+        self._stopping = asyncio.Event()
+        self._tasks: set[asyncio.Task] = set()
+
+    def pick(self, request_line: bytes) -> Worker:
+        """Worker for a request: the owner of its room, otherwise the next one in turn."""
+        parts = request_line.split(b" ")
+        room_id = route_key(parts[1].decode("latin-1")) if len(parts) == 3 else None
+        if room_id is not None:
+            return self.workers[self.ring.owner(room_id)]
+        self._next = (self._next + 1) % len(self.workers)
+        return self.workers[self._next]
+
+    async def _route(self, sock: socket.socket):
+        try:
+            request_line = await peek_request_line(sock)
+            if request_line is not None:
+                worker = self.pick(request_line)
+                await worker.hand_over(sock)
+        except (OSError, ConnectionError) as e:
+            supervisor_logger.warning(f"[Supervisor] Could not route connection: {e}")
+        finally:
+            sock.close()
+
+    async def _accept(self, listener: socket.socket):
+        loop = asyncio.get_running_loop()
+        while True:
+            sock, _ = await loop.sock_accept(listener)
+            sock.setblocking(False)
+            task = asyncio.create_task(self._route(sock))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _watch(self, worker: Worker):
+        while not self._stopping.is_set():
+            await worker.start()
+            code = await worker.process.wait()
+            worker.close_channel()
+            if self._stopping.is_set():
+                return
+            supervisor_logger.error(f"[Supervisor] Worker {worker.index} exited with {code}, restarting")
+            await asyncio.sleep(RESTART_DELAY)
+
+    async def _stop_workers(self):
+        for worker in self.workers:
+            # Закрытый канал для воркера — сигнал завершиться
+            worker.close_channel()
+            if worker.process is not None and worker.process.returncode is None:
+                worker.process.terminate()
+        for worker in self.workers:
+            if worker.process is None:
+                continue
+            try:
+                await asyncio.wait_for(worker.process.wait(), STOP_TIMEOUT)
+            except asyncio.TimeoutError:
+                worker.process.kill()
+                await worker.process.wait()
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, self._stopping.set)
+
+        listener = socket.create_server((self.host, self.port), backlog=2048)
+        listener.setblocking(False)
+        watchers = [asyncio.create_task(self._watch(worker)) for worker in self.workers]
+        accept = asyncio.create_task(self._accept(listener))
+        supervisor_logger.info(
+            f"[Supervisor] Routing http://{self.host}:{self.port} to {len(self.workers)} workers"
+        )
+        try:
+            await self._stopping.wait()
+        finally:
+            accept.cancel()
+            listener.close()
+            await self._stop_workers()
+            for task in [*watchers, *self._tasks]:
+                task.cancel()
+            await asyncio.gather(accept, *watchers, *self._tasks, return_exceptions=True)
+        supervisor_logger.info("[Supervisor] Stopped")
+
+
+async def _receive_connections(server, channel: socket.socket):
+    """Serve the connections the router passes over ``channel`` with ``server``'s protocol."""
+    loop = asyncio.get_running_loop()
+    config = server.config
+
+    def protocol():
+        return config.http_protocol_class(
+            config=config, server_state=server.server_state, app_state=server.lifespan.state,
+        )
+
+    # Переданные до старта соединения ждут в буфере канала
+    while not server.started:
+        if server.should_exit:
+            return
+        await asyncio.sleep(0.05)
+
+    while not server.should_exit:
+        try:
+            message, fds, _, _ = socket.recv_fds(channel, 16, 16)
+        except BlockingIOError:
+            await _wait_fd(channel)
+            continue
+        if not message:
+            # Супервизор закрыл канал — завершаемся вместе с ним
+            server.should_exit = True
+            return
+        for fd in fds:
+            sock = socket.socket(fileno=fd)
+            sock.setblocking(False)
+            try:
+                await loop.connect_accepted_socket(protocol, sock)
+            except OSError as e:
+                supervisor_logger.warning(f"[Worker] Dropping connection passed by the router: {e}")
+                sock.close()
+
+
+async def _serve_worker(channel_fd: int):
+    import uvicorn
+
+    from backend.config import SHARD_INDEX
+    from backend.main import app
+    from backend.ws.compression import CompressingWebSocketProtocol
+
+    channel = socket.socket(fileno=channel_fd)
+    channel.setblocking(False)
+    config = uvicorn.Config(
+        app, host="127.0.0.1", port=SHARD_BASE_PORT + SHARD_INDEX, ws=CompressingWebSocketProtocol,
+        log_config=None,
+    )
+    server = uvicorn.Server(config)
+    # Без SHARD_BASE_PORT воркер не слушает своего порта и получает соединения только от роутера
+    sockets = [] if not SHARD_BASE_PORT else None
+    receiver = asyncio.create_task(_receive_connections(server, channel))
+    try:
+        await server.serve(sockets)
+    finally:
+        receiver.cancel()
+        await asyncio.gather(receiver, return_exceptions=True)
+        channel.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the backend as room-sharded worker processes")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--worker", type=int, metavar="FD", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker is not None:
+        asyncio.run(_serve_worker(args.worker))
+        return
+    asyncio.run(Supervisor(args.host, args.port, args.workers).run())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+"""Pub/sub brokers that relay room traffic between server nodes.
+
+Each node only holds the sockets of its own clients, so every frame a node
+emits for a room is also published on that room's channel; the nodes hosting
+other members of the room deliver it to their local sockets.  A node is
+subscribed to a room's channel only while it hosts at least one of its members.
+
+Envelopes are JSON-serialisable dicts (``node``, ``kind``, ``message`` plus
+optional ``target``/``exclude``/``participants``); the receiving side lives in
+:meth:`DBConnectionManager._on_broker_message`.
+
+* :class:`InProcessBroker` – nodes in one process sharing an
+  :class:`InProcessHub`; with a private hub (the default) it is a single node.
+* :class:`RedisBroker` – Redis pub/sub with one channel per room, optionally
+  sharded pub/sub (``SPUBLISH``/``SSUBSCRIBE``) so Redis Cluster routes each
+  room's channel to a single shard.
+"""
+import asyncio
+from typing import Awaitable, Callable, Dict
+
+from backend.config import logger, WS_BROKER, REDIS_URL, REDIS_CHANNEL_PREFIX, REDIS_SHARDED_PUBSUB
+from backend.ws.frames import encode, decode, DecodeError
+
+Handler = Callable[[str, dict], Awaitable[None]]
+
+
+class Broker:
+    """Interface of a room pub/sub transport."""
+
+    def __init__(self):
+        self.handler: Handler | None = None
+        # Единственный узел: все подключения комнаты видны этому процессу
+        self.single_node = False
+
+    def bind(self, handler: Handler):
+        """Set the coroutine called with ``(room_id, envelope)`` for every received envelope."""
+        self.handler = handler
+
+    async def publish(self, room_id: str, envelope: dict):
+        raise NotImplementedError
+
+    async def subscribe(self, room_id: str):
+        raise NotImplementedError
+
+    async def unsubscribe(self, room_id: str):
+        raise NotImplementedError
+
+    async def close(self):
+        pass
+
+    async def _dispatch(self, room_id: str, envelope: dict):
+        if self.handler is None:
+            return
+        try:
+            await self.handler(room_id, envelope)
+        except Exception as e:
+            logger.warning(f"[Broker] Failed to handle envelope for room {room_id}: {e}")
+
+
+class InProcessHub:
+    """Shared subscription table for brokers living in one process."""
+
+    def __init__(self):
+        self.subscribers: Dict[str, set["InProcessBroker"]] = {}
+
+
+class InProcessBroker(Broker):
+    def __init__(self, hub: InProcessHub | None = None):
+        super().__init__()
+        self.single_node = hub is None
+        self.hub = hub or InProcessHub()
+
+    async def publish(self, room_id: str, envelope: dict):
+        peers = [b for b in self.hub.subscribers.get(room_id, ()) if b is not self]
+        if not peers:
+            return
+        # Та же сериализация, что и по сети: конверт не должен зависеть от общих объектов
+        payload = encode(envelope)
+        for broker in peers:
+            await broker._dispatch(room_id, decode(payload))
+
+    async def subscribe(self, room_id: str):
+        self.hub.subscribers.setdefault(room_id, set()).add(self)
+
+    async def unsubscribe(self, room_id: str):
+        subscribers = self.hub.subscribers.get(room_id)
+        if subscribers is not None:
+            subscribers.discard(self)
+            if not subscribers:
+                del self.hub.subscribers[room_id]
+
+    async def close(self):
+        for room_id in [r for r, subs in self.hub.subscribers.items() if self in subs]:
+            await self.unsubscribe(room_id)
+
+
+class RedisBroker(Broker):
+    def __init__(
+        self,
+        url: str = REDIS_URL,
+        prefix: str = REDIS_CHANNEL_PREFIX,
+        sharded: bool = REDIS_SHARDED_PUBSUB,
+        client=None,
+    ):
+        super().__init__()
+        if client is None:
+            import redis.asyncio as redis  # optional dependency, needed only for WS_BROKER=redis
+            client = redis.from_url(url)
+        self.redis = client
+        self.prefix = f"{prefix}:room:"
+        self.sharded = sharded
+        self._pubsub = client.pubsub()
+        self._listener: asyncio.Task | None = None
+
+    def channel(self, room_id: str) -> str:
+        return f"{self.prefix}{room_id}"
+
+    async def publish(self, room_id: str, envelope: dict):
+        publish = self.redis.spublish if self.sharded else self.redis.publish
+        await publish(self.channel(room_id), encode(envelope))
+
+    async def subscribe(self, room_id: str):
+        if self.sharded:
+            await self._pubsub.ssubscribe(self.channel(room_id))
+        else:
+            await self._pubsub.subscribe(self.channel(room_id))
+        if self._listener is None or self._listener.done():
+            self._listener = asyncio.create_task(self._listen())
+
+    async def unsubscribe(self, room_id: str):
+        if self.sharded:
+            await self._pubsub.sunsubscribe(self.channel(room_id))
+        else:
+            await self._pubsub.unsubscribe(self.channel(room_id))
+
+    async def _listen(self):
+        # listen() завершается сам, когда подписок не осталось; subscribe() перезапустит его
+        async for message in self._pubsub.listen():
+            if message["type"] not in ("message", "smessage"):
+                continue
+            channel = message["channel"]
+            if isinstance(channel, bytes):
+                channel = channel.decode()
+            try:
+                envelope = decode(message["data"])
+            except DecodeError:
+                logger.warning(f"[Broker] Dropping malformed envelope on {channel}")
+                continue
+            await self._dispatch(channel[len(self.prefix):], envelope)
+
+    async def close(self):
+        if self._listener is not None:
+            self._listener.cancel()
+        await self._pubsub.aclose()
+        await self.redis.aclose()
+
+
+def create_broker(kind: str = WS_BROKER) -> Broker:
+    """Build the broker selected by ``WS_BROKER`` (``memory`` or ``redis``)."""
+    if kind == "memory":
+        return InProcessBroker()
+    if kind == "redis":
+        return RedisBroker()
+    raise ValueError(f"Unknown WS_BROKER: {kind}")
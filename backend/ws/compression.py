@@ -0,0 +1,173 @@
+"""permessage-deflate with a per-frame compression policy.
+
+uvicorn negotiates permessage-deflate for every WebSocket and then deflates
+every frame with fixed settings.  :class:`CompressingWebSocketProtocol` keeps
+the extension but lets :class:`CompressionPolicy` decide per message, so CPU
+can be traded for egress: frames whose type is in ``always`` are compressed,
+types in ``never`` are sent as is, everything else is compressed from
+``min_size`` bytes.  RFC 7692 allows uncompressed messages on a deflate
+connection, so clients need nothing special.
+
+The protocol also takes its keepalive settings from ``WS_PING_INTERVAL`` /
+``WS_PING_TIMEOUT``: a peer that does not answer a ping in time is failed with
+1011, which ends the endpoint's receive loop and its cleanup runs.
+
+Run the server with ``--ws backend.ws.compression:CompressingWebSocketProtocol``;
+uvicorn 0.44 is the first release whose sans-I/O protocol has these keepalive
+hooks.
+"""
+import time
+from dataclasses import dataclass
+
+from prometheus_client import Counter, Histogram
+from uvicorn.protocols.websockets.websockets_sansio_impl import WebSocketsSansIOProtocol
+from websockets.extensions.permessage_deflate import PerMessageDeflate, ServerPerMessageDeflateFactory
+from websockets.frames import CTRL_OPCODES, Opcode
+
+from backend.config import (
+    WS_COMPRESSION, WS_COMPRESSION_MIN_SIZE, WS_COMPRESSION_TYPES, WS_COMPRESSION_SKIP_TYPES,
+    WS_COMPRESSION_LEVEL, WS_COMPRESSION_WINDOW_BITS, WS_PING_INTERVAL, WS_PING_TIMEOUT,
+)
+from backend.ws import schema
+
+compression_bytes = Counter(
+    "cinemate_ws_compression_bytes_total",
+    "Payload bytes of compressed WebSocket messages before (in) and after (out) deflate",
+    ["stage"],
+)
+compression_seconds = Counter(
+    "cinemate_ws_compression_seconds_total",
+    "Time spent deflating outbound WebSocket messages",
+)
+compression_messages = Counter(
+    "cinemate_ws_compression_messages_total",
+    "Outbound WebSocket messages by compression decision",
+    ["result"],
+)
+ping_rtt = Histogram(
+    "cinemate_ws_ping_rtt_seconds",
+    "Round trip time of server keepalive pings",
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+ping_timeouts = Counter(
+    "cinemate_ws_ping_timeouts_total",
+    "WebSocket connections failed because a keepalive ping went unanswered",
+)
+
+_JSON_TYPE_PREFIX = b'{"type":"'
+
+
+def message_type(data: bytes, opcode) -> str | None:
+    """Type of a frame built by :mod:`backend.ws.frames`, read from its first bytes.
+
+    Server frames always start with their type (``{"type":"...`` in JSON, the
+    tag right after the array header in MessagePack); ``None`` if unknown.
+    """
+    data = bytes(data[:32])
+    if opcode is Opcode.TEXT:
+        if data.startswith(_JSON_TYPE_PREFIX):
+            end = data.find(b'"', len(_JSON_TYPE_PREFIX))
+            if end != -1:
+                return data[len(_JSON_TYPE_PREFIX):end].decode(errors="replace")
+        return None
+    if opcode is Opcode.BINARY and data:
+        # fixarray (0x91–0x9f) или array16 (0xdc + 2 байта длины), за ним positive fixint-тег
+        offset = 1 if 0x91 <= data[0] <= 0x9f else 3 if data[0] == 0xdc else None
+        if offset is not None and len(data) > offset:
+            spec = schema.BY_TAG.get(data[offset])
+            return spec.type if spec else None
+    return None
+
+
+def parse_types(value: str) -> frozenset[str]:
+    return frozenset(t.strip() for t in value.split(",") if t.strip())
+
+
+@dataclass(frozen=True)
+class CompressionPolicy:
+    min_size: int
+    always: frozenset[str] = frozenset()
+    never: frozenset[str] = frozenset()
+
+    def should_compress(self, data: bytes, opcode) -> bool:
+        kind = message_type(data, opcode)
+        if kind in self.always:
+            return True
+        if kind in self.never:
+            return False
+        return len(data) >= self.min_size
+
+
+class PolicyPerMessageDeflate(PerMessageDeflate):
+    def __init__(self, *args, policy: CompressionPolicy, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.policy = policy
+        # Решение принимается по первому кадру сообщения и действует до его конца
+        self._skip_message = False
+
+    def encode(self, frame):
+        if frame.opcode in CTRL_OPCODES:
+            return frame
+        if frame.opcode is not Opcode.CONT:
+            self._skip_message = not self.policy.should_compress(frame.data, frame.opcode)
+            compression_messages.labels(result="skipped" if self._skip_message else "compressed").inc()
+        if self._skip_message:
+            return frame
+
+        started = time.perf_counter()
+        encoded = super().encode(frame)
+        compression_seconds.inc(time.perf_counter() - started)
+        compression_bytes.labels(stage="in").inc(len(frame.data))
+        compression_bytes.labels(stage="out").inc(len(encoded.data))
+        return encoded
+
+
+class PolicyDeflateFactory(ServerPerMessageDeflateFactory):
+    def __init__(self, policy: CompressionPolicy, window_bits: int = 12, level: int = 6):
+        super().__init__(
+            server_max_window_bits=window_bits,
+            client_max_window_bits=window_bits,
+            compress_settings={"level": level, "memLevel": 5},
+        )
+        self.policy = policy
+
+    def process_request_params(self, params, accepted_extensions):
+        response_params, extension = super().process_request_params(params, accepted_extensions)
+        return response_params, PolicyPerMessageDeflate(
+            extension.remote_no_context_takeover,
+            extension.local_no_context_takeover,
+            extension.remote_max_window_bits,
+            extension.local_max_window_bits,
+            extension.compress_settings,
+            policy=self.policy,
+        )
+
+
+def default_factory() -> PolicyDeflateFactory:
+    policy = CompressionPolicy(
+        min_size=WS_COMPRESSION_MIN_SIZE,
+        always=parse_types(WS_COMPRESSION_TYPES),
+        never=parse_types(WS_COMPRESSION_SKIP_TYPES),
+    )
+    return PolicyDeflateFactory(policy, window_bits=WS_COMPRESSION_WINDOW_BITS, level=WS_COMPRESSION_LEVEL)
+
+
+class CompressingWebSocketProtocol(WebSocketsSansIOProtocol):
+    """uvicorn's websockets protocol with :class:`PolicyDeflateFactory` and configured keepalive pings."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        enabled = WS_COMPRESSION and self.config.ws_per_message_deflate
+        self.conn.available_extensions = [default_factory()] if enabled else []
+        self.ping_interval = WS_PING_INTERVAL or None
+        self.ping_timeout = WS_PING_TIMEOUT or None
+
+    def handle_pong(self, event):
+        pending = self.pending_ping_payload
+        super().handle_pong(event)
+        if pending is not None and self.pending_ping_payload is None:
+            ping_rtt.observe(self.last_ping_rtt)
+
+    def keepalive_timeout(self):
+        ping_timeouts.inc()
+        super().keepalive_timeout()
@@ -1,192 +1,630 @@
 from typing import Dict
 from fastapi import WebSocket
-from sqlalchemy.orm import Session, joinedload
+from prometheus_client import Counter, Gauge, Histogram
+from sqlalchemy import func, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
 from backend.db.models import Room, User, RoomParticipant
-from backend.db.session import SessionLocal
-from backend.config import logger
+from backend.db.database import AsyncSessionLocal
+from backend.config import logger, WS_SEND_TIMEOUT, WS_OUTBOUND_QUEUE_SIZE, WS_OUTBOUND_POLICY
+from backend.ws.broker import Broker, create_broker
+from backend.ws.frames import encode, signal_frame, to_binary
+from backend.ws.outbound import OutboundQueue, parse_policies
+from backend.ws.resume import Session, SessionStore
+from backend.ws.room_state import (
+    RoomState, ParticipantState, PlaybackState, ADMIN_PERMISSIONS, GUEST_PERMISSIONS, USER_LEFT, USER_UPDATED,
+)
 from datetime import datetime
 from uuid import uuid4
-from contextlib import contextmanager
-import json
 import asyncio
+import time
+
+# Частые записи — в отдельном логгере, чтобы log_config.yaml мог их прореживать
+roster_logger = logger.getChild("ws.roster")
+
+active_rooms = Gauge(
+    "cinemate_ws_rooms",
+    "Rooms with at least one WebSocket connection on this node",
+)
+messages_out = Counter(
+    "cinemate_ws_messages_out_total",
+    "Outbound WebSocket frames queued for delivery, one per recipient",
+    ["type"],
+)
+broadcast_seconds = Histogram(
+    "cinemate_ws_broadcast_seconds",
+    "Time to fan a frame out to the local members of a room, including the wait for the room lock",
+    ["type"],
+    buckets=(0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0),
+)
+broadcast_recipients = Histogram(
+    "cinemate_ws_broadcast_recipients",
+    "Local recipients of one broadcast frame",
+    buckets=(0, 1, 2, 5, 10, 25, 50, 100, 250, 500, 1000),
+)
 
 
 class DBConnectionManager:
-    def __init__(self):
+    def __init__(
+        self,
+        send_timeout: float = WS_SEND_TIMEOUT,
+        queue_size: int = WS_OUTBOUND_QUEUE_SIZE,
+        overflow_policy: str = WS_OUTBOUND_POLICY,
+        broker: Broker | None = None,
+    ):
         self.active_connections: Dict[str, Dict[str, WebSocket]] = {}  # room_id -> {user_id: ws}
-        self._broadcast_lock = asyncio.Lock()
+        self.outbound: Dict[WebSocket, OutboundQueue] = {}
+        self.last_seen: Dict[WebSocket, float] = {}  # ws -> monotonic time of the last inbound frame
+        self.rooms: Dict[str, RoomState] = {}  # room_id -> authoritative in-memory state
+        self.sessions = SessionStore()
+        self.send_timeout = send_timeout
+        self.queue_size = queue_size
+        self.overflow_policies = parse_policies(overflow_policy)
+        # Один lock на комнату: сохраняет порядок событий внутри комнаты,
+        # но не даёт медленной комнате задерживать остальные.
+        self._room_locks: Dict[str, asyncio.Lock] = {}
+        self._close_tasks: set[asyncio.Task] = set()
+        # Остальные узлы видят комнату через брокер; свои же конверты узнаём по node_id
+        self.node_id = uuid4().hex
+        self.broker = broker or create_broker()
+        self.broker.bind(self._on_broker_message)
 
-    @contextmanager
-    def get_db(self) -> Session:
-        db = SessionLocal()
-        try:
-            yield db
-        finally:
-            db.close()
+    def get_db(self, method: str = "other") -> AsyncSession:
+        """Open an async session; use as ``async with manager.get_db("add_user") as db``.
+
+        Queries and commits of the session are timed under ``method``.
+        """
+        return AsyncSessionLocal(method=method)
 
-    async def connect(self, websocket: WebSocket, room_id: str, user_id: str):
-        await websocket.accept()
+    async def connect(self, websocket: WebSocket, room_id: str, user_id: str,
+                      binary: bool = False, subprotocol: str | None = None, accept: bool = True):
+        # accept=False — сокет уже принят: resume не удался, и клиент входит заново
+        if accept:
+            await websocket.accept(subprotocol=subprotocol)
+        first_in_room = room_id not in self.active_connections
+        self._register(websocket, room_id, user_id, binary)
+        if first_in_room:
+            await self.broker.subscribe(room_id)
+
+    def _register(self, websocket: WebSocket, room_id: str, user_id: str, binary: bool) -> OutboundQueue:
+        if room_id not in self.active_connections:
+            active_rooms.inc()
         self.active_connections.setdefault(room_id, {})[user_id] = websocket
+        queue = OutboundQueue(
+            websocket,
+            maxsize=self.queue_size,
+            policies=self.overflow_policies,
+            send_timeout=self.send_timeout,
+            on_close=lambda: self.disconnect(websocket, room_id, user_id),
+            binary=binary,
+        )
+        self.outbound[websocket] = queue
+        self.last_seen[websocket] = time.monotonic()
+        queue.start()
+        return queue
+
+    async def resume(self, websocket: WebSocket, session: Session, last_seq: int,
+                     binary: bool = False, subprotocol: str | None = None) -> bool | None:
+        """Attach a new socket to a parked or still-open session.
+
+        Queues a ``resumed`` frame followed by the room frames numbered after
+        ``last_seq``; returns ``False`` if they are no longer all buffered and
+        the client needs a full snapshot instead.  Returns ``None`` (with the
+        socket accepted) if the session ended before it could be taken over;
+        the client then has to join the room anew.
+        """
+        room_id, user_id = session.room_id, session.user_id
+        # Сессию забираем до первого await: пока принимаем сокет, срок парковки истечь не должен.
+        # Без таймера и без сокета она уже истекает — её уход идёт прямо сейчас
+        claimed = session.parked or self.get_websocket_by_user_id(room_id, user_id) is not None
+        self.sessions.unpark(session)
+        await websocket.accept(subprotocol=subprotocol)
+        # Старый сокет мог за это время оборваться и снова запарковать сессию — или уйти насовсем
+        self.sessions.unpark(session)
+        state = self.rooms.get(room_id)
+        if (not claimed or state is None or state.get(user_id) is None
+                or self.sessions.find(room_id, user_id) is not session):
+            return None
+        previous = self.get_websocket_by_user_id(room_id, user_id)
+        first_in_room = room_id not in self.active_connections
+
+        # Регистрация и досылка без await между ними: новый кадр комнаты не вклинится
+        # между пропущенными, и ни один не потеряется
+        queue = self._register(websocket, room_id, user_id, binary)
+        missed = state.replay.since(last_seq)
+        self._queue(queue, encode({
+            "type": "resumed",
+            "user_id": user_id,
+            "playback": state.playback.as_dict(),
+            "seq": state.replay.seq,
+            "replayed": missed is not None,
+        }), "resumed")
+        for _, message, kind, exclude in missed or ():
+            if exclude != user_id:
+                self._queue(queue, message, kind)
+
+        if previous is not None and previous is not websocket:
+            # Старый сокет ещё не заметил обрыва — закрываем, его уборка увидит новый
+            self.close(previous, code=1000)
+        if first_in_room:
+            await self.broker.subscribe(room_id)
+        return missed is not None
+
+    @staticmethod
+    def _queue(queue: OutboundQueue, message: str, kind: str | None):
+        queue.put(to_binary(message) if queue.binary else message, kind)
+        messages_out.labels(type=kind or "other").inc()
+
+    def touch(self, websocket: WebSocket):
+        """Record inbound activity on a connection, for idle reaping."""
+        if websocket in self.last_seen:
+            self.last_seen[websocket] = time.monotonic()
 
     def disconnect(self, websocket: WebSocket, room_id: str, user_id: str):
+        self.last_seen.pop(websocket, None)
+        queue = self.outbound.pop(websocket, None)
+        if queue is not None:
+            queue.close()
         if room_id in self.active_connections:
-            self.active_connections[room_id].pop(user_id, None)
+            if self.active_connections[room_id].get(user_id) is websocket:
+                del self.active_connections[room_id][user_id]
             if not self.active_connections[room_id]:
                 del self.active_connections[room_id]
+                active_rooms.dec()
+                self._room_locks.pop(room_id, None)
+                self._spawn(self._unsubscribe_if_idle(room_id))
+
+    async def _unsubscribe_if_idle(self, room_id: str):
+        # Пока задача ждала своей очереди, в комнату мог зайти новый клиент этого узла
+        if room_id not in self.active_connections:
+            await self.broker.unsubscribe(room_id)
+
+    def _spawn(self, coro):
+        task = asyncio.create_task(coro)
+        self._close_tasks.add(task)
+        task.add_done_callback(self._close_tasks.discard)
+
+    def _room_lock(self, room_id: str) -> asyncio.Lock:
+        lock = self._room_locks.get(room_id)
+        if lock is None:
+            lock = self._room_locks[room_id] = asyncio.Lock()
+        return lock
+
+    async def _send_text(self, ws: WebSocket, message: str) -> bool:
+        """Send a frame with a timeout; return ``False`` if the socket failed or stalled."""
+        try:
+            await asyncio.wait_for(ws.send_text(message), timeout=self.send_timeout)
+            return True
+        except asyncio.TimeoutError:
+            logger.warning(f"[Send] Timed out after {self.send_timeout}s, dropping stalled websocket")
+            self.close(ws, code=1013)
+        except Exception as e:
+            logger.warning(f"[Send] Failed to send to websocket: {e}")
+        return False
 
-    def add_user(self, room_id: str, username: str, user_id: str | None = None) -> User:
-        with self.get_db() as db:
+    def close(self, ws: WebSocket, code: int):
+        """Close a socket in the background so its receive loop runs the usual cleanup."""
+        async def _close():
+            try:
+                await asyncio.wait_for(ws.close(code=code), timeout=self.send_timeout)
+            except Exception:
+                pass
+
+        self._spawn(_close())
+
+    async def _load_room_state(self, db: AsyncSession, room_id: str) -> RoomState:
+        room = await db.get(Room, room_id)
+        participants = (await db.scalars(
+            select(RoomParticipant).options(joinedload(RoomParticipant.user)).filter_by(room_id=room_id)
+        )).all()
+        # Пока шла загрузка, состояние могло появиться из другой корутины — оно приоритетнее
+        return self.rooms.setdefault(room_id, RoomState.from_models(room_id, room, participants))
+
+    async def get_room_state(self, room_id: str) -> RoomState:
+        """Return the cached state of a room, loading it from the DB on first use."""
+        state = self.rooms.get(room_id)
+        if state is None:
+            async with self.get_db("get_room_state") as db:
+                state = await self._load_room_state(db, room_id)
+        return state
+
+    async def _persist_participant(self, room_id: str, user_id: str, **fields):
+        async with self.get_db("persist_participant") as db:
+            await db.execute(
+                update(RoomParticipant).filter_by(room_id=room_id, user_id=user_id).values(**fields)
+            )
+            await db.commit()
+
+    async def add_user(self, room_id: str, username: str, user_id: str | None = None) -> User:
+        async with self.get_db("add_user") as db:
             user = None
             if user_id:
-                user = db.query(User).filter_by(id=user_id).first()
+                user = await db.get(User, user_id)
             if not user:
                 user = User(id=user_id or str(uuid4()), name=username)
                 db.add(user)
-                db.commit()
-                db.refresh(user)
+                try:
+                    await db.commit()
+                except IntegrityError:
+                    if not user_id:
+                        raise
+                    # Тот же пользователь одновременно входит в комнату другого воркера
+                    await db.rollback()
+                    user = await db.get(User, user_id)
 
-            room = db.query(Room).filter_by(id=room_id).first()
+            room = await db.get(Room, room_id)
             if not room:
                 room = Room(id=room_id)
                 db.add(room)
-                db.commit()
-                db.refresh(room)
+                await db.commit()
 
-            participant = db.query(RoomParticipant).filter_by(user_id=user.id, room_id=room.id).first()
+            participant = await db.scalar(
+                select(RoomParticipant).filter_by(user_id=user.id, room_id=room.id).limit(1)
+            )
             if participant:
                 participant.connected = True
                 participant.joined_at = datetime.utcnow()
-                db.commit()
-                db.refresh(user)
-                return user
-
-            is_first = db.query(RoomParticipant).filter_by(room_id=room_id).count() == 0
-            role = "admin" if is_first else "guest"
-            permissions = {
-                "control_video": is_first,
-                "kick": is_first,
-                "change_video": is_first
-            }
-
-            participant = RoomParticipant(
-                user_id=user.id,
-                room_id=room.id,
-                role=role,
-                permissions=permissions,
-                connected=True
-            )
-            db.add(participant)
-            db.commit()
-            db.refresh(user)
+            else:
+                is_first = await db.scalar(
+                    select(func.count()).select_from(RoomParticipant).filter_by(room_id=room_id)
+                ) == 0
+                participant = RoomParticipant(
+                    user_id=user.id,
+                    room_id=room.id,
+                    role="admin" if is_first else "guest",
+                    permissions=dict(ADMIN_PERMISSIONS if is_first else GUEST_PERMISSIONS),
+                    connected=True
+                )
+                db.add(participant)
+            await db.commit()
+
+            state = self.rooms.get(room_id) or await self._load_room_state(db, room_id)
+            state.participants[user.id] = ParticipantState.from_model(participant, user.name)
             return user
 
-    def remove_user(self, room_id: str, user_id: str):
-        with self.get_db() as db:
-            participant = db.query(RoomParticipant).filter_by(room_id=room_id, user_id=user_id).first()
+    async def remove_user(self, room_id: str, user_id: str) -> bool:
+        """Mark a participant disconnected; return ``True`` if they were connected until now."""
+        was_connected = False
+        state = self.rooms.get(room_id)
+        if state is not None:
+            participant = state.get(user_id)
             if participant:
                 participant.connected = False
-                db.commit()
+                was_connected = True
+        await self._persist_participant(room_id, user_id, connected=False)
+        return was_connected
+
+    async def leave(self, websocket: WebSocket, room_id: str, user_id: str):
+        """Drop a closed connection and announce its user as gone unless they reconnected."""
+        self.disconnect(websocket, room_id, user_id)
+        # Пользователь мог переподключиться новым сокетом раньше, чем убрали старый
+        if self.get_websocket_by_user_id(room_id, user_id) is not None:
+            return
+        self.sessions.discard(room_id, user_id)
+        # Кикнутый участник уже объявлен ушедшим — второй user_left не нужен
+        if await self.remove_user(room_id, user_id):
+            await self.broadcast_roster(room_id, USER_LEFT, user_id)
+        self.release_room(room_id)
+
+    def park(self, room_id: str, user_id: str, grace: float, on_expire) -> bool:
+        """Keep a participant whose socket dropped in the room for ``grace`` seconds.
+
+        Returns ``False`` (the caller should let them leave) if they have no
+        session, were kicked or are connected through another socket.
+        """
+        session = self.sessions.find(room_id, user_id)
+        if grace <= 0 or session is None or self.get_participant(room_id, user_id) is None:
+            return False
+        if self.get_websocket_by_user_id(room_id, user_id) is not None:
+            return False
+        self.sessions.park(session, grace, on_expire)
+        return True
 
-    def get_user(self, room_id: str, user_id: str) -> User | None:
-        with self.get_db() as db:
-            participant = db.query(RoomParticipant).options(joinedload(RoomParticipant.user)).filter_by(
-                room_id=room_id, user_id=user_id, connected=True).first()
-            return participant.user if participant else None
+    def release_room(self, room_id: str):
+        """Drop the cached state of a room nobody is connected to any more."""
+        state = self.rooms.get(room_id)
+        if state is not None and not state.connected_participants():
+            # Последний участник ушёл — состояние перечитаем из БД при следующем входе
+            del self.rooms[room_id]
+
+    def get_user(self, room_id: str, user_id: str) -> ParticipantState | None:
+        return self.get_participant(room_id, user_id)
 
     def get_websocket_by_user_id(self, room_id: str, user_id: str) -> WebSocket | None:
         return self.active_connections.get(room_id, {}).get(user_id)
 
-    async def send_to(self, message: str, room_id: str, target_id: str):
-        """Send a message to a specific user in a room."""
+    async def send_personal(self, websocket: WebSocket, message: str, kind: str | None = None):
+        """Queue a message for a single connection."""
+        queue = self.outbound.get(websocket)
+        if queue is not None:
+            self._queue(queue, message, kind)
+        else:
+            await websocket.send_text(message)
+            messages_out.labels(type=kind or "other").inc()
+
+    async def send_to(self, message: str, room_id: str, target_id: str, kind: str | None = None):
+        """Send a message to a specific user in a room, on whichever node hosts them."""
+        if not await self._send_local(message, room_id, target_id, kind):
+            await self._publish(room_id, message, kind, target=target_id)
+
+    async def _send_local(self, message: str, room_id: str, target_id: str, kind: str | None) -> bool:
+        """Deliver to a socket of this node; return ``False`` if the user is not connected here."""
         ws = self.active_connections.get(room_id, {}).get(target_id)
-        if ws:
-            try:
-                await ws.send_text(message)
-            except Exception as e:
-                logger.warning(f"[SendTo] Failed to send to {target_id}: {e}")
-                self.disconnect(ws, room_id, target_id)
-
-    async def broadcast(self, message: str, room_id: str, sender: WebSocket = None):
-        async with self._broadcast_lock:
-            room_connections = self.active_connections.get(room_id, {})
-            to_disconnect = []
-            for user_id, ws in list(room_connections.items()):
-                if sender is None or ws != sender:
-                    try:
-                        await ws.send_text(message)
-                    except Exception as e:
-                        logger.warning(f"[Broadcast] Failed to send to websocket: {e}")
-                        to_disconnect.append((user_id, ws))
-
-            for user_id, ws in to_disconnect:
+        if not ws:
+            return False
+        queue = self.outbound.get(ws)
+        if queue is not None:
+            self._queue(queue, message, kind)
+        elif await self._send_text(ws, message):
+            messages_out.labels(type=kind or "other").inc()
+        else:
+            logger.warning(f"[SendTo] Failed to send to {target_id}")
+            self.disconnect(ws, room_id, target_id)
+        return True
+
+    async def relay(self, room_id: str, target_id: str, frames: list[str | bytes], kind: str):
+        """Send raw signalling frames to a user as one frame, converted only for the other protocol."""
+        ws = self.active_connections.get(room_id, {}).get(target_id)
+        queue = self.outbound.get(ws) if ws is not None else None
+        if queue is None:
+            await self.send_to(signal_frame(frames, binary=False), room_id, target_id, kind=kind)
+            return
+        queue.put(signal_frame(frames, queue.binary), kind)
+        messages_out.labels(type=kind).inc()
+
+    async def _publish(self, room_id: str, message: str, kind: str | None, **fields):
+        try:
+            await self.broker.publish(room_id, {"node": self.node_id, "kind": kind, "message": message, **fields})
+        except Exception as e:
+            logger.warning(f"[Broker] Failed to publish to room {room_id}: {e}")
+
+    async def _on_broker_message(self, room_id: str, envelope: dict):
+        """Deliver an envelope published by another node to the local members of the room."""
+        if envelope.get("node") == self.node_id:
+            return
+        if envelope.get("participants") is not None:
+            self._apply_participants(room_id, envelope["participants"], envelope.get("roster_version", 0))
+        if envelope.get("participant") is not None:
+            self._apply_participant(room_id, envelope["participant"], envelope.get("roster_version", 0))
+        if envelope.get("playback") is not None and room_id in self.rooms:
+            self.rooms[room_id].playback.sync_from(envelope["playback"])
+
+        message, kind = envelope["message"], envelope.get("kind")
+        target = envelope.get("target")
+        if target is not None:
+            await self._send_local(message, room_id, target, kind)
+        else:
+            await self._broadcast_local(message, room_id, kind, exclude=envelope.get("exclude"))
+
+    def _apply_participants(self, room_id: str, snapshot: list[dict], version: int):
+        """Replace the connected participants of a cached room with another node's snapshot."""
+        state = self.rooms.get(room_id)
+        if state is None:
+            return
+        present = set()
+        for data in snapshot:
+            participant = ParticipantState.from_wire(data)
+            state.participants[participant.user_id] = participant
+            present.add(participant.user_id)
+        for user_id, participant in state.participants.items():
+            if user_id not in present:
+                participant.connected = False
+        state.roster_version = max(state.roster_version, version)
+
+    def _apply_participant(self, room_id: str, data: dict, version: int):
+        """Apply one roster delta published by another node."""
+        state = self.rooms.get(room_id)
+        if state is None:
+            return
+        participant = ParticipantState.from_wire(data)
+        state.participants[participant.user_id] = participant
+        # Два узла могли выдать одну и ту же версию — клиенты увидят пропуск и запросят снимок
+        state.roster_version = max(state.roster_version, version)
+
+    async def broadcast(self, message: str, room_id: str, sender: WebSocket = None, kind: str | None = None):
+        """Send a message to every member of a room, on this node and on the others."""
+        exclude = None
+        if sender is not None:
+            exclude = next((uid for uid, ws in self.active_connections.get(room_id, {}).items() if ws == sender), None)
+        await self._publish(room_id, message, kind, exclude=exclude)
+        await self._broadcast_local(message, room_id, kind, exclude=exclude)
+
+    async def _broadcast_local(self, message: str, room_id: str, kind: str | None = None, exclude: str | None = None):
+        """Send a message to the members of a room connected to this node.
+
+        Connections registered through :meth:`connect` get the frame on their
+        outbound queue; any other socket is written to directly, bounded by
+        ``send_timeout``.  Sockets that fail or stall are dropped from the room
+        instead of holding up the other recipients.
+        """
+        started = time.perf_counter()
+        recipients = 0
+        try:
+            recipients = await self._fan_out(message, room_id, kind, exclude)
+        finally:
+            broadcast_seconds.labels(type=kind or "other").observe(time.perf_counter() - started)
+            broadcast_recipients.observe(recipients)
+            if recipients:
+                messages_out.labels(type=kind or "other").inc(recipients)
+
+    async def _fan_out(self, message: str, room_id: str, kind: str | None, exclude: str | None) -> int:
+        """Body of :meth:`_broadcast_local`; returns the number of recipients."""
+        async with self._room_lock(room_id):
+            state = self.rooms.get(room_id)
+            if state is not None:
+                # Кадр получает номер, по которому вернувшийся клиент догонит пропущенное
+                message = state.replay.record(message, kind, exclude)
+            sends = {}
+            binary = None
+            recipients = 0
+            for user_id, ws in list(self.active_connections.get(room_id, {}).items()):
+                if user_id == exclude:
+                    continue
+                recipients += 1
+                queue = self.outbound.get(ws)
+                if queue is not None and queue.binary:
+                    # Бинарная форма тоже строится один раз на событие
+                    if binary is None:
+                        binary = to_binary(message)
+                    queue.put(binary, kind)
+                elif queue is not None:
+                    queue.put(message, kind)
+                else:
+                    sends[asyncio.ensure_future(ws.send_text(message))] = (user_id, ws)
+            if not sends:
+                return recipients
+
+            done, pending = await asyncio.wait(sends, timeout=self.send_timeout)
+
+            for task in pending:
+                task.cancel()
+                user_id, ws = sends[task]
+                logger.warning(f"[Broadcast] Send to {user_id} timed out after {self.send_timeout}s, dropping stalled websocket")
+                self.close(ws, code=1013)
                 self.disconnect(ws, room_id, user_id)
 
+            for task in done:
+                if task.exception() is not None:
+                    user_id, ws = sends[task]
+                    logger.warning(f"[Broadcast] Failed to send to websocket: {task.exception()}")
+                    self.disconnect(ws, room_id, user_id)
+            return recipients
+
+    async def _promote_admin(self, room_id: str) -> ParticipantState | None:
+        """Make the earliest connected participant admin if no connected admin is left."""
+        state = self.rooms.get(room_id)
+        participants = state.connected_participants() if state else []
+        if not participants or any(p.role == "admin" for p in participants):
+            return None
+
+        new_admin = participants[0]
+        new_admin.role = "admin"
+        new_admin.permissions = dict(ADMIN_PERMISSIONS)
+        await self._persist_participant(room_id, new_admin.user_id, role=new_admin.role,
+                                        permissions=new_admin.permissions)
+        return new_admin
+
+    def users_snapshot(self, room_id: str) -> str:
+        """Encoded ``users_update`` frame: the full roster of a room and its version."""
+        state = self.rooms.get(room_id)
+        participants = state.connected_participants() if state else []
+        return encode({
+            "type": "users_update",
+            "version": state.roster_version if state else 0,
+            "users": [p.as_dict() for p in participants],
+        })
+
     async def broadcast_users(self, room_id: str):
-        with self.get_db() as db:
-            participants = db.query(RoomParticipant).options(joinedload(RoomParticipant.user)).filter_by(
-                room_id=room_id, connected=True).order_by(RoomParticipant.joined_at).all()
-
-            has_admin = any(p.role == "admin" for p in participants)
-            if not has_admin and participants:
-                new_admin = participants[0]
-                new_admin.role = "admin"
-                new_admin.permissions = {
-                    "control_video": True,
-                    "kick": True,
-                    "change_video": True
-                }
-                db.commit()
-
-            user_list = [
-                {
-                    "id": p.user.id,
-                    "name": p.user.name,
-                    "role": p.role,
-                    "permissions": p.permissions
-                }
-                for p in participants
-            ]
-
-            logger.info(f"Broadcasting users in room {room_id}: {len(user_list)} users")
-            await self.broadcast(json.dumps({
-                "type": "users_update",
-                "users": user_list
-            }), room_id)
-
-    def set_video(self, room_id: str, video_url: str) -> None:
-        with self.get_db() as db:
-            room = db.query(Room).filter_by(id=room_id).first()
+        """Send the full roster to every member of a room.
+
+        The WebSocket endpoint announces changes with :meth:`broadcast_roster`
+        and only sends this snapshot to a joining or out-of-sync client.
+        """
+        await self._promote_admin(room_id)
+        state = self.rooms.get(room_id)
+        participants = state.connected_participants() if state else []
+
+        roster_logger.info("Broadcasting users in room %s: %d users", room_id, len(participants),
+                           extra={"room_id": room_id, "users": len(participants)})
+        message = self.users_snapshot(room_id)
+        # Вместе с кадром другие узлы получают снимок участников для своего RoomState
+        await self._publish(room_id, message, "users_update", participants=[p.to_wire() for p in participants],
+                            roster_version=state.roster_version if state else 0)
+        await self._broadcast_local(message, room_id, kind="users_update")
+
+    async def broadcast_roster(self, room_id: str, event: str, user_id: str, exclude: str | None = None):
+        """Announce one roster change as a versioned ``user_joined``/``user_left``/``user_updated`` delta.
+
+        If the change left the room without a connected admin, the earliest
+        participant is promoted and announced with a follow-up ``user_updated``.
+        """
+        state = self.rooms.get(room_id)
+        participant = state.participants.get(user_id) if state else None
+        if participant is None:
+            return
+        await self._send_roster_delta(room_id, state, event, participant, exclude)
+
+        new_admin = await self._promote_admin(room_id)
+        if new_admin is not None:
+            await self._send_roster_delta(room_id, state, USER_UPDATED, new_admin, exclude)
+
+    async def _send_roster_delta(self, room_id: str, state: RoomState, event: str,
+                                 participant: ParticipantState, exclude: str | None):
+        state.roster_version += 1
+        frame = {"type": event, "version": state.roster_version}
+        if event == USER_LEFT:
+            frame["user_id"] = participant.user_id
+        else:
+            frame["user"] = participant.as_dict()
+        message = encode(frame)
+        # Другие узлы применяют ту же дельту к своему RoomState
+        await self._publish(room_id, message, event, exclude=exclude,
+                            participant=participant.to_wire(), roster_version=state.roster_version)
+        await self._broadcast_local(message, room_id, kind=event, exclude=exclude)
+
+    async def set_video(self, room_id: str, video_url: str) -> None:
+        (await self.get_room_state(room_id)).current_video_url = video_url
+        async with self.get_db("set_video") as db:
+            room = await db.get(Room, room_id)
             if not room:
                 room = Room(id=room_id, current_video_url=video_url)
                 db.add(room)
             else:
                 room.current_video_url = video_url
-            db.commit()
+            await db.commit()
 
-    def set_permissions(self, room_id: str, target_id: str, new_permissions: dict) -> bool:
-        with self.get_db() as db:
-            participant = db.query(RoomParticipant).filter_by(room_id=room_id, user_id=target_id).first()
-            if participant:
-                participant.permissions = {
-                    **participant.permissions,
-                    **new_permissions
-                }
-                db.commit()
-                return True
-        return False
+    async def set_playback(self, room_id: str, event: str, position: float | None = None,
+                           rate: float | None = None) -> PlaybackState:
+        """Apply a play/pause/seek event to the room's playback clock (in memory only)."""
+        playback = (await self.get_room_state(room_id)).playback
+        playback.apply(event, position, rate)
+        return playback
 
-    def kick_user(self, room_id: str, target_id: str) -> bool:
-        with self.get_db() as db:
-            participant = db.query(RoomParticipant).filter_by(room_id=room_id, user_id=target_id).first()
-            if participant:
-                participant.connected = False
-                db.commit()
-                return True
-        return False
+    async def broadcast_playback(self, room_id: str, event: str, user_id: str | None = None):
+        """Send the room's current playback clock as a ``play``/``pause``/``seek`` frame."""
+        state = self.rooms.get(room_id)
+        if state is None:
+            return
+        snapshot = state.playback.as_dict()
+        message = encode({
+            "type": event,
+            "user_id": user_id,
+            "timestamp": snapshot["position"],
+            "playback": snapshot,
+        })
+        await self._publish(room_id, message, event, playback=snapshot)
+        await self._broadcast_local(message, room_id, kind=event)
+
+    async def save_playback(self, room_id: str) -> None:
+        """Write the room's current playback clock through to the database."""
+        state = self.rooms.get(room_id)
+        if state is None:
+            return
+        async with self.get_db("save_playback") as db:
+            await db.execute(update(Room).filter_by(id=room_id).values(**state.playback.model_fields()))
+            await db.commit()
+
+    async def set_permissions(self, room_id: str, target_id: str, new_permissions: dict) -> bool:
+        participant = (await self.get_room_state(room_id)).get(target_id, connected=False)
+        if not participant:
+            return False
+        participant.permissions = {
+            **participant.permissions,
+            **new_permissions
+        }
+        await self._persist_participant(room_id, target_id, permissions=participant.permissions)
+        return True
+
+    async def kick_user(self, room_id: str, target_id: str) -> bool:
+        participant = (await self.get_room_state(room_id)).get(target_id, connected=False)
+        if not participant:
+            return False
+        participant.connected = False
+        self.sessions.discard(room_id, target_id)
+        await self._persist_participant(room_id, target_id, connected=False)
+        return True
 
-    def get_participant(self, room_id: str, user_id: str) -> RoomParticipant | None:
-        with self.get_db() as db:
-            return db.query(RoomParticipant) \
-                .options(joinedload(RoomParticipant.user)) \
-                .filter_by(room_id=room_id, user_id=user_id, connected=True) \
-                .first()
+    def get_participant(self, room_id: str, user_id: str) -> ParticipantState | None:
+        state = self.rooms.get(room_id)
+        return state.get(user_id) if state else None
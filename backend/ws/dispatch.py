@@ -0,0 +1,95 @@
+"""Registry of WebSocket message handlers.
+
+Each inbound message type maps to an async handler; :meth:`Dispatcher.dispatch`
+looks the type up, validates the frame with the type's pydantic model from
+:mod:`backend.ws.schema` and only then calls the handler, so malformed frames
+are rejected before any handler (or the database) sees them.  Handler time
+and failures are recorded per message type.
+"""
+import time
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict
+
+from fastapi import WebSocket
+from prometheus_client import Counter, Histogram
+
+from backend.config import logger
+from backend.ws import schema
+
+handler_seconds = Histogram(
+    "cinemate_ws_handler_seconds",
+    "Time spent handling one inbound WebSocket message",
+    ["type"],
+    buckets=(0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0),
+)
+handler_errors = Counter(
+    "cinemate_ws_handler_errors_total",
+    "Inbound WebSocket messages whose handler raised",
+    ["type"],
+)
+messages_in = Counter(
+    "cinemate_ws_messages_in_total",
+    "Inbound WebSocket messages that passed validation",
+    ["type"],
+)
+rejected_frames = Counter(
+    "cinemate_ws_rejected_frames_total",
+    "Inbound WebSocket frames dropped before reaching a handler",
+    ["type", "reason"],
+)
+
+
+@dataclass
+class Connection:
+    """The socket a message arrived on, passed to every handler."""
+    websocket: WebSocket
+    room_id: str
+    user_id: str
+
+
+Handler = Callable[[Connection, schema.ClientMessage], Awaitable[None]]
+
+
+class Dispatcher:
+    def __init__(self):
+        self.handlers: Dict[str, Handler] = {}
+
+    def route(self, *types: str) -> Callable[[Handler], Handler]:
+        """Register the decorated coroutine as the handler of ``types``."""
+        unknown = [t for t in types if t not in schema.INBOUND]
+        if unknown:
+            raise ValueError(f"No inbound schema for message type: {', '.join(unknown)}")
+
+        def register(handler: Handler) -> Handler:
+            for message_type in types:
+                self.handlers[message_type] = handler
+            return handler
+        return register
+
+    def reject(self, reason: str, message_type: str = "unknown"):
+        rejected_frames.labels(type=message_type, reason=reason).inc()
+
+    async def dispatch(self, conn: Connection, data) -> bool:
+        """Validate and handle one decoded frame; return ``False`` if it was rejected."""
+        message_type = data.get("type") if isinstance(data, dict) else None
+        handler = self.handlers.get(message_type)
+        if handler is None:
+            self.reject("unknown_type")
+            return False
+        try:
+            message = schema.validate(data)
+        except schema.SchemaError as e:
+            self.reject("invalid", message_type)
+            logger.warning(f"[WS] Ignoring invalid frame from {conn.user_id} in room {conn.room_id}: {e}")
+            return False
+
+        messages_in.labels(type=message_type).inc()
+        started = time.perf_counter()
+        try:
+            await handler(conn, message)
+        except Exception as e:
+            handler_errors.labels(type=message_type).inc()
+            logger.exception(f"[WS] Handler for {message_type!r} failed in room {conn.room_id}: {e}")
+        finally:
+            handler_seconds.labels(type=message_type).observe(time.perf_counter() - started)
+        return True
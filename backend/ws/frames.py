@@ -0,0 +1,122 @@
+"""Encoding of WebSocket frames and broker envelopes.
+
+Every outbound event is encoded exactly once, and the resulting text is what
+gets queued for each recipient.  The fastest available encoder is used:
+``orjson``, then ``msgspec``, then the standard library.
+
+Clients may negotiate the binary protocol instead (``?protocol=msgpack`` or
+the ``cinemate.msgpack`` subprotocol): frames are then the MessagePack form of
+:mod:`backend.ws.schema`, converted from the JSON text once per event.
+"""
+import json
+
+from backend.ws import schema
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - depends on the environment
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - depends on the environment
+    msgpack = None
+
+try:
+    import msgspec
+    import msgspec.json as msgspec_json
+except ImportError:  # pragma: no cover - depends on the environment
+    msgspec = msgspec_json = None
+
+if orjson is not None:
+    ENCODER = "orjson"
+
+    def encode(obj) -> str:
+        return orjson.dumps(obj).decode()
+
+    decode = orjson.loads
+elif msgspec_json is not None:
+    ENCODER = "msgspec"
+    _encoder = msgspec_json.Encoder()
+
+    def encode(obj) -> str:
+        return _encoder.encode(obj).decode()
+
+    decode = msgspec_json.Decoder().decode
+else:
+    ENCODER = "json"
+
+    def encode(obj) -> str:
+        return json.dumps(obj, separators=(",", ":"), ensure_ascii=False)
+
+    decode = json.loads
+
+# Исключения, которыми decode() сообщает о некорректном кадре
+DecodeError = (ValueError, TypeError) if msgspec is None else (ValueError, TypeError, msgspec.DecodeError)
+
+JSON = "json"
+MSGPACK = "msgpack"
+SUBPROTOCOLS = {"cinemate.json": JSON, "cinemate.msgpack": MSGPACK}
+PROTOCOLS = (JSON, MSGPACK) if msgpack is not None else (JSON,)
+
+
+def negotiate(requested: str | None, offered: list[str]) -> tuple[str, str | None]:
+    """Pick the wire protocol and the subprotocol to accept the socket with.
+
+    A supported subprotocol offered by the client wins over the ``protocol``
+    query parameter; anything unknown falls back to JSON.
+    """
+    for subprotocol in offered:
+        protocol = SUBPROTOCOLS.get(subprotocol)
+        if protocol in PROTOCOLS:
+            return protocol, subprotocol
+    return (requested if requested in PROTOCOLS else JSON), None
+
+
+def with_seq(message: str, seq: int) -> str:
+    """Add the room sequence number to an encoded frame without re-encoding it."""
+    # Кадр — непустой объект (в нём всегда есть type), поэтому хватает подстановки перед "}"
+    return f'{message[:-1]},"seq":{seq}}}'
+
+
+def encode_binary(obj: dict) -> bytes:
+    return msgpack.packb(schema.pack(obj))
+
+
+def decode_binary(data: bytes) -> dict:
+    if msgpack is None:
+        raise schema.SchemaError("binary protocol is not available")
+    return schema.unpack(msgpack.unpackb(data))
+
+
+def to_binary(message: str) -> bytes:
+    """Binary form of an already encoded JSON frame."""
+    return encode_binary(decode(message))
+
+
+def _in_protocol(frame: str | bytes, binary: bool) -> str | bytes:
+    if isinstance(frame, bytes) == binary:
+        return frame
+    return to_binary(frame) if binary else encode(decode_binary(frame))
+
+
+def signal_frame(frames: list[str | bytes], binary: bool) -> str | bytes:
+    """One outbound frame for relayed signalling frames, in the recipient's protocol.
+
+    A single frame already in that protocol goes out as received.  Several
+    frames are wrapped into a ``voice-candidates`` frame: binary frames, each
+    checked to be one complete MessagePack object, are embedded as they are;
+    JSON frames are decoded and the batch is encoded as a whole, so no frame
+    can change the structure of the batch around it.
+    """
+    if len(frames) == 1:
+        return _in_protocol(frames[0], binary)
+    if binary:
+        frames = [_in_protocol(frame, binary) for frame in frames]
+        packer = msgpack.Packer()
+        return (packer.pack_array_header(2) + packer.pack(schema.BY_TYPE["voice-candidates"].tag)
+                + packer.pack_array_header(len(frames)) + b"".join(frames))
+    return encode({
+        "type": "voice-candidates",
+        "frames": [decode_binary(frame) if isinstance(frame, bytes) else decode(frame) for frame in frames],
+    })
@@ -0,0 +1,179 @@
+"""Bounded per-connection outbound queues.
+
+Every accepted WebSocket gets an :class:`OutboundQueue` drained by its own
+writer task, so a slow receiver only ever delays itself.  When the queue is
+full the configured overflow policies are tried in order:
+
+* ``coalesce_seek`` – queued ``seek`` events superseded by a newer sync event
+  are discarded;
+* ``drop_oldest_chat`` – the oldest queued chat message is discarded;
+* ``disconnect`` – the connection is closed and dropped from its room.
+
+If no policy frees a slot the new frame itself is dropped.
+"""
+import asyncio
+from collections import deque
+from typing import Callable, Iterable
+
+from fastapi import WebSocket
+from prometheus_client import Counter, Gauge
+
+from backend.config import logger
+
+COALESCE_SEEK = "coalesce_seek"
+DROP_OLDEST_CHAT = "drop_oldest_chat"
+DISCONNECT = "disconnect"
+POLICIES = (COALESCE_SEEK, DROP_OLDEST_CHAT, DISCONNECT)
+
+SYNC_EVENTS = ("play", "pause", "seek")
+
+queue_depth = Gauge(
+    "cinemate_ws_outbound_queue_depth",
+    "Frames waiting in outbound WebSocket queues across all connections",
+)
+queue_drops = Counter(
+    "cinemate_ws_outbound_dropped_total",
+    "Outbound frames discarded because a connection queue was full",
+    ["reason"],
+)
+open_connections = Gauge(
+    "cinemate_ws_connections",
+    "WebSocket connections with a running outbound writer",
+)
+
+
+def parse_policies(value: str) -> tuple[str, ...]:
+    """Parse a comma separated policy list, e.g. ``"coalesce_seek,disconnect"``."""
+    policies = tuple(p.strip() for p in value.split(",") if p.strip())
+    unknown = [p for p in policies if p not in POLICIES]
+    if unknown:
+        raise ValueError(f"Unknown outbound overflow policy: {', '.join(unknown)}")
+    return policies
+
+
+class OutboundQueue:
+    def __init__(
+        self,
+        websocket: WebSocket,
+        maxsize: int,
+        policies: Iterable[str],
+        send_timeout: float,
+        on_close: Callable[[], None] | None = None,
+        binary: bool = False,
+    ):
+        self.websocket = websocket
+        self.maxsize = maxsize
+        self.policies = tuple(policies)
+        self.send_timeout = send_timeout
+        self.on_close = on_close
+        # Клиент договорился о бинарном протоколе — в очередь кладутся bytes
+        self.binary = binary
+        self.closed = False
+        self._items: deque[tuple[str | None, str | bytes]] = deque()
+        self._wakeup = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        self._close_task: asyncio.Task | None = None
+
+    @property
+    def depth(self) -> int:
+        return len(self._items)
+
+    def start(self):
+        self._task = asyncio.create_task(self._writer())
+        open_connections.inc()
+
+    def put(self, message: str | bytes, kind: str | None = None) -> bool:
+        """Enqueue a frame without blocking; return ``False`` if it was not queued."""
+        if self.closed:
+            return False
+
+        if len(self._items) >= self.maxsize and not self._make_room(kind):
+            return False
+
+        self._items.append((kind, message))
+        queue_depth.inc()
+        self._wakeup.set()
+        return True
+
+    def _make_room(self, kind: str | None) -> bool:
+        for policy in self.policies:
+            if policy == COALESCE_SEEK and self._drop_where(
+                lambda k: k == "seek", keep_last=kind not in SYNC_EVENTS, reason=COALESCE_SEEK
+            ):
+                return True
+            if policy == DROP_OLDEST_CHAT and self._drop_where(
+                lambda k: k == "chat", limit=1, reason=DROP_OLDEST_CHAT
+            ):
+                return True
+            if policy == DISCONNECT:
+                logger.warning("[Outbound] Queue overflow, disconnecting slow websocket")
+                queue_drops.labels(reason=DISCONNECT).inc(len(self._items) + 1)
+                self.close(code=1013)
+                return False
+
+        queue_drops.labels(reason="overflow").inc()
+        return False
+
+    def _drop_where(self, predicate, reason: str, limit: int | None = None, keep_last: bool = False) -> int:
+        matches = [i for i, (k, _) in enumerate(self._items) if predicate(k)]
+        if keep_last:
+            matches = matches[:-1]
+        if limit is not None:
+            matches = matches[:limit]
+        if not matches:
+            return 0
+
+        drop = set(matches)
+        self._items = deque(item for i, item in enumerate(self._items) if i not in drop)
+        queue_depth.dec(len(drop))
+        queue_drops.labels(reason=reason).inc(len(drop))
+        return len(drop)
+
+    async def _writer(self):
+        try:
+            # wait_for в Python 3.11 может проглотить cancel(), если отправка уже
+            # завершилась, поэтому дополнительно проверяем флаг closed
+            while not self.closed:
+                while not self._items and not self.closed:
+                    self._wakeup.clear()
+                    await self._wakeup.wait()
+                if self.closed:
+                    return
+                _, message = self._items.popleft()
+                queue_depth.dec()
+                send = self.websocket.send_bytes if isinstance(message, bytes) else self.websocket.send_text
+                await asyncio.wait_for(send(message), timeout=self.send_timeout)
+        except asyncio.CancelledError:
+            raise
+        except asyncio.TimeoutError:
+            logger.warning(f"[Outbound] Send timed out after {self.send_timeout}s, dropping stalled websocket")
+            self.close(code=1013)
+        except Exception as e:
+            logger.warning(f"[Outbound] Failed to send to websocket: {e}")
+            # Закрываем сокет, чтобы цикл приёма endpoint'а завершился и убрал участника
+            self.close(code=1011)
+
+    def close(self, code: int | None = None):
+        """Stop the writer, discard pending frames and optionally close the socket."""
+        if self.closed:
+            return
+        self.closed = True
+        if self._task is not None:
+            open_connections.dec()
+        queue_depth.dec(len(self._items))
+        self._items.clear()
+        self._wakeup.set()
+
+        current = asyncio.current_task()
+        if self._task and self._task is not current:
+            self._task.cancel()
+        if code is not None:
+            self._close_task = asyncio.create_task(self._close_socket(code))
+        if self.on_close:
+            self.on_close()
+
+    async def _close_socket(self, code: int):
+        try:
+            await asyncio.wait_for(self.websocket.close(code=code), timeout=self.send_timeout)
+        except Exception:
+            pass
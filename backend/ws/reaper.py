@@ -0,0 +1,146 @@
+"""Periodic reaping of dead WebSocket connections and stale participants.
+
+Half-open TCP connections are detected by the keepalive pings of the server
+protocol (see :mod:`backend.ws.compression`), which fails the socket so the
+endpoint's receive loop runs its cleanup.  :class:`Reaper` catches what slips
+through: every ``interval`` seconds it
+
+* closes connections that are already closed on either side, whose outbound
+  writer died, or that sent nothing for ``idle_timeout`` seconds, and runs the
+  endpoint's leave callback for them;
+* on a single node, reconciles ``RoomParticipant.connected`` (and the cached
+  :class:`RoomState`) with the sockets actually open, announcing stale
+  participants as gone.  With several nodes a participant may be connected to
+  another one, so this step is skipped.  Under the supervisor of
+  :mod:`backend.supervisor` each worker reconciles only the rooms it owns:
+  the database is shared, and participants of other rooms have their
+  sockets in other workers.
+"""
+import asyncio
+import time
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable
+
+from fastapi import WebSocket
+from prometheus_client import Counter, Gauge
+from sqlalchemy import select
+from starlette.websockets import WebSocketState
+
+from backend.config import logger, WS_IDLE_TIMEOUT, WS_REAPER_INTERVAL
+from backend.db.models import RoomParticipant
+from backend.ws.room_state import USER_LEFT
+from backend.ws.sharding import owns
+
+zombie_connections = Gauge(
+    "cinemate_ws_zombie_connections",
+    "Dead connections and stale participants found by the last reaper sweep",
+)
+reaped = Counter(
+    "cinemate_ws_reaped_total",
+    "Connections and participants cleaned up by the reaper",
+    ["reason"],
+)
+
+LeaveCallback = Callable[[WebSocket, str, str], Awaitable[None]]
+
+
+class Reaper:
+    def __init__(
+        self,
+        manager,
+        on_leave: LeaveCallback,
+        interval: float = WS_REAPER_INTERVAL,
+        idle_timeout: float = WS_IDLE_TIMEOUT,
+    ):
+        self.manager = manager
+        self.on_leave = on_leave
+        self.interval = interval
+        self.idle_timeout = idle_timeout
+        self._task: asyncio.Task | None = None
+
+    def start(self):
+        """Start the sweep loop in the running loop (no-op if it already runs there or is disabled)."""
+        if self.interval <= 0:
+            return
+        loop = asyncio.get_running_loop()
+        if self._task is not None and not self._task.done() and self._task.get_loop() is loop:
+            return
+        self._task = loop.create_task(self._run())
+
+    async def stop(self):
+        task, self._task = self._task, None
+        if task is None or task.done():
+            return
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.sweep()
+            except Exception as e:
+                logger.warning(f"[Reaper] Sweep failed: {e}")
+
+    def _zombie_reason(self, ws: WebSocket, now: float) -> str | None:
+        states = (getattr(ws, "client_state", None), getattr(ws, "application_state", None))
+        if WebSocketState.DISCONNECTED in states:
+            return "closed"
+        queue = self.manager.outbound.get(ws)
+        if queue is None or queue.closed:
+            return "closed"
+        last_seen = self.manager.last_seen.get(ws, now)
+        if self.idle_timeout > 0 and now - last_seen > self.idle_timeout:
+            return "idle"
+        return None
+
+    async def sweep(self) -> int:
+        """Run one pass; return the number of connections and participants cleaned up."""
+        now = time.monotonic()
+        zombies = []
+        for room_id, sockets in list(self.manager.active_connections.items()):
+            for user_id, ws in list(sockets.items()):
+                reason = self._zombie_reason(ws, now)
+                if reason is not None:
+                    zombies.append((reason, ws, room_id, user_id))
+
+        for reason, ws, room_id, user_id in zombies:
+            logger.warning(f"[Reaper] Dropping {reason} connection of {user_id} in room {room_id}")
+            reaped.labels(reason=reason).inc()
+            # 1001 — клиент может сразу переподключиться
+            self.manager.close(ws, code=1001 if reason == "idle" else 1011)
+            await self.on_leave(ws, room_id, user_id)
+
+        stale = await self._reconcile_participants() if self.manager.broker.single_node else 0
+        zombie_connections.set(len(zombies) + stale)
+        return len(zombies) + stale
+
+    async def _reconcile_participants(self) -> int:
+        """Mark participants without an open socket as disconnected."""
+        # Между add_user и connect участник уже connected, но сокета ещё нет — даём запас
+        cutoff = datetime.utcnow() - timedelta(seconds=self.interval)
+        async with self.manager.get_db("reconcile_participants") as db:
+            rows = (await db.execute(
+                select(RoomParticipant.room_id, RoomParticipant.user_id)
+                .where(RoomParticipant.connected.is_(True), RoomParticipant.joined_at < cutoff)
+            )).all()
+        stale = {(room_id, user_id) for room_id, user_id in rows}
+        for room_id, state in list(self.manager.rooms.items()):
+            stale.update((room_id, p.user_id) for p in state.connected_participants() if p.joined_at < cutoff)
+        # Припаркованные сессии ждут возвращения клиента — их уберёт истечение срока;
+        # комнаты других воркеров (общая БД) не наши — их сокетов здесь и не может быть
+        stale = {(room_id, user_id) for room_id, user_id in stale
+                 if owns(room_id)
+                 and self.manager.get_websocket_by_user_id(room_id, user_id) is None
+                 and not self.manager.sessions.is_parked(room_id, user_id)}
+
+        for room_id, user_id in stale:
+            logger.warning(f"[Reaper] Participant {user_id} of room {room_id} has no connection, marking disconnected")
+            reaped.labels(reason="stale_participant").inc()
+            if await self.manager.remove_user(room_id, user_id):
+                await self.manager.broadcast_roster(room_id, USER_LEFT, user_id)
+            self.manager.release_room(room_id)
+        return len(stale)
@@ -0,0 +1,95 @@
+"""Resumable WebSocket sessions.
+
+Every participant gets a resume token in its ``joined`` frame.  When the socket
+drops without a normal close, the participant is *parked*: it stays in the
+room (no ``user_left``) for a grace period.  A client reconnecting with
+``?resume=<token>&last_seq=<n>`` inside that window takes its place back
+without touching the database, and gets the room frames numbered after ``n``
+replayed from the room's :class:`~backend.ws.room_state.ReplayBuffer`.  Once
+the grace period runs out the participant leaves as usual.
+"""
+import asyncio
+import secrets
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict
+
+from prometheus_client import Counter, Gauge
+
+parked_sessions = Gauge(
+    "cinemate_ws_parked_sessions",
+    "Participants whose socket dropped and who may still resume their session",
+)
+resumes = Counter(
+    "cinemate_ws_resumes_total",
+    "Reconnections with a resume token, by outcome",
+    ["result"],
+)
+
+
+@dataclass(eq=False)
+class Session:
+    token: str
+    room_id: str
+    user_id: str
+    expiry: asyncio.Task | None = None
+
+    @property
+    def parked(self) -> bool:
+        return self.expiry is not None
+
+
+class SessionStore:
+    def __init__(self):
+        self.by_token: Dict[str, Session] = {}
+        self.by_user: Dict[tuple[str, str], Session] = {}
+
+    def issue(self, room_id: str, user_id: str) -> Session:
+        """Session of a participant, created on their first join."""
+        session = self.by_user.get((room_id, user_id))
+        if session is None:
+            session = Session(secrets.token_urlsafe(16), room_id, user_id)
+            self.by_token[session.token] = session
+            self.by_user[(room_id, user_id)] = session
+        return session
+
+    def get(self, token: str | None, room_id: str, user_id: str | None = None) -> Session | None:
+        """Session for a resume token presented to ``room_id``, if it is still valid."""
+        session = self.by_token.get(token) if token else None
+        if session is None or session.room_id != room_id:
+            return None
+        if user_id is not None and user_id != session.user_id:
+            return None
+        return session
+
+    def find(self, room_id: str, user_id: str) -> Session | None:
+        return self.by_user.get((room_id, user_id))
+
+    def is_parked(self, room_id: str, user_id: str) -> bool:
+        session = self.by_user.get((room_id, user_id))
+        return session is not None and session.parked
+
+    def park(self, session: Session, grace: float, on_expire: Callable[[], Awaitable[None]]):
+        """Keep the session for ``grace`` seconds, then run ``on_expire``."""
+        async def expire():
+            await asyncio.sleep(grace)
+            session.expiry = None
+            parked_sessions.dec()
+            resumes.labels(result="expired").inc()
+            await on_expire()
+
+        self.unpark(session)
+        session.expiry = asyncio.create_task(expire())
+        parked_sessions.inc()
+
+    def unpark(self, session: Session):
+        if session.expiry is not None:
+            session.expiry.cancel()
+            session.expiry = None
+            parked_sessions.dec()
+
+    def discard(self, room_id: str, user_id: str):
+        """Forget the session of a participant who left for good."""
+        session = self.by_user.pop((room_id, user_id), None)
+        if session is not None:
+            self.by_token.pop(session.token, None)
+            self.unpark(session)
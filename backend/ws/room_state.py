@@ -0,0 +1,223 @@
+"""In-memory room state used by the WebSocket hot path.
+
+:class:`DBConnectionManager` keeps one :class:`RoomState` per active room and
+treats it as authoritative: reads never touch the database and every mutation
+is written through to it, so a cold start can rebuild the state from the DB.
+"""
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import datetime
+from itertools import islice
+from typing import Dict
+
+from backend.config import WS_REPLAY_BUFFER_SIZE
+from backend.db.models import Room, RoomParticipant
+from backend.ws.frames import with_seq
+
+ADMIN_PERMISSIONS = {
+    "control_video": True,
+    "kick": True,
+    "change_video": True,
+}
+GUEST_PERMISSIONS = {
+    "control_video": False,
+    "kick": False,
+    "change_video": False,
+}
+
+
+@dataclass
+class ParticipantState:
+    user_id: str
+    name: str
+    role: str
+    permissions: dict
+    connected: bool
+    joined_at: datetime
+
+    @classmethod
+    def from_model(cls, participant: RoomParticipant, name: str) -> "ParticipantState":
+        return cls(
+            user_id=participant.user_id,
+            name=name,
+            role=participant.role,
+            permissions=dict(participant.permissions or {}),
+            connected=bool(participant.connected),
+            joined_at=participant.joined_at or datetime.utcnow(),
+        )
+
+    @classmethod
+    def from_wire(cls, data: dict) -> "ParticipantState":
+        return cls(
+            user_id=data["user_id"],
+            name=data["name"],
+            role=data["role"],
+            permissions=dict(data["permissions"]),
+            connected=data["connected"],
+            joined_at=datetime.fromisoformat(data["joined_at"]),
+        )
+
+    def to_wire(self) -> dict:
+        """Full, JSON-serialisable copy of the state, for replication between nodes."""
+        return {
+            "user_id": self.user_id,
+            "name": self.name,
+            "role": self.role,
+            "permissions": self.permissions,
+            "connected": self.connected,
+            "joined_at": self.joined_at.isoformat(),
+        }
+
+    def as_dict(self) -> dict:
+        return {
+            "id": self.user_id,
+            "name": self.name,
+            "role": self.role,
+            "permissions": self.permissions,
+        }
+
+
+# Изменения состава комнаты рассылаются дельтами с номером версии
+USER_JOINED = "user_joined"
+USER_LEFT = "user_left"
+USER_UPDATED = "user_updated"
+ROSTER_EVENTS = (USER_JOINED, USER_LEFT, USER_UPDATED)
+
+PLAYING = "playing"
+PAUSED = "paused"
+
+
+@dataclass
+class PlaybackState:
+    """Server-authoritative playback clock of a room.
+
+    ``position`` is the video position at ``updated_at`` (``time.monotonic()``);
+    while playing the current position advances at ``rate`` from there, so the
+    state only changes on play/pause/seek and never needs ticking.
+    """
+    state: str = PAUSED
+    position: float = 0.0
+    rate: float = 1.0
+    updated_at: float = field(default_factory=time.monotonic)
+
+    @classmethod
+    def from_model(cls, room: Room | None) -> "PlaybackState":
+        if room is None or room.playback_state is None:
+            return cls()
+        position = room.playback_position or 0.0
+        rate = room.playback_rate or 1.0
+        if room.playback_state == PLAYING and room.playback_updated_at:
+            # Пока комната не была загружена, видео «продолжало играть»
+            position += max(0.0, (datetime.utcnow() - room.playback_updated_at).total_seconds()) * rate
+        return cls(state=room.playback_state, position=position, rate=rate)
+
+    def position_at(self, now: float | None = None) -> float:
+        if self.state != PLAYING:
+            return self.position
+        now = time.monotonic() if now is None else now
+        return self.position + (now - self.updated_at) * self.rate
+
+    def apply(self, event: str, position: float | None = None, rate: float | None = None,
+              now: float | None = None):
+        """Apply a ``play``/``pause``/``seek`` event; a missing position keeps the current one."""
+        now = time.monotonic() if now is None else now
+        self.position = max(0.0, self.position_at(now) if position is None else position)
+        if rate is not None and rate > 0:
+            self.rate = rate
+        if event == "play":
+            self.state = PLAYING
+        elif event == "pause":
+            self.state = PAUSED
+        self.updated_at = now
+
+    def sync_from(self, snapshot: dict):
+        """Adopt a snapshot produced by :meth:`as_dict` on another node."""
+        self.state = snapshot["state"]
+        self.rate = snapshot["rate"]
+        self.position = snapshot["position"]
+        if self.state == PLAYING:
+            self.position += max(0.0, time.time() - snapshot["server_time"]) * self.rate
+        self.updated_at = time.monotonic()
+
+    def as_dict(self, now: float | None = None) -> dict:
+        """Snapshot sent to clients: the position as of ``server_time`` (Unix seconds)."""
+        return {
+            "state": self.state,
+            "position": round(self.position_at(now), 3),
+            "rate": self.rate,
+            "server_time": time.time(),
+        }
+
+    def model_fields(self) -> dict:
+        """Columns of :class:`Room` that persist this state."""
+        return {
+            "playback_state": self.state,
+            "playback_position": self.position_at(),
+            "playback_rate": self.rate,
+            "playback_updated_at": datetime.utcnow(),
+        }
+
+
+@dataclass
+class ReplayBuffer:
+    """The last ``size`` frames broadcast to a room, numbered for session resumption.
+
+    Entries are ``(seq, message, kind, exclude)``; ``message`` already carries
+    its ``seq`` field.
+    """
+    size: int = WS_REPLAY_BUFFER_SIZE
+    seq: int = 0
+    events: deque = field(default_factory=deque)
+
+    def record(self, message: str, kind: str | None, exclude: str | None) -> str:
+        """Number a frame, remember it and return it with its ``seq``."""
+        self.seq += 1
+        message = with_seq(message, self.seq)
+        self.events.append((self.seq, message, kind, exclude))
+        if len(self.events) > self.size:
+            self.events.popleft()
+        return message
+
+    def since(self, seq: int) -> list[tuple] | None:
+        """Frames after ``seq``, or ``None`` if some of them are no longer buffered."""
+        if seq < 0 or seq > self.seq:
+            return None
+        first = self.events[0][0] if self.events else self.seq + 1
+        if seq + 1 < first:
+            return None
+        return list(islice(self.events, seq + 1 - first, None))
+
+
+@dataclass
+class RoomState:
+    room_id: str
+    current_video_url: str | None = None
+    participants: Dict[str, ParticipantState] = field(default_factory=dict)
+    playback: PlaybackState = field(default_factory=PlaybackState)
+    # Растёт на каждом изменении состава; клиент с пропуском версии просит полный снимок
+    roster_version: int = 0
+    replay: ReplayBuffer = field(default_factory=ReplayBuffer)
+
+    @classmethod
+    def from_models(cls, room_id: str, room: Room | None, participants: list[RoomParticipant]) -> "RoomState":
+        state = cls(
+            room_id=room_id,
+            current_video_url=room.current_video_url if room else None,
+            playback=PlaybackState.from_model(room),
+        )
+        for participant in participants:
+            state.participants[participant.user_id] = ParticipantState.from_model(participant, participant.user.name)
+        return state
+
+    def get(self, user_id: str | None, connected: bool = True) -> ParticipantState | None:
+        participant = self.participants.get(user_id)
+        if participant and connected and not participant.connected:
+            return None
+        return participant
+
+    def connected_participants(self) -> list[ParticipantState]:
+        return sorted(
+            (p for p in self.participants.values() if p.connected),
+            key=lambda p: p.joined_at,
+        )
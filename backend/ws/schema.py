@@ -0,0 +1,182 @@
+"""Shared schema of the frames exchanged on ``/ws/{room_id}``.
+
+Every message type has a short integer tag and an ordered tuple of fields.
+JSON clients exchange objects (``{"type": "chat", "message": ...}``); binary
+clients exchange MessagePack arrays ``[tag, value, value, ...]`` with the
+values in field order.  Trailing empty fields are omitted and fields outside
+the schema (e.g. the SDP of a voice relay frame) travel in a trailing map.
+
+Frames from clients are validated by :func:`validate` against the pydantic
+model of their type (:data:`INBOUND`), whichever encoding they arrived in.
+"""
+from dataclasses import dataclass
+from typing import Annotated, Dict, Literal
+
+from pydantic import BaseModel, ConfigDict, Field, Strict, ValidationError
+
+
+class SchemaError(ValueError):
+    pass
+
+
+@dataclass(frozen=True)
+class MessageSpec:
+    type: str
+    tag: int
+    fields: tuple[str, ...] = ()
+
+
+_SYNC_FIELDS = ("user_id", "timestamp", "rate", "playback")
+_VOICE_FIELDS = ("user_id", "target_id")
+
+SPECS = (
+    MessageSpec("joined", 1, ("user_id", "playback", "resume_token", "seq")),
+    MessageSpec("users_update", 2, ("version", "users")),
+    MessageSpec("user_joined", 3, ("version", "user")),
+    MessageSpec("user_left", 4, ("version", "user_id")),
+    MessageSpec("user_updated", 5, ("version", "user")),
+    MessageSpec("history", 6, ("messages", "next_cursor")),
+    MessageSpec("chat", 7, ("user_id", "username", "message", "timestamp")),
+    MessageSpec("play", 8, _SYNC_FIELDS),
+    MessageSpec("pause", 9, _SYNC_FIELDS),
+    MessageSpec("seek", 10, _SYNC_FIELDS),
+    MessageSpec("sync", 11, ("client_time", "playback", "qos", "rtt_ms")),
+    MessageSpec("change_video", 12, ("user_id", "video_url")),
+    MessageSpec("video_changed", 13, ("video_url",)),
+    MessageSpec("voice-offer", 14, _VOICE_FIELDS),
+    MessageSpec("voice-answer", 15, _VOICE_FIELDS),
+    MessageSpec("voice-candidate", 16, _VOICE_FIELDS),
+    MessageSpec("set_permissions", 17, ("user_id", "target_id", "permissions")),
+    MessageSpec("kick", 18, ("user_id", "target_id")),
+    MessageSpec("kicked", 19),
+    MessageSpec("error", 20, ("message",)),
+    MessageSpec("get_users", 21),
+    MessageSpec("resumed", 22, ("user_id", "playback", "seq", "replayed")),
+    # Пачка ICE-кандидатов: исходные кадры voice-candidate в протоколе получателя
+    MessageSpec("voice-candidates", 23, ("frames",)),
+)
+BY_TYPE = {spec.type: spec for spec in SPECS}
+BY_TAG = {spec.tag: spec for spec in SPECS}
+
+
+# ID и флаги прав — как принимали прежние обработчики: числовой ID становится строкой,
+# флаг может быть 0/1 или "true"/"false"
+UserId = Annotated[str, Strict(False)]
+Flag = Annotated[bool, Strict(False)]
+
+
+class ClientMessage(BaseModel):
+    # strict: "42" не число, true не число; лишние поля клиента отбрасываются
+    model_config = ConfigDict(strict=True, frozen=True, extra="ignore", coerce_numbers_to_str=True)
+
+    user_id: UserId | None = None
+
+
+class SyncEvent(ClientMessage):
+    type: Literal["play", "pause", "seek"]
+    timestamp: float | None = Field(None, allow_inf_nan=False)
+    rate: float | None = Field(None, allow_inf_nan=False)
+
+
+class SyncRequest(ClientMessage):
+    type: Literal["sync"]
+    client_time: float | None = Field(None, allow_inf_nan=False)
+    # RTT предыдущего heartbeat'а, измеренный клиентом (мс)
+    rtt_ms: float | None = Field(None, ge=0, allow_inf_nan=False)
+
+
+class ChatMessage(ClientMessage):
+    type: Literal["chat"]
+    message: str = ""
+
+
+class ChangeVideo(ClientMessage):
+    type: Literal["change_video"]
+    video_url: str = ""
+
+
+class VoiceSignal(ClientMessage):
+    # SDP и ICE-кандидаты пересылаются как есть
+    model_config = ConfigDict(extra="allow")
+
+    type: Literal["voice-offer", "voice-answer", "voice-candidate"]
+    target_id: UserId | None = None
+
+
+class SetPermissions(ClientMessage):
+    type: Literal["set_permissions"]
+    target_id: UserId | None = None
+    permissions: Dict[str, Flag]
+
+
+class Kick(ClientMessage):
+    type: Literal["kick"]
+    target_id: UserId | None = None
+
+
+class GetUsers(ClientMessage):
+    type: Literal["get_users"]
+
+
+INBOUND: Dict[str, type[ClientMessage]] = {
+    "play": SyncEvent,
+    "pause": SyncEvent,
+    "seek": SyncEvent,
+    "sync": SyncRequest,
+    "chat": ChatMessage,
+    "change_video": ChangeVideo,
+    "voice-offer": VoiceSignal,
+    "voice-answer": VoiceSignal,
+    "voice-candidate": VoiceSignal,
+    "set_permissions": SetPermissions,
+    "kick": Kick,
+    "get_users": GetUsers,
+}
+
+
+def validate(message) -> ClientMessage:
+    """Validate a decoded client frame against the model of its type."""
+    if not isinstance(message, dict):
+        raise SchemaError("frame is not an object")
+    model = INBOUND.get(message.get("type"))
+    if model is None:
+        raise SchemaError(f"unexpected message type {message.get('type')!r}")
+    try:
+        return model.model_validate(message)
+    except ValidationError as e:
+        raise SchemaError(f"invalid {message['type']!r} frame: {e.error_count()} error(s)") from e
+
+
+def pack(message: dict) -> list:
+    """Turn a frame into the positional form used by the binary protocol."""
+    spec = BY_TYPE.get(message.get("type"))
+    if spec is None:
+        raise SchemaError(f"unknown message type {message.get('type')!r}")
+    values = [message.get(name) for name in spec.fields]
+    extra = {k: v for k, v in message.items() if k != "type" and k not in spec.fields}
+    if extra:
+        return [spec.tag, *values, extra]
+    while values and values[-1] is None:
+        values.pop()
+    return [spec.tag, *values]
+
+
+def unpack(values) -> dict:
+    """Inverse of :func:`pack`."""
+    if not isinstance(values, list) or not values or not isinstance(values[0], int):
+        raise SchemaError("binary frame is not a tagged array")
+    spec = BY_TAG.get(values[0])
+    if spec is None:
+        raise SchemaError(f"unknown message tag {values[0]}")
+    values = values[1:]
+    if len(values) > len(spec.fields) + 1:
+        raise SchemaError(f"too many fields in {spec.type!r} frame")
+
+    message = {}
+    if len(values) > len(spec.fields):
+        message = values.pop()
+        if not isinstance(message, dict):
+            raise SchemaError(f"invalid extra fields in {spec.type!r} frame")
+    message.update(zip(spec.fields, values))
+    message["type"] = spec.type
+    return message
@@ -0,0 +1,87 @@
+"""Assignment of rooms to worker processes.
+
+All state of a room (participants, playback clock, outbound queues) lives in
+the :class:`~backend.ws.db_manager.DBConnectionManager` of one process, so
+when several workers run on one host every room must be served by a single
+worker.  :class:`HashRing` maps room IDs to workers with consistent hashing:
+each worker owns ``vnodes`` points on a ring and a room belongs to the first
+point after its hash.  Adding or removing a worker moves only the rooms of
+the arcs it gains or loses.
+
+The router of :mod:`backend.supervisor` sends every connection to the owner of
+its room (:func:`route_key`); workers refuse rooms they do not own
+(:func:`owns`), which can only happen if a client bypasses the router.
+"""
+import bisect
+import hashlib
+from urllib.parse import parse_qs, unquote
+
+from backend.config import SHARD_COUNT, SHARD_INDEX, SHARD_VNODES
+
+# Пути, в которых после префикса идёт ID комнаты
+ROOM_PATHS = ("/ws/", "/qos/")
+
+
+def _point(key: str) -> int:
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "big")
+
+
+class HashRing:
+    def __init__(self, nodes: int, vnodes: int = SHARD_VNODES):
+        points = sorted((_point(f"worker-{node}#{v}"), node) for node in range(nodes) for v in range(vnodes))
+        self.nodes = nodes
+        self._points = [point for point, _ in points]
+        self._owners = [node for _, node in points]
+
+    def owner(self, key: str) -> int:
+        """Index of the worker owning ``key``."""
+        if self.nodes == 1:
+            return 0
+        i = bisect.bisect(self._points, _point(key))
+        return self._owners[i % len(self._owners)]
+
+
+ring = HashRing(SHARD_COUNT)
+
+
+def owns(room_id: str) -> bool:
+    """Whether this process serves ``room_id``; always true without sharding."""
+    return SHARD_COUNT <= 1 or ring.owner(room_id) == SHARD_INDEX
+
+
+def route_key(target: str) -> str | None:
+    """Room a request target (``/ws/room1?username=...``) belongs to, ``None`` if it has none.
+
+    The room comes from the path of ``/ws/{room_id}`` and ``/qos/{room_id}``,
+    otherwise from a ``room_id`` query parameter (``/config?room_id=...``).
+    """
+    path, _, query = target.partition("?")
+    # Так же, как uvicorn раскодирует путь для маршрутов FastAPI
+    path = unquote(path)
+    for prefix in ROOM_PATHS:
+        if path.startswith(prefix):
+            return path[len(prefix):] or None
+    values = parse_qs(query).get("room_id")
+    return values[0] if values and values[0] else None
+
+
+class CloseConnections:
+    """ASGI middleware closing the connection after each HTTP response.
+
+    The router picks a worker per connection, so a kept-alive connection would
+    pin a client's later requests (possibly for other rooms) to one worker.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        async def send_closing(message):
+            if message["type"] == "http.response.start":
+                message = {**message, "headers": [*message.get("headers", ()), (b"connection", b"close")]}
+            await send(message)
+
+        await self.app(scope, receive, send_closing)
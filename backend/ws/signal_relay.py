@@ -0,0 +1,205 @@
+"""Fast path for WebRTC signalling (``voice-offer``, ``voice-answer``, ``voice-candidate``).
+
+The server only routes these frames, so :class:`SignalRelay` takes the
+routing header (type and ``target_id``) and forwards the frame as received:
+the client's JSON text or MessagePack bytes go to the target unchanged, with
+no validation against the schema and no re-encoding.  A frame is converted
+only when the target speaks the other protocol.  Frames the header peek does
+not recognise take the normal dispatcher path, which ends up here as well.
+
+Binary frames are read up to the end of the header and the payload is only
+skipped.  Text frames are parsed in full: the target's parser must see one
+object of the same type, and making sure no second ``"type"`` key (also one
+spelt with ``\\u`` escapes) or trailing data hides in the payload means
+reading all of it anyway; ``orjson`` does that faster than a scan of the
+string in Python.
+
+Trickle-ICE candidates for the same target arriving within ``window``
+seconds leave as one ``voice-candidates`` frame holding the original frames
+in order.  Offers and answers are never delayed; candidates pending for
+their target are flushed first, so the order of a target's frames is kept.
+"""
+import asyncio
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict
+
+from prometheus_client import Counter, Histogram
+
+from backend.config import logger
+from backend.ws.dispatch import messages_in
+from backend.ws.frames import DecodeError, decode, msgpack
+from backend.ws.schema import BY_TYPE
+
+OFFER, ANSWER, CANDIDATE = "voice-offer", "voice-answer", "voice-candidate"
+SIGNAL_TYPES = (OFFER, ANSWER, CANDIDATE)
+_TAGS = {BY_TYPE[kind].tag: kind for kind in SIGNAL_TYPES}
+
+relayed_frames = Counter(
+    "cinemate_ws_signal_frames_total",
+    "Signalling frames relayed, by type and by whether the header peek routed them",
+    ["type", "path"],
+)
+candidate_batches = Histogram(
+    "cinemate_ws_signal_batch_frames",
+    "ICE candidates per frame delivered by the signalling relay",
+    buckets=(1, 2, 4, 8, 16, 32, 64),
+)
+# labels() на каждый кадр заметен на потоке кандидатов — дочерние счётчики берём заранее
+_messages_in = {kind: messages_in.labels(type=kind) for kind in SIGNAL_TYPES}
+_fast_frames = {kind: relayed_frames.labels(type=kind, path="fast") for kind in SIGNAL_TYPES}
+
+_TEXT_PREFIX = '{"type":"voice-'
+
+
+def peek_header(frame: str | bytes) -> tuple[str, str] | None:
+    """``(type, target_id)`` of a signalling frame, without validating its payload.
+
+    The frame is forwarded to the target as received, so it must be exactly one
+    object of that type: text frames have to parse as a single JSON object,
+    and binary frames must end where their header array ends.  ``None`` for
+    anything else, including signalling frames whose header is not in the
+    canonical form (those are decoded and validated as usual).
+    """
+    if isinstance(frame, str):
+        # Тип — первое поле объекта; иначе это не наш кадр или он в необычной форме
+        if not frame.startswith(_TEXT_PREFIX) or frame[-1] != "}":
+            return None
+        end = frame.find('"', len(_TEXT_PREFIX))
+        kind = frame[len('{"type":"'):end]
+        if kind not in SIGNAL_TYPES or frame.count('"target_id"') != 1:
+            return None
+        # Полный разбор: кадр уходит получателю как есть, и его парсер должен увидеть тот же
+        # объект — без второго "type" или хвоста, меняющих смысл кадра
+        try:
+            data = decode(frame)
+        except DecodeError:
+            return None
+        if not isinstance(data, dict) or data.get("type") != kind:
+            return None
+        target_id = data.get("target_id")
+        return (kind, target_id) if isinstance(target_id, str) and target_id else None
+
+    if msgpack is None:
+        return None
+    # [tag, user_id, target_id, {sdp/candidate...}] — разбираем только заголовок, остальное пропускаем
+    unpacker = msgpack.Unpacker(raw=False)
+    unpacker.feed(frame)
+    try:
+        size = unpacker.read_array_header()
+        if size not in (3, 4):
+            return None
+        kind = _TAGS.get(unpacker.unpack())
+        unpacker.skip()
+        target_id = unpacker.unpack()
+        if size == 4:
+            # Хвост — словарь прочих полей, как у schema.pack
+            for _ in range(2 * unpacker.read_map_header()):
+                unpacker.skip()
+        # Ровно один объект на весь кадр
+        if unpacker.tell() != len(frame):
+            return None
+    except Exception:
+        return None
+    if kind is None or not isinstance(target_id, str) or not target_id:
+        return None
+    return kind, target_id
+
+
+@dataclass
+class PeerCounters:
+    offers: int = 0
+    answers: int = 0
+    candidates: int = 0
+    bytes: int = 0  # размер отправленных участником кадров
+    received: int = 0  # кадров, доставленных участнику
+    batches: int = 0  # из них пачек voice-candidates
+
+
+class _Batch:
+    __slots__ = ("frames", "task")
+
+    def __init__(self, frame: str | bytes):
+        self.frames = [frame]
+        self.task: asyncio.Task | None = None
+
+
+class SignalRelay:
+    def __init__(self, window: float, deliver: Callable[[str, str, list, str], Awaitable[None]]):
+        """``deliver(room_id, target_id, frames, kind)`` sends raw frames to one user."""
+        self.window = window
+        self.deliver = deliver
+        self.peers: Dict[tuple[str, str], PeerCounters] = {}
+        self._batches: Dict[tuple[str, str], _Batch] = {}
+
+    async def forward(self, room_id: str, user_id: str, frame: str | bytes) -> bool:
+        """Relay a raw inbound frame if it is a signalling frame; ``False`` means decode it as usual."""
+        header = peek_header(frame)
+        if header is None:
+            return False
+        kind, target_id = header
+        _messages_in[kind].inc()
+        _fast_frames[kind].inc()
+        await self.submit(room_id, user_id, kind, target_id, frame)
+        return True
+
+    async def submit(self, room_id: str, user_id: str, kind: str, target_id: str, frame: str | bytes):
+        """Relay one signalling frame of ``user_id`` to ``target_id``, batching candidates."""
+        counters = self.peer(room_id, user_id)
+        if kind == CANDIDATE:
+            counters.candidates += 1
+        elif kind == OFFER:
+            counters.offers += 1
+        else:
+            counters.answers += 1
+        counters.bytes += len(frame)
+
+        key = (room_id, target_id)
+        if kind == CANDIDATE and self.window > 0:
+            batch = self._batches.get(key)
+            if batch is not None:
+                batch.frames.append(frame)
+                return
+            batch = self._batches[key] = _Batch(frame)
+            batch.task = asyncio.create_task(self._run(key, batch))
+            return
+
+        batch = self._batches.pop(key, None)
+        if batch is not None:
+            batch.task.cancel()
+            await self._deliver(key, batch.frames, CANDIDATE)
+        await self._deliver(key, [frame], kind)
+
+    async def _run(self, key: tuple[str, str], batch: _Batch):
+        await asyncio.sleep(self.window)
+        if self._batches.get(key) is batch:
+            del self._batches[key]
+            await self._deliver(key, batch.frames, CANDIDATE)
+
+    async def _deliver(self, key: tuple[str, str], frames: list, kind: str):
+        room_id, target_id = key
+        if kind == CANDIDATE:
+            candidate_batches.observe(len(frames))
+        try:
+            await self.deliver(room_id, target_id, frames, kind)
+        except Exception as e:
+            logger.warning(f"[Signal] Failed to relay {kind} to {target_id} in room {room_id}: {e}")
+            return
+        # Счётчики заводятся только у отправителей: мусорные target_id не копятся в памяти
+        counters = self.peers.get(key)
+        if counters is not None:
+            counters.received += len(frames)
+            if len(frames) > 1:
+                counters.batches += 1
+
+    def peer(self, room_id: str, user_id: str) -> PeerCounters:
+        counters = self.peers.get((room_id, user_id))
+        if counters is None:
+            counters = self.peers[(room_id, user_id)] = PeerCounters()
+        return counters
+
+    def forget(self, room_id: str, user_id: str):
+        """Drop the counters and pending candidates of a user who left the room."""
+        self.peers.pop((room_id, user_id), None)
+        batch = self._batches.pop((room_id, user_id), None)
+        if batch is not None:
+            batch.task.cancel()
@@ -0,0 +1,115 @@
+"""Per-room coalescing and per-user rate limiting of inbound WebSocket events.
+
+* :class:`SyncCoalescer` – the first ``play``/``pause``/``seek`` of a room is
+  forwarded at once; further ones arriving within ``window`` seconds replace
+  each other and only the latest is forwarded when the window closes.  A user
+  scrubbing the timeline thus costs the room at most one frame per window.
+* :class:`RateLimiter` – token buckets per ``(room, user, category)``; frames
+  over the limit are dropped by the caller.
+"""
+import asyncio
+import time
+from typing import Awaitable, Callable, Dict
+
+from prometheus_client import Counter
+
+from backend.config import logger
+
+coalesced_events = Counter(
+    "cinemate_ws_sync_coalesced_total",
+    "Sync events superseded by a newer one within the coalescing window",
+)
+rate_limited_events = Counter(
+    "cinemate_ws_rate_limited_total",
+    "Inbound frames dropped by per-user rate limits",
+    ["category"],
+)
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated_at = time.monotonic()
+
+    def allow(self, now: float | None = None) -> bool:
+        now = time.monotonic() if now is None else now
+        self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+
+class RateLimiter:
+    def __init__(self, limits: Dict[str, tuple[float, float]]):
+        """``limits`` maps a category to ``(rate per second, burst)``; a rate <= 0 disables it."""
+        self.limits = {category: limit for category, limit in limits.items() if limit[0] > 0}
+        self._buckets: Dict[tuple[str, str, str], TokenBucket] = {}
+
+    def allow(self, room_id: str, user_id: str, category: str) -> bool:
+        limit = self.limits.get(category)
+        if limit is None:
+            return True
+        key = (room_id, user_id, category)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = TokenBucket(*limit)
+        if bucket.allow():
+            return True
+        rate_limited_events.labels(category=category).inc()
+        return False
+
+    def forget(self, room_id: str, user_id: str):
+        """Drop the buckets of a user who left the room."""
+        for category in self.limits:
+            self._buckets.pop((room_id, user_id, category), None)
+
+
+class _Window:
+    __slots__ = ("pending", "task")
+
+    def __init__(self):
+        self.pending: tuple | None = None
+        self.task: asyncio.Task | None = None
+
+
+class SyncCoalescer:
+    def __init__(self, window: float, flush: Callable[..., Awaitable[None]]):
+        """``flush(room_id, *args)`` forwards one event; ``window`` <= 0 forwards every event."""
+        self.window = window
+        self.flush = flush
+        self._windows: Dict[str, _Window] = {}
+
+    async def submit(self, room_id: str, *args):
+        if self.window <= 0:
+            await self.flush(room_id, *args)
+            return
+
+        window = self._windows.get(room_id)
+        if window is not None:
+            if window.pending is not None:
+                coalesced_events.inc()
+            window.pending = args
+            return
+
+        window = self._windows[room_id] = _Window()
+        window.task = asyncio.create_task(self._run(room_id, window))
+        await self.flush(room_id, *args)
+
+    async def _run(self, room_id: str, window: _Window):
+        try:
+            while True:
+                await asyncio.sleep(self.window)
+                args, window.pending = window.pending, None
+                if args is None:
+                    return
+                try:
+                    await self.flush(room_id, *args)
+                except Exception as e:
+                    logger.warning(f"[Coalesce] Failed to forward sync event in room {room_id}: {e}")
+        finally:
+            if self._windows.get(room_id) is window:
+                del self._windows[room_id]
@@ -1,133 +1,300 @@
 from datetime import datetime
-import json
+import asyncio
 from uuid import uuid4
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect
-from backend.db.models import Message
+from backend.db import crud
 from backend.ws.db_manager import DBConnectionManager
-from backend.config import logger
+from backend.ws import schema
+from backend.ws.dispatch import Connection, Dispatcher
+from backend.ws.frames import encode, decode, decode_binary, negotiate, DecodeError, MSGPACK
+from backend.ws.outbound import SYNC_EVENTS
+from backend.ws.reaper import Reaper
+from backend.ws.resume import Session, resumes
+from backend.ws.sharding import owns
+from backend.ws.signal_relay import SignalRelay, relayed_frames
+from backend.ws.room_state import USER_JOINED, USER_LEFT, USER_UPDATED
+from backend.ws.throttle import RateLimiter, SyncCoalescer
+from backend.services.chat import ChatWriter, chat_payload
+from backend.services.qos import qos
+from backend.config import (
+    logger, CHAT_HISTORY_PAGE_SIZE, WS_SYNC_COALESCE_WINDOW, WS_RESUME_GRACE,
+    WS_CHAT_RATE, WS_CHAT_BURST, WS_SYNC_RATE, WS_SYNC_BURST, WS_SIGNAL_BATCH_WINDOW,
+)
 
 router = APIRouter()
+# Подключения логируются отдельным логгером, который log_config.yaml может прореживать
+connection_logger = logger.getChild("ws.connections")
 manager = DBConnectionManager()
+chat_writer = ChatWriter()
+_cleanup_tasks: set[asyncio.Task] = set()
+dispatcher = Dispatcher()
+rate_limiter = RateLimiter({"chat": (WS_CHAT_RATE, WS_CHAT_BURST), "sync": (WS_SYNC_RATE, WS_SYNC_BURST)})
+
+
+async def _forward_playback(room_id: str, event: str, user_id: str | None):
+    await manager.broadcast_playback(room_id, event, user_id)
+    await manager.save_playback(room_id)
+
+
+sync_coalescer = SyncCoalescer(WS_SYNC_COALESCE_WINDOW, _forward_playback)
+signal_relay = SignalRelay(WS_SIGNAL_BATCH_WINDOW, manager.relay)
+
+
+async def _recent_history(room_id: str) -> dict:
+    """Build the ``history`` frame: the newest page of the room's chat, oldest first."""
+    # Снимок берём до чтения из БД: сообщение, закоммиченное между ними, попадёт хотя бы в одно из двух
+    unsaved = chat_writer.unsaved(room_id)
+    async with manager.get_db("recent_history") as db:
+        saved, next_cursor = await crud.get_messages(db, room_id, limit=CHAT_HISTORY_PAGE_SIZE)
+
+    seen = {msg.id for msg in saved}
+    entries = [(msg.timestamp, msg.id, msg.user_id, msg.username, msg.text) for msg in saved]
+    entries += [(row["timestamp"], row["id"], row["user_id"], row["username"], row["text"])
+                for row in unsaved if row["id"] not in seen]
+    if len(entries) > CHAT_HISTORY_PAGE_SIZE:
+        entries = entries[-CHAT_HISTORY_PAGE_SIZE:]
+        next_cursor = crud.encode_cursor(entries[0][0], entries[0][1])
+
+    return {
+        "type": "history",
+        "messages": [chat_payload(user_id, username, text, timestamp)
+                     for timestamp, _, user_id, username, text in entries],
+        "next_cursor": next_cursor,
+    }
+
+async def _receive(websocket: WebSocket) -> str | bytes:
+    """Read one raw client frame: text (JSON) or binary (MessagePack)."""
+    message = await websocket.receive()
+    if message["type"] == "websocket.disconnect":
+        raise WebSocketDisconnect(message.get("code", 1000), message.get("reason"))
+    manager.touch(websocket)
+    if message.get("bytes") is not None:
+        return message["bytes"]
+    return message["text"]
+
+
+@dispatcher.route(*SYNC_EVENTS)
+async def handle_sync_event(conn: Connection, message: schema.SyncEvent):
+    if not rate_limiter.allow(conn.room_id, conn.user_id, "sync"):
+        return
+    # Часы обновляем сразу, а рассылку (и запись в БД) схлопываем в окне
+    await manager.set_playback(conn.room_id, message.type, message.timestamp, message.rate)
+    await sync_coalescer.submit(conn.room_id, message.type, message.user_id)
+
+
+def _connected(state) -> int:
+    return sum(1 for participant in state.participants.values() if participant.connected)
+
+
+def _observe_peers(room_id: str):
+    # QoS держит решение о транспорте, пока в комнате есть участники, — число нужно знать сразу.
+    # Выгруженная из памяти комната пуста
+    state = manager.rooms.get(room_id)
+    qos.observe(room_id, peers=_connected(state) if state is not None else 0)
+
+
+@dispatcher.route("sync")
+async def handle_sync(conn: Connection, message: schema.SyncRequest):
+    if not rate_limiter.allow(conn.room_id, conn.user_id, "sync"):
+        return
+    # Лёгкий heartbeat: клиент сверяет свою позицию с серверными часами,
+    # а в ответ получает период следующего heartbeat'а и допуск рассинхрона для своей комнаты
+    state = await manager.get_room_state(conn.room_id)
+    profile = qos.observe(conn.room_id, message.rtt_ms, _connected(state))
+    await manager.send_personal(conn.websocket, encode({
+        "type": "sync",
+        "client_time": message.client_time,
+        "playback": state.playback.as_dict(),
+        "qos": profile.as_dict(),
+    }), kind="sync")
+
+
+@dispatcher.route("get_users")
+async def handle_get_users(conn: Connection, message: schema.GetUsers):
+    # Клиент заметил пропуск версии состава и просит полный снимок
+    if not rate_limiter.allow(conn.room_id, conn.user_id, "sync"):
+        return
+    await manager.send_personal(conn.websocket, manager.users_snapshot(conn.room_id), kind="users_update")
+
+
+@dispatcher.route("chat")
+async def handle_chat(conn: Connection, message: schema.ChatMessage):
+    if not rate_limiter.allow(conn.room_id, conn.user_id, "chat"):
+        await manager.send_personal(conn.websocket, encode({"type": "error", "message": "Rate limited"}))
+        return
+    sender = manager.get_user(conn.room_id, message.user_id)
+    sender_name = sender.name if sender else "Unknown"
+
+    timestamp = datetime.utcnow()
+
+    await manager.broadcast(encode(
+        chat_payload(message.user_id, sender_name, message.message, timestamp)
+    ), conn.room_id, kind="chat")
+    chat_writer.put(conn.room_id, message.user_id, sender_name, message.message, timestamp)
+
+
+@dispatcher.route("change_video")
+async def handle_change_video(conn: Connection, message: schema.ChangeVideo):
+    await manager.set_video(conn.room_id, message.video_url)
+    await manager.broadcast(encode({
+        "type": "video_changed",
+        "video_url": message.video_url,
+    }), conn.room_id, kind="video_changed")
+
+
+@dispatcher.route("voice-offer", "voice-answer", "voice-candidate")
+async def handle_voice_signal(conn: Connection, message: schema.VoiceSignal):
+    # Сюда доходят только кадры, которые signal_relay не смог разобрать по заголовку
+    if message.target_id:
+        relayed_frames.labels(type=message.type, path="decoded").inc()
+        await signal_relay.submit(conn.room_id, conn.user_id, message.type, message.target_id,
+                                  encode(message.model_dump(exclude_unset=True)))
+
+
+async def _require_kick_permission(conn: Connection, sender_id: str | None, action: str) -> bool:
+    sender_part = manager.get_participant(conn.room_id, sender_id)
+    if sender_part and sender_part.permissions.get("kick"):
+        return True
+    await manager.send_personal(conn.websocket, encode({"type": "error", "message": "Unauthorized"}))
+    logger.warning(f"[UNAUTHORIZED] User {sender_id} tried to {action} in room {conn.room_id}")
+    return False
+
+
+@dispatcher.route("set_permissions")
+async def handle_set_permissions(conn: Connection, message: schema.SetPermissions):
+    if not await _require_kick_permission(conn, message.user_id, "change permissions"):
+        return
+    if await manager.set_permissions(conn.room_id, message.target_id, message.permissions):
+        await manager.broadcast_roster(conn.room_id, USER_UPDATED, message.target_id)
+
+
+@dispatcher.route("kick")
+async def handle_kick(conn: Connection, message: schema.Kick):
+    if not await _require_kick_permission(conn, message.user_id, "kick"):
+        return
+    if await manager.kick_user(room_id=conn.room_id, target_id=message.target_id):
+        # Цель может быть подключена к другому узлу — send_to доставит через брокер
+        await manager.send_to(encode({"type": "kicked"}), conn.room_id, message.target_id, kind="kicked")
+        logger.info(f"[KICK] Sent 'kicked' to {message.target_id}")
+        await manager.broadcast_roster(conn.room_id, USER_LEFT, message.target_id)
+
+
+async def _join(websocket: WebSocket, room_id: str, user_id: str, binary: bool, subprotocol: str | None,
+                accept: bool = True):
+    await manager.connect(websocket, room_id, user_id, binary=binary, subprotocol=subprotocol, accept=accept)
+    connection_logger.info("[WS] %s connected to room %s", user_id, room_id,
+                           extra={"room_id": room_id, "user_id": user_id})
+
+    state = await manager.get_room_state(room_id)
+    await manager.send_personal(websocket, encode({
+        "type": "joined",
+        "user_id": user_id,
+        "playback": state.playback.as_dict(),
+        "resume_token": manager.sessions.issue(room_id, user_id).token,
+        "seq": state.replay.seq,
+    }))
+    # Остальным — дельта, новичку — полный снимок состава
+    await manager.broadcast_roster(room_id, USER_JOINED, user_id, exclude=user_id)
+    _observe_peers(room_id)
+    await _send_snapshot(websocket, room_id)
+
+
+async def _send_snapshot(websocket: WebSocket, room_id: str):
+    await manager.send_personal(websocket, manager.users_snapshot(room_id), kind="users_update")
+    await manager.send_personal(websocket, encode(await _recent_history(room_id)), kind="history")
+
+
+async def _resume(websocket: WebSocket, session: Session, last_seq: str | None, username: str, binary: bool,
+                  subprotocol: str | None):
+    try:
+        last_seq = int(last_seq)
+    except (TypeError, ValueError):
+        last_seq = -1
+    replayed = await manager.resume(websocket, session, last_seq, binary=binary, subprotocol=subprotocol)
+    if replayed is None:
+        # Сессия закончилась, пока принимали сокет, — обычный вход в комнату
+        resumes.labels(result="rejected").inc()
+        await manager.add_user(session.room_id, username, session.user_id)
+        await _join(websocket, session.room_id, session.user_id, binary, subprotocol, accept=False)
+        return
+    connection_logger.info("[WS] %s resumed session in room %s (replayed: %s)",
+                           session.user_id, session.room_id, replayed,
+                           extra={"room_id": session.room_id, "user_id": session.user_id, "replayed": replayed})
+    resumes.labels(result="replayed" if replayed else "snapshot").inc()
+    if not replayed:
+        # Пропущенное уже вытеснено из буфера — клиент начинает с полного снимка, но без user_left/user_joined
+        await _send_snapshot(websocket, session.room_id)
+
 
 @router.websocket("/ws/{room_id}")
 async def websocket_endpoint(websocket: WebSocket, room_id: str):
-    username = websocket.query_params.get("username", "Anonymous")
-    user_id = websocket.query_params.get("user_id")
-
-    user = manager.add_user(room_id, username, user_id)
-
-    await manager.connect(websocket, room_id, user.id)
-    logger.info(f"[WS] New connection to room {room_id}")
-
-    await websocket.send_json({"type": "joined", "user_id": user.id})
-    await manager.broadcast_users(room_id)
-
-    with manager.get_db() as db:
-        history = (
-            db.query(Message)
-            .filter_by(room_id=room_id)
-            .order_by(Message.timestamp)
-            .limit(50)
-            .all()
-        )
-        for msg in history:
-            await websocket.send_json({
-                "type": "chat",
-                "user_id": msg.user_id,
-                "username": msg.username,
-                "message": msg.text,
-                "timestamp": msg.timestamp.isoformat(),
-            })
+    if not owns(room_id):
+        # Комната другого воркера: её состояние не здесь, клиент пришёл в обход роутера
+        logger.warning(f"[WS] Room {room_id} is not served by this worker, refusing connection")
+        await websocket.close(code=1008)
+        return
+    params = websocket.query_params
+    protocol, subprotocol = negotiate(params.get("protocol"), websocket.scope.get("subprotocols", []))
+    binary = protocol == MSGPACK
+
+    session = manager.sessions.get(params.get("resume"), room_id, params.get("user_id"))
+    if session is not None and manager.get_participant(room_id, session.user_id) is None:
+        session = None
+    if session is not None:
+        user_id = session.user_id
+    else:
+        if params.get("resume"):
+            resumes.labels(result="rejected").inc()
+        user_id = (await manager.add_user(room_id, params.get("username", "Anonymous"), params.get("user_id"))).id
 
+    resumable = False
     try:
+        if session is not None:
+            await _resume(websocket, session, params.get("last_seq"), params.get("username", "Anonymous"),
+                          binary, subprotocol)
+        else:
+            await _join(websocket, room_id, user_id, binary, subprotocol)
+
+        conn = Connection(websocket, room_id, user_id)
         while True:
-            data = await websocket.receive_json()
-            msg_type = data.get("type")
-
-            if msg_type in ("play", "pause", "seek"):
-                await manager.broadcast(json.dumps(data), room_id)
-
-            elif msg_type == "chat":
-                message = data.get("message", "")
-                sender_id = data.get("user_id")
-                user = manager.get_user(room_id, sender_id)
-                sender_name = user.name if user else "Unknown"
-
-                with manager.get_db() as db:
-                    entry = Message(
-                        user_id=sender_id,
-                        username=sender_name,
-                        room_id=room_id,
-                        text=message,
-                    )
-                    db.add(entry)
-                    db.commit()
-
-                await manager.broadcast(json.dumps({
-                    "type": "chat",
-                    "user_id": sender_id,
-                    "username": sender_name,
-                    "message": message,
-                    "timestamp": datetime.utcnow().isoformat(),
-                }), room_id)
-
-            elif msg_type == "change_video":
-                video_url = data.get("video_url", "")
-                manager.set_video(room_id, video_url)
-                await manager.broadcast(json.dumps({
-                    "type": "video_changed",
-                    "video_url": video_url,
-                }), room_id)
-
-            elif msg_type in ("voice-offer", "voice-answer", "voice-candidate"):
-                target_id = data.get("target_id")
-                if target_id:
-                    await manager.send_to(json.dumps(data), room_id, target_id)
-
-            elif msg_type == "set_permissions":
-                sender_id = data.get("user_id")
-                sender_part = manager.get_participant(room_id, sender_id)
-                if not sender_part or not sender_part.permissions.get("kick"):
-                    await websocket.send_json({"type": "error", "message": "Unauthorized"})
-                    logger.warning(
-                        f"[UNAUTHORIZED] User {sender_id} tried to change permissions in room {room_id}"
-                    )
-                    continue
-
-                with manager.get_db() as db:
-                    updated = manager.set_permissions(
-                        room_id,
-                        data.get("target_id"),
-                        data.get("permissions", {})
-                    )
-
-                if updated:
-                    await manager.broadcast_users(room_id)
-
-            elif msg_type == "kick":
-                sender_id = data.get("user_id")
-                sender_part = manager.get_participant(room_id, sender_id)
-                if not sender_part or not sender_part.permissions.get("kick"):
-                    await websocket.send_json({"type": "error", "message": "Unauthorized"})
-                    logger.warning(
-                        f"[UNAUTHORIZED] User {sender_id} tried to kick in room {room_id}"
-                    )
-                    continue
-
-                target_id = data.get("target_id")
-                kicked = manager.kick_user(room_id=room_id, target_id=target_id)
-
-                if kicked:
-                    ws_to_kick = manager.get_websocket_by_user_id(room_id, target_id)
-                    if ws_to_kick:
-                        try:
-                            await ws_to_kick.send_json({"type": "kicked"})
-                            logger.info(f"[KICK] Sent 'kicked' to {target_id}")
-                        except Exception as e:
-                            logger.warning(f"Failed to send 'kicked' to {target_id}: {e}")
-                    await manager.broadcast_users(room_id)
-
-    except WebSocketDisconnect:
-        manager.remove_user(room_id, user.id)
-        manager.disconnect(websocket, room_id, user.id)
-        await manager.broadcast_users(room_id)
+            frame = await _receive(websocket)
+            # Сигнализация WebRTC пересылается как есть, без разбора и валидации
+            if await signal_relay.forward(room_id, user_id, frame):
+                continue
+            try:
+                data = decode_binary(frame) if isinstance(frame, bytes) else decode(frame)
+            except DecodeError as e:
+                dispatcher.reject("decode")
+                logger.warning(f"[WS] Ignoring undecodable frame from {user_id} in room {room_id}: {e}")
+                continue
+            await dispatcher.dispatch(conn, data)
+
+    except WebSocketDisconnect as e:
+        # Нормальное закрытие — клиент ушёл сам; обрыв — он может вернуться с resume-токеном
+        resumable = e.code != 1000
+    except Exception as e:
+        logger.exception(f"[WS] Connection of {user_id} in room {room_id} failed: {e}")
+        manager.close(websocket, code=1011)
+    finally:
+        # Уборка на любом пути выхода; сервер может отменить обработчик сразу после разрыва,
+        # поэтому она идёт в отдельной задаче
+        task = asyncio.ensure_future(_leave(websocket, room_id, user_id, resumable))
+        _cleanup_tasks.add(task)
+        task.add_done_callback(_cleanup_tasks.discard)
+        await asyncio.shield(task)
+
+
+async def _leave(websocket: WebSocket, room_id: str, user_id: str, resumable: bool = False):
+    manager.disconnect(websocket, room_id, user_id)
+    if manager.get_websocket_by_user_id(room_id, user_id) is not None:
+        # Сессию уже подхватил новый сокет
+        return
+    if resumable and manager.park(room_id, user_id, WS_RESUME_GRACE, lambda: _leave(websocket, room_id, user_id)):
+        return
+    rate_limiter.forget(room_id, user_id)
+    signal_relay.forget(room_id, user_id)
+    await manager.leave(websocket, room_id, user_id)
+    _observe_peers(room_id)
+
+
+reaper = Reaper(manager, on_leave=_leave)
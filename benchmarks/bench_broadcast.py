@@ -0,0 +1,114 @@
+"""Benchmark sync-event fan-out latency of ``DBConnectionManager.broadcast``.
+
+Simulates ``--rooms`` rooms with ``--clients`` in-memory sockets each, a few of
+which are deliberately slow, and fires play/pause/seek events into every room
+at once.  Reports p50/p99 delivery latency as seen by the healthy clients.
+
+    python -m benchmarks.bench_broadcast
+    python -m benchmarks.bench_broadcast --legacy   # serial sends under one global lock
+"""
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from backend.ws.db_manager import DBConnectionManager
+
+
+class FakeWebSocket:
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.latencies: list[float] = []
+
+    async def send_text(self, message: str):
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        sent_at = float(message.rsplit(":", 1)[1])
+        self.latencies.append(time.perf_counter() - sent_at)
+
+    async def close(self, code: int = 1000):
+        pass
+
+
+class LegacyManager(DBConnectionManager):
+    """Pre-fan-out behaviour: one process-wide lock and serial awaits."""
+
+    def __init__(self):
+        super().__init__()
+        self._broadcast_lock = asyncio.Lock()
+
+    async def broadcast(self, message: str, room_id: str, sender=None):
+        async with self._broadcast_lock:
+            to_disconnect = []
+            for user_id, ws in list(self.active_connections.get(room_id, {}).items()):
+                try:
+                    await ws.send_text(message)
+                except Exception:
+                    to_disconnect.append((user_id, ws))
+            for user_id, ws in to_disconnect:
+                self.disconnect(ws, room_id, user_id)
+
+
+def percentile(values: list[float], pct: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def run(args) -> dict:
+    manager = LegacyManager() if args.legacy else DBConnectionManager(send_timeout=args.timeout)
+    healthy: list[FakeWebSocket] = []
+
+    rng = random.Random(42)
+    slow_slots = set(rng.sample(range(args.rooms * args.clients), args.slow))
+    for room in range(args.rooms):
+        for client in range(args.clients):
+            slot = room * args.clients + client
+            ws = FakeWebSocket(delay=args.slow_delay if slot in slow_slots else 0.0)
+            if slot not in slow_slots:
+                healthy.append(ws)
+            manager.active_connections.setdefault(f"room-{room}", {})[f"user-{client}"] = ws
+
+    async def room_events(room_id: str):
+        for seq, kind in zip(range(args.events), ("play", "seek", "pause") * args.events):
+            await manager.broadcast(f"{kind}:{seq}:{time.perf_counter()}", room_id)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(room_events(f"room-{room}") for room in range(args.rooms)))
+    wall = time.perf_counter() - started
+
+    latencies = [lat for ws in healthy for lat in ws.latencies]
+    return {
+        "mode": "legacy" if args.legacy else "fanout",
+        "rooms": args.rooms,
+        "clients": args.clients,
+        "slow_receivers": args.slow,
+        "deliveries": len(latencies),
+        "wall_s": round(wall, 3),
+        "p50_ms": round(statistics.median(latencies) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+        "max_ms": round(max(latencies) * 1000, 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rooms", type=int, default=1000)
+    parser.add_argument("--clients", type=int, default=10)
+    parser.add_argument("--events", type=int, default=3, help="sync events per room")
+    parser.add_argument("--slow", type=int, default=5, help="number of slow receivers")
+    parser.add_argument("--slow-delay", type=float, default=0.5, help="send delay of a slow receiver, s")
+    parser.add_argument("--timeout", type=float, default=0.1, help="per-send timeout, s")
+    parser.add_argument("--legacy", action="store_true")
+    args = parser.parse_args()
+
+    print(json.dumps(asyncio.run(run(args))))
+
+
+if __name__ == "__main__":
+    main()
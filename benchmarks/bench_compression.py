@@ -0,0 +1,91 @@
+"""Benchmark permessage-deflate policies on a watch-party frame mix.
+
+Pushes the frames one member of a ``--members`` room receives during a
+session (history on join, roster snapshot, a chat burst, roster deltas and a
+steady stream of play/seek/sync frames) through the server side of
+permessage-deflate and reports bytes on the wire and deflate CPU per message
+for: no compression, deflate-everything (uvicorn's default) and the policy
+configured through the ``WS_COMPRESSION_*`` settings.
+
+    python -m benchmarks.bench_compression
+    WS_COMPRESSION_MIN_SIZE=1024 WS_COMPRESSION_SKIP_TYPES=sync python -m benchmarks.bench_compression
+"""
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from websockets.frames import Frame, Opcode
+
+from backend.config import WS_COMPRESSION_LEVEL, WS_COMPRESSION_WINDOW_BITS
+from backend.ws import frames
+from backend.ws.compression import CompressionPolicy, PolicyDeflateFactory, default_factory
+
+
+def session(members: int) -> list[bytes]:
+    playback = {"state": "playing", "position": 1312.504, "rate": 1.0, "server_time": 1767225600.123}
+    users = [{"id": f"user-{i:06d}", "name": f"Viewer {i}", "role": "guest",
+              "permissions": {"control_video": False, "kick": False, "change_video": False}}
+             for i in range(members)]
+    chat = [{"type": "chat", "user_id": f"user-{i % members:06d}", "username": f"Viewer {i % members}",
+             "message": f"lol that scene #{i}", "timestamp": f"2026-01-01T20:00:{i % 60:02d}.000000"}
+            for i in range(200)]
+
+    events = [
+        {"type": "history", "messages": chat[:50], "next_cursor": "MjAyNi0wMS0wMVQyMDowMDowMHxtMQ=="},
+        {"type": "users_update", "version": members, "users": users},
+    ]
+    for i in range(200):
+        events.append(chat[i])
+        if i % 10 == 0:
+            events.append({"type": "user_joined", "version": members + i, "user": users[i % members]})
+        if i % 4 == 0:
+            events.append({"type": "sync", "client_time": 51234.7 + i, "playback": playback})
+        if i % 25 == 0:
+            events.append({"type": "seek", "user_id": "user-000000", "timestamp": 1312.5 + i, "playback": playback})
+    return [frames.encode(event).encode() for event in events]
+
+
+def measure(factory, payloads: list[bytes]) -> dict:
+    raw = sum(len(p) for p in payloads)
+    if factory is None:
+        return {"wire_kb": round(raw / 1024, 1), "ratio": 1.0, "cpu_us_per_msg": 0.0}
+
+    _, extension = factory.process_request_params([], [])
+    wire = 0
+    started = time.process_time()
+    for payload in payloads:
+        wire += len(extension.encode(Frame(Opcode.TEXT, payload)).data)
+    cpu = time.process_time() - started
+    return {
+        "wire_kb": round(wire / 1024, 1),
+        "ratio": round(wire / raw, 3),
+        "cpu_us_per_msg": round(cpu / len(payloads) * 1e6, 1),
+    }
+
+
+def run(args) -> dict:
+    payloads = session(args.members)
+    deflate_all = PolicyDeflateFactory(CompressionPolicy(min_size=0),
+                                       window_bits=WS_COMPRESSION_WINDOW_BITS, level=WS_COMPRESSION_LEVEL)
+    return {
+        "members": args.members,
+        "messages": len(payloads),
+        "none": measure(None, payloads),
+        "deflate_all": measure(deflate_all, payloads),
+        "policy": measure(default_factory(), payloads),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--members", type=int, default=500)
+    args = parser.parse_args()
+
+    print(json.dumps(run(args)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""Benchmark the hot lookup queries with and without the secondary indexes.
+
+Seeds a throw-away SQLite database with ``--messages`` chat messages and
+``--participants`` room participants spread over ``--rooms`` rooms, then times
+the queries the WebSocket endpoint runs (participant by room and user,
+connected participants of a room, last chat history of a room) first without
+and then with the indexes declared in ``backend/db/models.py``.
+
+    python -m benchmarks.bench_db_indexes
+    python -m benchmarks.bench_db_indexes --messages 100000 --participants 5000
+"""
+import argparse
+import json
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from sqlalchemy import create_engine, select
+
+from backend.db.database import Base
+from backend.db.models import Message, Room, RoomParticipant, User
+
+QUERIES = {
+    "participant_by_room_user": lambda room, user: select(RoomParticipant)
+        .filter_by(room_id=room, user_id=user).limit(1),
+    "connected_participants": lambda room, user: select(RoomParticipant)
+        .filter_by(room_id=room, connected=True).order_by(RoomParticipant.joined_at),
+    "chat_history": lambda room, user: select(Message)
+        .filter_by(room_id=room).order_by(Message.timestamp.desc(), Message.id.desc()).limit(51),
+}
+
+
+def seed(engine, args) -> dict[str, list[str]]:
+    """Insert rooms, users, participants and messages; return user ids per room."""
+    rng = random.Random(args.seed)
+    rooms = [f"room{i}" for i in range(args.rooms)]
+    members: dict[str, list[str]] = {room: [] for room in rooms}
+    started = datetime(2025, 1, 1)
+
+    with engine.begin() as conn:
+        conn.execute(Room.__table__.insert(), [{"id": room, "created_at": started} for room in rooms])
+        conn.execute(User.__table__.insert(), [
+            {"id": f"user{i}", "name": f"user{i}"} for i in range(args.participants)
+        ])
+        participants = []
+        for i in range(args.participants):
+            room = rooms[i % len(rooms)]
+            members[room].append(f"user{i}")
+            participants.append({
+                "id": f"p{i}", "room_id": room, "user_id": f"user{i}", "role": "guest",
+                "permissions": {}, "connected": rng.random() < 0.2,
+                "joined_at": started + timedelta(seconds=i),
+            })
+        conn.execute(RoomParticipant.__table__.insert(), participants)
+
+        for offset in range(0, args.messages, 50_000):
+            batch = []
+            for i in range(offset, min(offset + 50_000, args.messages)):
+                room = rng.choice(rooms)
+                batch.append({
+                    "id": f"m{i}", "room_id": room, "user_id": rng.choice(members[room]),
+                    "username": "user", "text": f"message {i}",
+                    "timestamp": started + timedelta(milliseconds=i),
+                })
+            conn.execute(Message.__table__.insert(), batch)
+    return members
+
+
+def measure(engine, members: dict[str, list[str]], lookups: int, seed_value: int) -> dict:
+    rng = random.Random(seed_value)
+    probes = []
+    for _ in range(lookups):
+        room = rng.choice(list(members))
+        probes.append((room, rng.choice(members[room])))
+
+    results = {}
+    with engine.connect() as conn:
+        for name, build in QUERIES.items():
+            timings = []
+            for room, user in probes:
+                started = time.perf_counter()
+                conn.execute(build(room, user)).fetchall()
+                timings.append((time.perf_counter() - started) * 1000)
+            results[name] = {
+                "p50_ms": round(statistics.median(timings), 3),
+                "max_ms": round(max(timings), 3),
+            }
+    return results
+
+
+def run(args) -> dict:
+    indexes = [*RoomParticipant.__table__.indexes, *Message.__table__.indexes]
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{tmp}/bench.db")
+        Base.metadata.create_all(bind=engine)
+        for index in indexes:
+            index.drop(bind=engine)
+
+        seeding_started = time.perf_counter()
+        members = seed(engine, args)
+        seed_s = time.perf_counter() - seeding_started
+
+        before = measure(engine, members, args.lookups, args.seed)
+        for index in indexes:
+            index.create(bind=engine)
+        with engine.begin() as conn:
+            conn.exec_driver_sql("ANALYZE")
+        after = measure(engine, members, args.lookups, args.seed)
+        engine.dispose()
+
+    return {
+        "messages": args.messages,
+        "participants": args.participants,
+        "rooms": args.rooms,
+        "seed_s": round(seed_s, 1),
+        "without_indexes": before,
+        "with_indexes": after,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=1_000_000)
+    parser.add_argument("--participants", type=int, default=50_000)
+    parser.add_argument("--rooms", type=int, default=2_000)
+    parser.add_argument("--lookups", type=int, default=200, help="probes per query")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    print(json.dumps(run(args)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""Benchmark CPU cost of one broadcast to a large room.
+
+Fans ``users_update`` and chat events out to a ``--members`` room of in-memory
+sockets connected through ``DBConnectionManager`` (outbound queues and writer
+tasks included) and reports CPU microseconds per broadcast.  ``--legacy`` serialises the event once per recipient, as
+``send_json`` does; ``--stdlib`` keeps serialize-once but forces the standard
+``json`` encoder instead of ``backend.ws.frames``.
+
+    python -m benchmarks.bench_frames
+    python -m benchmarks.bench_frames --legacy
+    python -m benchmarks.bench_frames --stdlib
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from backend.ws import db_manager, frames
+from backend.ws.db_manager import DBConnectionManager
+from backend.ws.room_state import RoomState, ParticipantState, ADMIN_PERMISSIONS, GUEST_PERMISSIONS
+
+
+class NullWebSocket:
+    async def accept(self, subprotocol: str | None = None):
+        pass
+
+    async def send_text(self, message: str):
+        pass
+
+    async def close(self, code: int = 1000):
+        pass
+
+
+class LegacyManager(DBConnectionManager):
+    """Serialises the event separately for every recipient, like ``send_json``."""
+
+    async def _broadcast_local(self, message, room_id, kind=None, exclude=None):
+        event = json.loads(message)
+        for user_id, ws in list(self.active_connections.get(room_id, {}).items()):
+            self.outbound[ws].put(json.dumps(event), kind)
+
+
+def _room(members: int) -> RoomState:
+    joined = datetime(2025, 1, 1)
+    state = RoomState("room")
+    for i in range(members):
+        state.participants[f"user{i}"] = ParticipantState(
+            f"user{i}", f"User {i}", "admin" if i == 0 else "guest",
+            dict(ADMIN_PERMISSIONS if i == 0 else GUEST_PERMISSIONS), True, joined,
+        )
+    return state
+
+
+async def run(args) -> dict:
+    if args.stdlib:
+        db_manager.encode = lambda obj: json.dumps(obj)
+    manager_cls = LegacyManager if args.legacy else DBConnectionManager
+    manager = manager_cls(queue_size=args.events + 1)
+    manager.rooms["room"] = _room(args.members)
+    sockets = [NullWebSocket() for _ in range(args.members)]
+    for i, ws in enumerate(sockets):
+        await manager.connect(ws, "room", f"user{i}")
+    chat = frames.encode({"type": "chat", "user_id": "user1", "username": "User 1",
+                          "message": "x" * 80, "timestamp": datetime.utcnow().isoformat()})
+
+    results = {}
+    for name, broadcast in (
+        ("users_update", lambda: manager.broadcast_users("room")),
+        ("chat", lambda: manager.broadcast(chat, "room", kind="chat")),
+    ):
+        started = time.process_time()
+        for _ in range(args.events):
+            await broadcast()
+        while any(queue.depth for queue in manager.outbound.values()):
+            await asyncio.sleep(0)
+        results[f"{name}_cpu_us"] = round((time.process_time() - started) / args.events * 1e6, 1)
+
+    for i, ws in enumerate(sockets):
+        manager.disconnect(ws, "room", f"user{i}")
+
+    mode = "legacy" if args.legacy else "stdlib" if args.stdlib else frames.ENCODER
+    return {"mode": mode, "members": args.members, "events": args.events, **results}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--members", type=int, default=500)
+    parser.add_argument("--events", type=int, default=50)
+    parser.add_argument("--legacy", action="store_true")
+    parser.add_argument("--stdlib", action="store_true")
+    args = parser.parse_args()
+
+    print(json.dumps(asyncio.run(run(args))))
+
+
+if __name__ == "__main__":
+    main()
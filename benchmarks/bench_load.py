@@ -0,0 +1,392 @@
+"""Load test of the WebSocket server: N rooms x M clients against a local uvicorn.
+
+Starts ``backend.main:app`` under uvicorn in a subprocess (fresh SQLite
+database in a temporary directory, per-user rate limits off unless
+``--keep-limits``) and connects ``--rooms`` x ``--clients`` WebSocket clients
+from this process; the first client of every room is its admin.  For
+``--duration`` seconds each room then gets ``--rate`` actions per second on a
+seeded random schedule, mixed by ``--mix``:
+
+* ``chat`` – a random member sends a chat message;
+* ``seek`` – a random member seeks to a new position;
+* ``rejoin`` – a guest closes its socket, waits ``--rejoin-delay`` and joins again;
+* ``kick`` – the admin kicks a guest, which joins again after ``--rejoin-delay``.
+
+Reports actions and delivered frames per second, p50/p99 fan-out latency of
+chat and seek frames (send to receipt by each member), server RSS per
+connection and server CPU from ``/proc`` (Linux only).  The clients share one
+event loop; if ``client_cpu_pct`` nears 100 the harness, not the server, is
+the bottleneck.
+
+    python -m benchmarks.bench_load
+    python -m benchmarks.bench_load --rooms 50 --clients 20 --duration 30
+    python -m benchmarks.bench_load --mix chat=1                # chat only
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(ROOT))
+from websockets.asyncio.client import connect
+from websockets.exceptions import ConnectionClosed
+
+ACTIONS = ("chat", "seek", "rejoin", "kick")
+DEFAULT_MIX = "chat=60,seek=30,rejoin=8,kick=2"
+
+
+def percentile(values: list[float], pct: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def parse_mix(value: str) -> dict[str, float]:
+    """Parse ``"chat=60,seek=30"`` into action weights; unnamed actions get 0."""
+    mix = dict.fromkeys(ACTIONS, 0.0)
+    for item in value.split(","):
+        name, _, weight = item.partition("=")
+        if name.strip() not in mix:
+            raise argparse.ArgumentTypeError(f"unknown action {name.strip()!r}, expected one of {ACTIONS}")
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+def _rss_kb(pid: int) -> int | None:
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        return None
+    return None
+
+
+def _cpu_s(pid: int) -> float | None:
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            # Имя процесса в скобках может содержать пробелы — поля считаем после него
+            fields = f.read().rsplit(")", 1)[1].split()
+    except OSError:
+        return None
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+
+class Server:
+    """uvicorn with ``backend.main:app`` in a subprocess working in a temporary directory."""
+
+    def __init__(self, keep_limits: bool):
+        self.keep_limits = keep_limits
+        self.workdir = tempfile.TemporaryDirectory(prefix="cinemate-load-")
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            self.port = sock.getsockname()[1]
+        self.process: subprocess.Popen | None = None
+        self.env: dict[str, str] = {}
+
+    def command(self) -> list[str]:
+        return [sys.executable, "-m", "benchmarks.bench_load", "--serve", str(self.port)]
+
+    def start(self, timeout: float = 30.0):
+        env = {**os.environ, "PYTHONPATH": os.pathsep.join(filter(None, [str(ROOT), os.getenv("PYTHONPATH")]))}
+        if not self.keep_limits:
+            env.update(WS_CHAT_RATE="0", WS_SYNC_RATE="0")
+        # Метрики и так доступны на /metrics; отдельный порт мог бы быть занят
+        env["METRICS_PORT"] = "0"
+        env.update(self.env)
+        self.stderr = open(os.path.join(self.workdir.name, "server.err"), "w+")
+        # База по относительному пути — в рабочем каталоге процесса, то есть каждый прогон с чистой БД
+        self.process = subprocess.Popen(
+            self.command(),
+            cwd=self.workdir.name, env=env, stdout=subprocess.DEVNULL, stderr=self.stderr,
+        )
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                self.stderr.seek(0)
+                raise RuntimeError(f"server exited with {self.process.returncode}:\n{self.stderr.read()[-2000:]}")
+            try:
+                socket.create_connection(("127.0.0.1", self.port), timeout=0.5).close()
+                return
+            except OSError:
+                time.sleep(0.1)
+        raise RuntimeError(f"server did not listen on port {self.port} within {timeout}s")
+
+    def stop(self):
+        if self.process is not None and self.process.poll() is None:
+            self.process.send_signal(signal.SIGINT)
+            try:
+                self.process.wait(10)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.wait()
+        self.stderr.close()
+        self.workdir.cleanup()
+
+    @property
+    def url(self) -> str:
+        return f"ws://127.0.0.1:{self.port}"
+
+
+class Stats:
+    def __init__(self):
+        self.actions = Counter()
+        self.frames = 0
+        self.chars = 0
+        self.errors = 0
+        self.latency: dict[str, list[float]] = {"chat": [], "seek": []}
+        # Время отправки по тексту сообщения чата и по (комната, позиция) перемотки
+        self.chat_sent: dict[str, float] = {}
+        self.seek_sent: dict[tuple[str, float], float] = {}
+
+
+class Client:
+    def __init__(self, load: "Load", room: str, user_id: str):
+        self.load = load
+        self.room = room
+        self.user_id = user_id
+        self.ws = None
+        self.reader: asyncio.Task | None = None
+        self.ready = asyncio.Event()
+        # Клиент уходит из комнаты или возвращается — действия ему не назначаются
+        self.busy = False
+
+    async def join(self):
+        self.ready.clear()
+        self.ws = await connect(f"{self.load.url}/ws/{self.room}?username={self.user_id}&user_id={self.user_id}",
+                                max_size=None)
+        self.reader = asyncio.create_task(self._read(self.ws))
+        # Вход завершён, когда пришла история чата — последний кадр приветствия
+        await asyncio.wait_for(self.ready.wait(), 30)
+
+    async def leave(self):
+        ws, self.ws = self.ws, None
+        if ws is not None:
+            await ws.close()
+            await self.reader
+
+    async def rejoin(self, delay: float):
+        try:
+            await self.leave()
+            await asyncio.sleep(delay)
+            await self.join()
+        except (OSError, ConnectionClosed, asyncio.TimeoutError):
+            self.load.stats.errors += 1
+        finally:
+            self.busy = False
+
+    async def send(self, message: dict) -> bool:
+        try:
+            await self.ws.send(json.dumps(message))
+            return True
+        except (AttributeError, ConnectionClosed):
+            self.load.stats.errors += 1
+            return False
+
+    async def _read(self, ws):
+        stats = self.load.stats
+        try:
+            async for frame in ws:
+                received_at = time.perf_counter()
+                stats.frames += 1
+                stats.chars += len(frame)
+                message = json.loads(frame)
+                kind = message.get("type")
+                if kind == "chat":
+                    sent_at = stats.chat_sent.get(message.get("message"))
+                    if sent_at is not None:
+                        stats.latency["chat"].append(received_at - sent_at)
+                elif kind == "seek":
+                    sent_at = stats.seek_sent.get((self.room, message.get("timestamp")))
+                    if sent_at is not None:
+                        stats.latency["seek"].append(received_at - sent_at)
+                elif kind == "history":
+                    self.ready.set()
+                elif kind == "kicked":
+                    # Как фронтенд: закрыть сокет, а затем войти снова
+                    self.load.spawn(self.rejoin(self.load.args.rejoin_delay))
+                    return
+        except ConnectionClosed:
+            pass
+
+
+class Load:
+    def __init__(self, args, url: str):
+        self.args = args
+        self.url = url
+        self.stats = Stats()
+        self.rooms: dict[str, list[Client]] = {}
+        self._tasks: set[asyncio.Task] = set()
+        self._sent = 0
+
+    def spawn(self, coro):
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def connect_all(self):
+        async def fill(room: str):
+            clients = [Client(self, room, f"{room}-user-{i}") for i in range(self.args.clients)]
+            self.rooms[room] = clients
+            # Первый вошедший становится админом, поэтому входим по очереди
+            for client in clients:
+                await client.join()
+
+        await asyncio.gather(*(fill(f"load-{self.args.seed}-{i}") for i in range(self.args.rooms)))
+
+    async def drive(self, room: str, rng: random.Random, started: float):
+        clients = self.rooms[room]
+        admin, guests = clients[0], clients[1:]
+        mix = self.args.mix
+        weights = [mix[action] for action in ACTIONS]
+        position = 0
+        # Открытая модель нагрузки: расписание не зависит от того, как быстро отвечает сервер
+        next_at = started
+        while True:
+            next_at += rng.expovariate(self.args.rate)
+            if next_at >= started + self.args.duration:
+                return
+            await asyncio.sleep(max(0.0, next_at - time.perf_counter()))
+            action = rng.choices(ACTIONS, weights)[0]
+            idle = [client for client in clients if not client.busy and client.ws is not None]
+            idle_guests = [client for client in idle if client is not admin]
+            if action in ("rejoin", "kick") and not idle_guests:
+                continue
+            self._sent += 1
+            if action == "chat":
+                text = f"load {self._sent}"
+                self.stats.chat_sent[text] = time.perf_counter()
+                sender = rng.choice(idle)
+                ok = await sender.send({"type": "chat", "user_id": sender.user_id, "message": text})
+            elif action == "seek":
+                position += 1
+                sender = rng.choice(idle)
+                self.stats.seek_sent[(room, float(position))] = time.perf_counter()
+                ok = await sender.send({"type": "seek", "user_id": sender.user_id, "timestamp": float(position)})
+            elif action == "rejoin":
+                guest = rng.choice(idle_guests)
+                guest.busy = ok = True
+                self.spawn(guest.rejoin(self.args.rejoin_delay))
+            else:
+                guest = rng.choice(idle_guests)
+                guest.busy = True
+                ok = await admin.send({"type": "kick", "user_id": admin.user_id, "target_id": guest.user_id})
+                guest.busy = ok
+            if ok:
+                self.stats.actions[action] += 1
+
+    async def run(self, server_pid: int | None) -> dict:
+        # Прогрев: первые импорты и кэши сервера не должны попасть в память на соединение
+        warmup = Client(self, f"load-{self.args.seed}-warmup", "warmup")
+        await warmup.join()
+        await warmup.leave()
+        await asyncio.sleep(0.5)
+        rss_before = _rss_kb(server_pid) if server_pid else None
+
+        await self.connect_all()
+        await asyncio.sleep(0.5)
+        rss_after = _rss_kb(server_pid) if server_pid else None
+        connections = self.args.rooms * self.args.clients
+
+        cpu_before = _cpu_s(server_pid) if server_pid else None
+        client_cpu_before = time.process_time()
+        started = time.perf_counter()
+        await asyncio.gather(*(
+            self.drive(room, random.Random(f"{self.args.seed}:{room}"), started) for room in self.rooms
+        ))
+        # Кадры, отправленные в последние мгновения, ещё в пути
+        await asyncio.sleep(self.args.drain)
+        wall = time.perf_counter() - started
+        cpu_after = _cpu_s(server_pid) if server_pid else None
+        client_cpu = time.process_time() - client_cpu_before
+
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        await asyncio.gather(*(client.leave() for clients in self.rooms.values() for client in clients),
+                             return_exceptions=True)
+
+        stats = self.stats
+        result = {
+            "rooms": self.args.rooms,
+            "clients": self.args.clients,
+            "connections": connections,
+            "duration_s": self.args.duration,
+            "rate_per_room": self.args.rate,
+            "seed": self.args.seed,
+            "actions": dict(stats.actions),
+            "actions_per_s": round(sum(stats.actions.values()) / self.args.duration, 1),
+            "frames_per_s": round(stats.frames / wall, 1),
+            "kb_per_s": round(stats.chars / wall / 1024, 1),
+            "errors": stats.errors,
+        }
+        for kind, latencies in stats.latency.items():
+            if latencies:
+                result[f"{kind}_deliveries"] = len(latencies)
+                result[f"{kind}_p50_ms"] = round(statistics.median(latencies) * 1000, 3)
+                result[f"{kind}_p99_ms"] = round(percentile(latencies, 99) * 1000, 3)
+                result[f"{kind}_max_ms"] = round(max(latencies) * 1000, 3)
+        if rss_before is not None and rss_after is not None:
+            result["server_rss_mb"] = round(rss_after / 1024, 1)
+            result["server_kb_per_connection"] = round((rss_after - rss_before) / connections, 1)
+        if cpu_before is not None and cpu_after is not None:
+            result["server_cpu_s"] = round(cpu_after - cpu_before, 2)
+            result["server_cpu_pct"] = round((cpu_after - cpu_before) / wall * 100, 1)
+        result["client_cpu_pct"] = round(client_cpu / wall * 100, 1)
+        return result
+
+
+def _serve(port: int):
+    import uvicorn
+
+    from backend.db.database import Base, engine
+    from backend.main import app
+    from backend.ws.compression import CompressingWebSocketProtocol
+
+    Base.metadata.create_all(bind=engine)
+    uvicorn.run(app, host="127.0.0.1", port=port, ws=CompressingWebSocketProtocol, log_level="warning")
+
+
+def run(args) -> dict:
+    server = Server(keep_limits=args.keep_limits)
+    try:
+        server.start()
+        return asyncio.run(Load(args, server.url).run(server.process.pid))
+    finally:
+        server.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rooms", type=int, default=20)
+    parser.add_argument("--clients", type=int, default=10, help="clients per room")
+    parser.add_argument("--duration", type=float, default=15.0, help="seconds of traffic")
+    parser.add_argument("--rate", type=float, default=10.0, help="actions per second per room")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix(DEFAULT_MIX),
+                        help=f"action weights (default {DEFAULT_MIX})")
+    parser.add_argument("--rejoin-delay", type=float, default=0.5, help="seconds a leaving guest stays away")
+    parser.add_argument("--drain", type=float, default=2.0, help="seconds to wait for in-flight frames")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--keep-limits", action="store_true", help="keep the server's per-user rate limits")
+    parser.add_argument("--serve", type=int, metavar="PORT", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        _serve(args.serve)
+        return
+    print(json.dumps(run(args)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""Benchmark a flapping client: session resumption vs a full rejoin.
+
+A client in a room with ``--history`` chat messages loses its socket
+``--reconnects`` times.  While it is away one chat message is sent, and then
+the client reconnects with its resume token and ``last_seq``.  Reports the
+bytes the reconnecting client receives, the frames the rest of the room
+receives because of the reconnect, and the wall time per reconnect.
+``--legacy`` closes the socket normally and joins again without a token, as
+before resumable sessions existed.
+
+    python -m benchmarks.bench_resume
+    python -m benchmarks.bench_resume --legacy
+"""
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from fastapi.testclient import TestClient
+
+from backend import ws_endpoint
+from backend.db.database import Base, engine
+from backend.main import app
+
+
+def _wait(predicate, timeout: float = 5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate() and time.monotonic() < deadline:
+        time.sleep(0.001)
+
+
+def _read_until(ws, marker: str) -> tuple[int, int]:
+    """Receive frames until one mentions ``marker``; return (frames, bytes) received before and with it."""
+    frames = size = 0
+    while True:
+        text = ws.receive_text()
+        frames += 1
+        size += len(text.encode())
+        if marker in text:
+            return frames, size
+
+
+def run(args) -> dict:
+    Base.metadata.create_all(bind=engine)
+    # Кадры отправляются без пауз — лимиты частоты здесь только мешают измерению
+    ws_endpoint.rate_limiter = ws_endpoint.RateLimiter({})
+    manager = ws_endpoint.manager
+    room = f"bench_resume_{int(time.time())}"
+    flapper_url = f"/ws/{room}?username=flapper&user_id=bench_flapper"
+
+    with TestClient(app) as client:
+        observer = client.websocket_connect(f"/ws/{room}?username=observer&user_id=bench_observer").__enter__()
+        for _ in range(3):
+            observer.receive_text()
+        for i in range(args.history):
+            observer.send_json({"type": "chat", "user_id": "bench_observer", "message": f"history {i} " + "x" * 80})
+            observer.receive_text()
+
+        flapper = client.websocket_connect(flapper_url).__enter__()
+        joined = json.loads(flapper.receive_text())
+        flapper.receive_text()
+        flapper.receive_text()
+        observer.receive_text()  # user_joined
+        token, last_seq = joined["resume_token"], joined["seq"]
+
+        client_bytes = room_frames = 0
+        started = time.perf_counter()
+        for i in range(args.reconnects):
+            if args.legacy:
+                flapper.__exit__(None, None, None)
+                _wait(lambda: manager.get_participant(room, "bench_flapper") is None)
+            else:
+                flapper.close(code=1006)
+                _wait(lambda: "bench_flapper" not in manager.active_connections.get(room, {}))
+                flapper.__exit__(None, None, None)
+
+            observer.send_json({"type": "chat", "user_id": "bench_observer", "message": f"missed {i}"})
+            frames, _ = _read_until(observer, f"missed {i}")
+            room_frames += frames - 1
+            if args.legacy:
+                flapper = client.websocket_connect(flapper_url).__enter__()
+            else:
+                flapper = client.websocket_connect(f"{flapper_url}&resume={token}&last_seq={last_seq}").__enter__()
+            # Пропущенное сообщение приходит в истории (полный вход) или досылкой (возобновление)
+            client_bytes += _read_until(flapper, f"missed {i}")[1]
+
+            observer.send_json({"type": "chat", "user_id": "bench_observer", "message": f"marker {i}"})
+            frames, _ = _read_until(observer, f"marker {i}")
+            room_frames += frames - 1
+            _read_until(flapper, f"marker {i}")
+            # Маркер — последний разосланный кадр, его номер клиент и предъявит
+            last_seq = manager.rooms[room].replay.seq
+        wall = time.perf_counter() - started
+
+        flapper.__exit__(None, None, None)
+        observer.__exit__(None, None, None)
+
+    return {
+        "mode": "legacy" if args.legacy else "resume",
+        "reconnects": args.reconnects,
+        "history": args.history,
+        "client_kb_per_reconnect": round(client_bytes / args.reconnects / 1024, 2),
+        "room_frames_per_reconnect": round(room_frames / args.reconnects, 2),
+        "ms_per_reconnect": round(wall / args.reconnects * 1000, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--reconnects", type=int, default=100)
+    parser.add_argument("--history", type=int, default=50)
+    parser.add_argument("--legacy", action="store_true")
+    args = parser.parse_args()
+
+    print(json.dumps(run(args)))
+
+
+if __name__ == "__main__":
+    main()
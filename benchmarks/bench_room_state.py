@@ -0,0 +1,107 @@
+"""Microbenchmark of WebSocket message handling throughput.
+
+Replays the ``tests/test_ws_permissions.py`` flows (an admin and a guest in one
+room, the admin sending chat and ``set_permissions`` frames) through
+``backend.main:app`` and reports messages/sec and messages per CPU-second of
+the process.  ``--legacy`` swaps in a manager that reads participants from the
+database on every frame, as before the in-memory ``RoomState`` existed.
+
+    python -m benchmarks.bench_room_state
+    python -m benchmarks.bench_room_state --legacy
+"""
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import joinedload
+
+from backend import ws_endpoint
+from backend.db.database import Base, SessionLocal, engine
+from backend.db.models import RoomParticipant
+from backend.main import app
+from backend.ws.db_manager import DBConnectionManager
+
+
+class LegacyManager(DBConnectionManager):
+    """Hot-path lookups served by a fresh (blocking) session and joined query each time."""
+
+    def _query_participant(self, room_id: str, user_id: str):
+        with SessionLocal() as db:
+            return db.query(RoomParticipant).options(joinedload(RoomParticipant.user)) \
+                .filter_by(room_id=room_id, user_id=user_id, connected=True).first()
+
+    def get_participant(self, room_id, user_id):
+        return self._query_participant(room_id, user_id)
+
+    def get_user(self, room_id, user_id):
+        participant = self._query_participant(room_id, user_id)
+        return participant.user if participant else None
+
+    async def broadcast_roster(self, room_id, event, user_id, exclude=None):
+        with SessionLocal() as db:
+            participants = db.query(RoomParticipant).options(joinedload(RoomParticipant.user)) \
+                .filter_by(room_id=room_id, connected=True).order_by(RoomParticipant.joined_at).all()
+            users = [{"id": p.user.id, "name": p.user.name, "role": p.role, "permissions": p.permissions}
+                     for p in participants]
+        message = json.dumps({"type": "users_update", "users": users})
+        await self._broadcast_local(message, room_id, kind="users_update", exclude=exclude)
+
+
+def run(args) -> dict:
+    Base.metadata.create_all(bind=engine)
+    # Кадры отправляются без пауз — лимиты частоты здесь только мешают измерению
+    ws_endpoint.rate_limiter = ws_endpoint.RateLimiter({})
+    if args.legacy:
+        ws_endpoint.manager = LegacyManager()
+
+    room = f"bench_room_state_{int(time.time())}"
+    with TestClient(app) as client:
+        with client.websocket_connect(f"/ws/{room}?username=admin&user_id=bench_admin") as admin_ws:
+            admin_ws.receive_json()
+            admin_ws.receive_json()
+            admin_ws.receive_json()
+            with client.websocket_connect(f"/ws/{room}?username=guest&user_id=bench_guest") as guest_ws:
+                guest_ws.receive_json()
+                guest_ws.receive_json()
+                guest_ws.receive_json()
+                admin_ws.receive_json()
+
+                wall_started, cpu_started = time.perf_counter(), time.process_time()
+                for i in range(args.messages):
+                    if i % 2:
+                        admin_ws.send_json({"type": "chat", "user_id": "bench_admin", "message": f"msg {i}"})
+                    else:
+                        admin_ws.send_json({
+                            "type": "set_permissions",
+                            "user_id": "bench_admin",
+                            "target_id": "bench_guest",
+                            "permissions": {"kick": bool(i % 4)},
+                        })
+                    guest_ws.receive_json()
+                    admin_ws.receive_json()
+                wall = time.perf_counter() - wall_started
+                cpu = time.process_time() - cpu_started
+
+    return {
+        "mode": "legacy" if args.legacy else "room_state",
+        "messages": args.messages,
+        "msgs_per_s": round(args.messages / wall, 1),
+        "msgs_per_cpu_s": round(args.messages / cpu, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=2000)
+    parser.add_argument("--legacy", action="store_true")
+    args = parser.parse_args()
+
+    print(json.dumps(run(args)))
+
+
+if __name__ == "__main__":
+    main()
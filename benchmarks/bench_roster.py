@@ -0,0 +1,97 @@
+"""Benchmark the cost of participant churn in a large room.
+
+Fills a room with ``--members`` in-memory sockets connected through
+``DBConnectionManager``, then lets ``--churn`` extra users join and leave one
+after another and reports the bytes delivered to the room and CPU per roster
+change.  By default every change goes out as a ``user_joined``/``user_left``
+delta; ``--legacy`` sends the full ``users_update`` snapshot instead.
+
+    python -m benchmarks.bench_roster
+    python -m benchmarks.bench_roster --legacy
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from backend.ws.db_manager import DBConnectionManager
+from backend.ws.room_state import (
+    RoomState, ParticipantState, ADMIN_PERMISSIONS, GUEST_PERMISSIONS, USER_JOINED, USER_LEFT,
+)
+
+
+class CountingWebSocket:
+    sent_bytes = 0
+
+    async def accept(self, subprotocol: str | None = None):
+        pass
+
+    async def send_text(self, message: str):
+        CountingWebSocket.sent_bytes += len(message.encode())
+
+    async def close(self, code: int = 1000):
+        pass
+
+
+def _participant(user_id: str, admin: bool = False) -> ParticipantState:
+    permissions = ADMIN_PERMISSIONS if admin else GUEST_PERMISSIONS
+    return ParticipantState(user_id, f"User {user_id}", "admin" if admin else "guest",
+                            dict(permissions), True, datetime(2025, 1, 1))
+
+
+async def run(args) -> dict:
+    manager = DBConnectionManager(queue_size=args.churn * 2 + 1)
+    state = manager.rooms["room"] = RoomState("room")
+    sockets = {}
+    for i in range(args.members):
+        user_id = f"user{i}"
+        state.participants[user_id] = _participant(user_id, admin=i == 0)
+        sockets[user_id] = CountingWebSocket()
+        await manager.connect(sockets[user_id], "room", user_id)
+
+    async def announce(event: str, user_id: str):
+        if args.legacy:
+            await manager.broadcast_users("room")
+        else:
+            await manager.broadcast_roster("room", event, user_id)
+
+    started = time.process_time()
+    for i in range(args.churn):
+        user_id = f"churn{i}"
+        state.participants[user_id] = _participant(user_id)
+        await announce(USER_JOINED, user_id)
+        state.participants[user_id].connected = False
+        await announce(USER_LEFT, user_id)
+    while any(queue.depth for queue in manager.outbound.values()):
+        await asyncio.sleep(0)
+    cpu = time.process_time() - started
+
+    for user_id, ws in sockets.items():
+        manager.disconnect(ws, "room", user_id)
+
+    changes = args.churn * 2
+    return {
+        "mode": "legacy" if args.legacy else "deltas",
+        "members": args.members,
+        "changes": changes,
+        "kb_per_change": round(CountingWebSocket.sent_bytes / changes / 1024, 1),
+        "cpu_us_per_change": round(cpu / changes * 1e6, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--members", type=int, default=500)
+    parser.add_argument("--churn", type=int, default=50)
+    parser.add_argument("--legacy", action="store_true")
+    args = parser.parse_args()
+
+    print(json.dumps(asyncio.run(run(args))))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+"""Multi-core load test: the room-sharding supervisor with 1 vs N workers.
+
+Starts ``python -m backend.supervisor`` (fresh SQLite database in a temporary
+directory, rate limits off) once per entry of ``--workers`` and drives it
+with the traffic of :mod:`benchmarks.bench_load`: ``--rooms`` x ``--clients``
+WebSocket clients doing chat, seek, rejoin and kick.  The rooms are split
+across ``--client-procs`` client processes, so that the harness itself uses
+several cores.
+
+For every worker count it reports actions and delivered frames per second
+(summed over the client processes), the worst p99 fan-out latency of chat and
+seek among them, and the CPU of the router and of each worker from ``/proc``
+(Linux only).  ``speedup`` is the frame rate of each run over the first one.
+The load is open (a fixed rate per room), so throughput follows the offered
+load until the workers saturate: raise ``--rooms`` or ``--rate`` to find the
+ceiling of each worker count; below it, latency and worker CPU show the
+headroom and whether the rooms spread over the workers.
+
+    python -m benchmarks.bench_shards
+    python -m benchmarks.bench_shards --workers 1,2,4,8 --rooms 200 --client-procs 4
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(ROOT))
+from benchmarks.bench_load import DEFAULT_MIX, Load, Server, _cpu_s, parse_mix
+
+# Метрики, которые складываются по клиентским процессам, и те, где берётся худшее значение
+SUMMED = ("actions_per_s", "frames_per_s", "kb_per_s", "errors", "chat_deliveries", "seek_deliveries")
+WORST = ("chat_p50_ms", "chat_p99_ms", "chat_max_ms", "seek_p50_ms", "seek_p99_ms", "seek_max_ms")
+
+
+class ShardedServer(Server):
+    """The supervisor with ``workers`` worker processes instead of a single uvicorn."""
+
+    def __init__(self, keep_limits: bool, workers: int):
+        super().__init__(keep_limits)
+        self.workers = workers
+        # Воркеры не слушают своих портов: соединения приходят только через роутер
+        self.env["SHARD_BASE_PORT"] = "0"
+
+    def command(self) -> list[str]:
+        return [sys.executable, "-m", "benchmarks.bench_shards", "--serve", str(self.port),
+                "--workers", str(self.workers)]
+
+    def worker_pids(self) -> list[int]:
+        """PIDs of the supervisor's worker processes, in start order."""
+        pids = []
+        for entry in os.listdir("/proc"):
+            if not entry.isdigit():
+                continue
+            try:
+                with open(f"/proc/{entry}/stat") as f:
+                    fields = f.read().rsplit(")", 1)[1].split()
+            except OSError:
+                continue
+            if int(fields[1]) == self.process.pid:
+                pids.append(int(entry))
+        return sorted(pids)
+
+
+def _drive_args(args, seed: int, rooms: int) -> list[str]:
+    mix = ",".join(f"{action}={weight}" for action, weight in args.mix.items())
+    return [
+        "--rooms", str(rooms), "--clients", str(args.clients), "--duration", str(args.duration),
+        "--rate", str(args.rate), "--mix", mix, "--rejoin-delay", str(args.rejoin_delay),
+        "--drain", str(args.drain), "--seed", str(seed),
+    ]
+
+
+def _merge(results: list[dict]) -> dict:
+    merged = {}
+    for key in SUMMED:
+        values = [result[key] for result in results if key in result]
+        if values:
+            merged[key] = round(sum(values), 1)
+    for key in WORST:
+        values = [result[key] for result in results if key in result]
+        if values:
+            merged[key] = max(values)
+    merged["client_cpu_pct"] = [result["client_cpu_pct"] for result in results]
+    return merged
+
+
+def run_workers(args, workers: int) -> dict:
+    server = ShardedServer(args.keep_limits, workers)
+    try:
+        server.start()
+        # Комнаты делятся между клиентскими процессами; у каждого свой seed — и свои имена комнат
+        per_proc = [args.rooms // args.client_procs + (i < args.rooms % args.client_procs)
+                    for i in range(args.client_procs)]
+        # Роутер слушает порт раньше, чем запущены воркеры
+        deadline = time.monotonic() + 30
+        while len(server.worker_pids()) < workers and time.monotonic() < deadline:
+            time.sleep(0.1)
+        pids = [server.process.pid, *server.worker_pids()]
+        cpu_before = [_cpu_s(pid) for pid in pids]
+        started = time.perf_counter()
+        clients = [
+            subprocess.Popen(
+                [sys.executable, "-m", "benchmarks.bench_shards", "--drive", server.url,
+                 *_drive_args(args, args.seed * 1000 + i, rooms)],
+                cwd=ROOT, stdout=subprocess.PIPE, text=True,
+            )
+            for i, rooms in enumerate(per_proc) if rooms
+        ]
+        results = [json.loads(proc.communicate()[0].strip().splitlines()[-1]) for proc in clients]
+        wall = time.perf_counter() - started
+        cpu_after = [_cpu_s(pid) for pid in pids]
+    finally:
+        server.stop()
+
+    result = {"workers": workers, **_merge(results)}
+    cpu = [after - before if before is not None and after is not None else None
+           for before, after in zip(cpu_before, cpu_after)]
+    if all(value is not None for value in cpu):
+        result["router_cpu_pct"] = round(cpu[0] / wall * 100, 1)
+        result["worker_cpu_pct"] = [round(value / wall * 100, 1) for value in cpu[1:]]
+        result["server_cpu_s"] = round(sum(cpu), 2)
+    return result
+
+
+def _serve(port: int, workers: int):
+    import backend.db.models  # noqa: F401 — регистрирует таблицы в Base
+    from backend.db.database import Base, engine
+    from backend.supervisor import Supervisor
+
+    Base.metadata.create_all(bind=engine)
+    asyncio.run(Supervisor("127.0.0.1", port, workers).run())
+
+
+def run(args) -> dict:
+    runs = [run_workers(args, workers) for workers in args.workers]
+    base = runs[0].get("frames_per_s") or None
+    for result in runs:
+        if base:
+            result["speedup"] = round(result.get("frames_per_s", 0) / base, 2)
+    return {
+        "rooms": args.rooms,
+        "clients": args.clients,
+        "client_procs": args.client_procs,
+        "duration_s": args.duration,
+        "rate_per_room": args.rate,
+        "cpus": os.cpu_count(),
+        "runs": runs,
+    }
+
+
+def main():
+    cpus = os.cpu_count() or 1
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=lambda v: [int(n) for n in v.split(",")],
+                        default=sorted({1, min(cpus, 4)}), help="comma-separated worker counts to compare")
+    parser.add_argument("--rooms", type=int, default=80)
+    parser.add_argument("--clients", type=int, default=10, help="clients per room")
+    parser.add_argument("--client-procs", type=int, default=max(1, min(cpus // 2, 4)),
+                        help="client processes sharing the rooms")
+    parser.add_argument("--duration", type=float, default=15.0, help="seconds of traffic")
+    parser.add_argument("--rate", type=float, default=10.0, help="actions per second per room")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix(DEFAULT_MIX),
+                        help=f"action weights (default {DEFAULT_MIX})")
+    parser.add_argument("--rejoin-delay", type=float, default=0.5, help="seconds a leaving guest stays away")
+    parser.add_argument("--drain", type=float, default=2.0, help="seconds to wait for in-flight frames")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--keep-limits", action="store_true", help="keep the server's per-user rate limits")
+    parser.add_argument("--serve", type=int, metavar="PORT", help=argparse.SUPPRESS)
+    parser.add_argument("--drive", metavar="URL", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        _serve(args.serve, args.workers[0])
+        return
+    if args.drive:
+        print(json.dumps(asyncio.run(Load(args, args.drive).run(None))))
+        return
+    print(json.dumps(run(args)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""Benchmark the relay of trickle-ICE candidates on the P2P (non-LiveKit) voice path.
+
+``--peers`` participants of one room exchange ``voice-candidate`` frames in a
+full mesh, as during a group call, and the frames go through an in-process
+connection manager to fake sockets.  Three paths are compared:
+
+* ``decoded`` – what the server did before the relay: decode the frame,
+  validate it with the dispatcher, dump the model and encode it again;
+* ``relay`` – the header peek of :class:`SignalRelay` (a JSON frame is parsed,
+  but not validated or re-encoded), raw frame forwarded;
+* ``batched`` – the relay with candidates batched per target for ``--window``
+  seconds.
+
+Reports candidates relayed per second and frames actually sent to sockets.
+
+    python -m benchmarks.bench_signal
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from backend.ws import frames
+from backend.ws.broker import InProcessBroker, InProcessHub
+from backend.ws.db_manager import DBConnectionManager
+from backend.ws.dispatch import Connection, Dispatcher
+from backend.ws.signal_relay import CANDIDATE, SIGNAL_TYPES, SignalRelay
+
+ROOM = "bench"
+
+
+class FakeSocket:
+    def __init__(self):
+        self.frames = 0
+        self.candidates = 0
+
+    async def send_text(self, message: str):
+        self.frames += 1
+        self.candidates += message.count('"type":"voice-candidate"')
+
+    async def send_bytes(self, message: bytes):
+        self.frames += 1
+        decoded = frames.decode_binary(message)
+        self.candidates += len(decoded["frames"]) if decoded["type"] == "voice-candidates" else 1
+
+
+def _candidates(peers: int, count: int, seed: int) -> list[tuple[str, str]]:
+    rng = random.Random(seed)
+    users = [f"user{i}" for i in range(peers)]
+    out = []
+    for i in range(count):
+        sender, target = rng.sample(users, 2)
+        out.append((sender, frames.encode({
+            "type": CANDIDATE,
+            "user_id": sender,
+            "target_id": target,
+            "candidate": {
+                "candidate": f"candidate:{i} 1 udp 2122260223 192.168.1.{i % 250} {50000 + i % 10000} typ host",
+                "sdpMid": "0",
+                "sdpMLineIndex": 0,
+                "usernameFragment": "Zx3q",
+            },
+        })))
+    return out
+
+
+async def _run_path(name: str, args, workload: list[tuple[str, str]]) -> dict:
+    manager = DBConnectionManager(queue_size=len(workload) + 1, broker=InProcessBroker(InProcessHub()))
+    sockets = {}
+    for i in range(args.peers):
+        user_id = f"user{i}"
+        sockets[user_id] = FakeSocket()
+        manager._register(sockets[user_id], ROOM, user_id, binary=args.protocol == frames.MSGPACK)
+
+    relay = SignalRelay(args.window if name == "batched" else 0, manager.relay)
+    dispatcher = Dispatcher()
+
+    @dispatcher.route(*SIGNAL_TYPES)
+    async def reencode(conn, message):
+        await manager.send_to(frames.encode(message.model_dump(exclude_unset=True)), conn.room_id,
+                              message.target_id, kind=message.type)
+
+    started = time.perf_counter()
+    for sender, frame in workload:
+        if name == "decoded":
+            await dispatcher.dispatch(Connection(None, ROOM, sender), frames.decode(frame))
+        else:
+            await relay.forward(ROOM, sender, frame)
+        # Как и в настоящем цикле приёма, между кадрами loop успевает отправлять
+        await asyncio.sleep(0)
+    while sum(s.candidates for s in sockets.values()) < len(workload):
+        await asyncio.sleep(0.001)
+    elapsed = time.perf_counter() - started
+
+    for queue in list(manager.outbound.values()):
+        queue.close()
+    return {
+        "candidates_per_s": round(len(workload) / elapsed),
+        "frames_sent": sum(s.frames for s in sockets.values()),
+        "elapsed_s": round(elapsed, 3),
+    }
+
+
+async def run(args) -> dict:
+    workload = _candidates(args.peers, args.candidates, args.seed)
+    results = {name: await _run_path(name, args, workload) for name in ("decoded", "relay", "batched")}
+    return {
+        "peers": args.peers,
+        "candidates": args.candidates,
+        "protocol": args.protocol,
+        "window_s": args.window,
+        "paths": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--peers", type=int, default=8)
+    parser.add_argument("--candidates", type=int, default=50000)
+    parser.add_argument("--window", type=float, default=0.02)
+    parser.add_argument("--protocol", choices=frames.PROTOCOLS, default=frames.JSON,
+                        help="wire protocol of the receiving sockets")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    print(json.dumps(asyncio.run(run(args))))
+
+
+if __name__ == "__main__":
+    main()
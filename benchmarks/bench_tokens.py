@@ -0,0 +1,110 @@
+"""Benchmark LiveKit token issuance for a thundering-herd room start.
+
+``--viewers`` participants of one room ask for a token at the same moment.
+Reports tokens per second of the previous per-call implementation (JSON
+header and payload rebuilt and the HMAC keyed for every token), of
+:class:`TokenService` signing fresh tokens, of the same herd reconnecting
+while its tokens are cached, and over HTTP: one ``/livekit/token`` request
+per viewer vs a single ``/livekit/tokens`` batch request.
+
+    python -m benchmarks.bench_tokens
+    python -m benchmarks.bench_tokens --viewers 20000 --no-http
+"""
+import argparse
+import base64
+import hashlib
+import hmac
+import json
+import logging
+import os
+import sys
+import time
+from pathlib import Path
+
+os.environ.setdefault("LIVEKIT_API_KEY", "bench_key")
+os.environ.setdefault("LIVEKIT_API_SECRET", "bench_secret")
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from fastapi.testclient import TestClient
+
+from backend.livekit.roles import ROLES
+from backend.livekit.token_service import TokenService
+
+
+def legacy_token(user_id: str, room_id: str, role: str, api_key: str, api_secret: str) -> str:
+    """Token service before caching: everything rebuilt for each call."""
+    def b64(data: bytes) -> str:
+        return base64.urlsafe_b64encode(data).decode().rstrip("=")
+
+    grants = ROLES.get(role)
+    if grants is None:
+        raise ValueError("Unknown role")
+    iat = int(time.time())
+    payload = {"iss": api_key, "sub": user_id, "iat": iat, "exp": iat + 3600, "video": {**grants, "room": room_id}}
+    segments = [
+        b64(json.dumps({"alg": "HS256", "typ": "JWT"}, separators=(",", ":")).encode()),
+        b64(json.dumps(payload, separators=(",", ":")).encode()),
+    ]
+    signature = hmac.new(api_secret.encode(), ".".join(segments).encode(), hashlib.sha256).digest()
+    return ".".join(segments + [b64(signature)])
+
+
+def _rate(count: int, started: float) -> float:
+    return round(count / (time.perf_counter() - started), 1)
+
+
+def run(args) -> dict:
+    key, secret = os.environ["LIVEKIT_API_KEY"], os.environ["LIVEKIT_API_SECRET"]
+    room = "bench_herd"
+    viewers = [f"viewer-{i}" for i in range(args.viewers)]
+    result = {"viewers": args.viewers}
+
+    started = time.perf_counter()
+    for user_id in viewers:
+        legacy_token(user_id, room, "subscriber", key, secret)
+    result["legacy_tokens_per_s"] = _rate(args.viewers, started)
+
+    service = TokenService(key, secret)
+    started = time.perf_counter()
+    for user_id in viewers:
+        service.issue(user_id, room, "subscriber")
+    result["signed_tokens_per_s"] = _rate(args.viewers, started)
+
+    # Переподключение той же толпы: токены ещё далеки от истечения
+    started = time.perf_counter()
+    for user_id in viewers:
+        service.issue(user_id, room, "subscriber")
+    result["cached_tokens_per_s"] = _rate(args.viewers, started)
+
+    if not args.no_http:
+        from backend.livekit import token_service
+        from backend.main import app
+
+        # Иначе httpx пишет в лог строку на каждый из запросов
+        logging.getLogger("httpx").setLevel(logging.WARNING)
+        with TestClient(app) as client:
+            token_service.token_service = TokenService(key, secret)
+            started = time.perf_counter()
+            for user_id in viewers:
+                client.post("/livekit/token", json={"user_id": user_id, "room_id": room, "role": "subscriber"})
+            result["http_single_tokens_per_s"] = _rate(args.viewers, started)
+
+            body = {"room_id": f"{room}_batch", "role": "subscriber",
+                    "participants": [{"user_id": user_id} for user_id in viewers]}
+            started = time.perf_counter()
+            resp = client.post("/livekit/tokens", json=body)
+            assert len(resp.json()["tokens"]) == args.viewers
+            result["http_batch_tokens_per_s"] = _rate(args.viewers, started)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--viewers", type=int, default=5000)
+    parser.add_argument("--no-http", action="store_true", help="skip the HTTP round trips")
+    args = parser.parse_args()
+
+    print(json.dumps(run(args)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""Benchmark frame size and codec time of the JSON and binary protocols.
+
+Encodes and decodes a representative frame of every message type in
+``backend.ws.schema`` ``--rounds`` times with the JSON codec, plain
+MessagePack maps and the tagged MessagePack form the binary protocol uses,
+and reports bytes per frame and microseconds per encode/decode.
+
+    python -m benchmarks.bench_wire
+    python -m benchmarks.bench_wire --rounds 50000
+"""
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+import msgpack
+
+from backend.ws import frames, schema
+
+PLAYBACK = {"state": "playing", "position": 1312.504, "rate": 1.0, "server_time": 1767225600.123}
+USER = {"id": "8f14e45f-ceea-467f-a0e6-1b9b1f1a2c3d", "name": "Alice", "role": "guest",
+        "permissions": {"control_video": False, "kick": False, "change_video": False}}
+CHAT = {"type": "chat", "user_id": USER["id"], "username": "Alice",
+        "message": "did you see that?", "timestamp": "2026-01-01T20:00:00.123456"}
+
+SAMPLES = {
+    "joined": {"type": "joined", "user_id": USER["id"], "playback": PLAYBACK,
+               "resume_token": "Qm1xV3h0c2Z6a2JvY2E", "seq": 1204},
+    "users_update": {"type": "users_update", "version": 42, "users": [USER] * 10},
+    "user_joined": {"type": "user_joined", "version": 42, "user": USER},
+    "user_left": {"type": "user_left", "version": 42, "user_id": USER["id"]},
+    "user_updated": {"type": "user_updated", "version": 42, "user": USER},
+    "history": {"type": "history", "messages": [CHAT] * 50, "next_cursor": "MjAyNi0wMS0wMVQyMDowMDowMHxtMQ=="},
+    "chat": CHAT,
+    "play": {"type": "play", "user_id": USER["id"], "timestamp": 1312.5, "playback": PLAYBACK},
+    "pause": {"type": "pause", "user_id": USER["id"], "timestamp": 1312.5, "playback": PLAYBACK},
+    "seek": {"type": "seek", "user_id": USER["id"], "timestamp": 1312.5, "playback": PLAYBACK},
+    "sync": {"type": "sync", "client_time": 51234.7, "playback": PLAYBACK,
+             "qos": {"tier": "fair", "interval_ms": 5000, "seek_tolerance": 2.0}},
+    "change_video": {"type": "change_video", "user_id": USER["id"], "video_url": "https://example.com/movie.mp4"},
+    "video_changed": {"type": "video_changed", "video_url": "https://example.com/movie.mp4"},
+    "voice-offer": {"type": "voice-offer", "user_id": USER["id"], "target_id": USER["id"], "sdp": "v=0 " * 200},
+    "voice-answer": {"type": "voice-answer", "user_id": USER["id"], "target_id": USER["id"], "sdp": "v=0 " * 200},
+    "voice-candidate": {"type": "voice-candidate", "user_id": USER["id"], "target_id": USER["id"],
+                        "candidate": "candidate:1 1 UDP 2122252543 192.168.1.2 50000 typ host"},
+    "set_permissions": {"type": "set_permissions", "user_id": USER["id"], "target_id": USER["id"],
+                        "permissions": {"kick": True}},
+    "kick": {"type": "kick", "user_id": USER["id"], "target_id": USER["id"]},
+    "kicked": {"type": "kicked"},
+    "error": {"type": "error", "message": "Rate limited"},
+    "get_users": {"type": "get_users"},
+    "resumed": {"type": "resumed", "user_id": USER["id"], "playback": PLAYBACK, "seq": 1204, "replayed": True},
+}
+SAMPLES["voice-candidates"] = {"type": "voice-candidates", "frames": [SAMPLES["voice-candidate"]] * 4}
+
+CODECS = {
+    "json": (frames.encode, frames.decode),
+    "msgpack_map": (msgpack.packb, msgpack.unpackb),
+    "msgpack_tagged": (frames.encode_binary, frames.decode_binary),
+}
+
+
+def _time_us(func, arg, rounds: int) -> float:
+    started = time.perf_counter()
+    for _ in range(rounds):
+        func(arg)
+    return round((time.perf_counter() - started) / rounds * 1e6, 2)
+
+
+def run(args) -> dict:
+    assert set(SAMPLES) == set(schema.BY_TYPE), "every schema type needs a sample"
+    results = {}
+    for name, frame in SAMPLES.items():
+        row = {}
+        for codec, (encode, decode) in CODECS.items():
+            data = encode(frame)
+            row[f"{codec}_bytes"] = len(data.encode() if isinstance(data, str) else data)
+            row[f"{codec}_encode_us"] = _time_us(encode, frame, args.rounds)
+            row[f"{codec}_decode_us"] = _time_us(decode, data, args.rounds)
+        results[name] = row
+    return {"encoder": frames.ENCODER, "rounds": args.rounds, "types": results}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=10000)
+    args = parser.parse_args()
+
+    print(json.dumps(run(args)))
+
+
+if __name__ == "__main__":
+    main()
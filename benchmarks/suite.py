@@ -0,0 +1,134 @@
+"""Run the benchmark suite and record the results against the current commit.
+
+Each benchmark runs in its own process with sizes small enough for the whole
+suite to take a few minutes (``--full`` uses the benchmarks' own defaults).
+Every result line is appended to ``--output`` together with the benchmark
+name, its arguments, the commit and whether the tree had local changes, so
+runs on different commits can be compared with ``--compare``.
+
+    python -m benchmarks.suite
+    python -m benchmarks.suite --only bench_load bench_frames
+    python -m benchmarks.suite --compare main HEAD
+"""
+import argparse
+import json
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+DEFAULT_OUTPUT = ROOT / "bench_results.jsonl"
+
+# Бенчмарк и аргументы быстрого прогона
+SUITE = {
+    "bench_broadcast": ["--rooms", "200"],
+    "bench_room_state": [],
+    "bench_db_indexes": ["--messages", "100000", "--participants", "5000", "--rooms", "200"],
+    "bench_frames": [],
+    "bench_roster": [],
+    "bench_wire": ["--rounds", "2000"],
+    "bench_compression": [],
+    "bench_dispatch": ["--rounds", "5000"],
+    "bench_resume": [],
+    "bench_load": ["--rooms", "10", "--clients", "10", "--duration", "10"],
+    "bench_tokens": [],
+    "bench_signal": ["--candidates", "20000"],
+    "bench_shards": ["--rooms", "10", "--duration", "5"],
+}
+
+
+def _git(*args: str) -> str:
+    try:
+        return subprocess.run(["git", *args], cwd=ROOT, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def _resolve(ref: str) -> str:
+    return _git("rev-parse", "--short", ref) or ref
+
+
+def run_suite(names: list[str], full: bool, output: Path) -> int:
+    commit = _resolve("HEAD")
+    dirty = bool(_git("status", "--porcelain", "--untracked-files=no"))
+    failed = 0
+    for name in names:
+        args = [] if full else SUITE[name]
+        started = time.perf_counter()
+        proc = subprocess.run([sys.executable, "-m", f"benchmarks.{name}", *args],
+                              cwd=ROOT, capture_output=True, text=True)
+        lines = proc.stdout.strip().splitlines()
+        if proc.returncode != 0 or not lines:
+            failed += 1
+            print(f"{name}: failed with {proc.returncode}\n{proc.stderr[-2000:]}", file=sys.stderr)
+            continue
+        record = {
+            "bench": name,
+            "args": args,
+            "commit": commit,
+            "dirty": dirty,
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "wall_s": round(time.perf_counter() - started, 1),
+            "result": json.loads(lines[-1]),
+        }
+        with output.open("a") as f:
+            f.write(json.dumps(record) + "\n")
+        print(json.dumps(record))
+    return failed
+
+
+def _flatten(value, prefix: str = "") -> dict[str, float]:
+    """Numeric leaves of a result as ``{"a.b": 1.0}``."""
+    if isinstance(value, dict):
+        flat = {}
+        for key, item in value.items():
+            flat.update(_flatten(item, f"{prefix}{key}."))
+        return flat
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return {prefix[:-1]: value}
+    return {}
+
+
+def _latest(output: Path, commit: str) -> dict[str, dict]:
+    """Last result of every benchmark (and its arguments) recorded for ``commit``."""
+    latest = {}
+    with output.open() as f:
+        for line in f:
+            record = json.loads(line)
+            if record["commit"] == commit:
+                latest[(record["bench"], tuple(record["args"]))] = record["result"]
+    return latest
+
+
+def compare(output: Path, base: str, head: str):
+    base, head = _resolve(base), _resolve(head)
+    old, new = _latest(output, base), _latest(output, head)
+    for key in sorted(old.keys() & new.keys()):
+        before, after = _flatten(old[key]), _flatten(new[key])
+        print(f"{key[0]} {' '.join(key[1])}".rstrip())
+        for metric in sorted(before.keys() & after.keys()):
+            a, b = before[metric], after[metric]
+            change = f"{(b - a) / a * 100:+.1f}%" if a else ""
+            print(f"  {metric:<48} {a:>12g} -> {b:<12g} {change}")
+    for key in sorted(old.keys() ^ new.keys()):
+        print(f"{key[0]}: only recorded for {base if key in old else head}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--only", nargs="+", choices=sorted(SUITE), help="run only these benchmarks")
+    parser.add_argument("--full", action="store_true", help="use each benchmark's default sizes")
+    parser.add_argument("--output", type=Path, default=DEFAULT_OUTPUT, help="JSONL file to append results to")
+    parser.add_argument("--compare", nargs=2, metavar=("BASE", "HEAD"),
+                        help="compare the recorded results of two commits instead of running")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(args.output, *args.compare)
+        return
+    sys.exit(1 if run_suite(args.only or list(SUITE), args.full, args.output) else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -12,18 +12,21 @@ import {
   Avatar,
   Divider,
   Tooltip,
+  Button,
 } from "@mui/material";
 import SendIcon from "@mui/icons-material/Send";
 import ForumIcon from "@mui/icons-material/Forum";
 
-export default function ChatBox({ messages, input, setInput, onSend }) {
+export default function ChatBox({ messages, hasMore, loadingMore, onLoadMore, input, setInput, onSend }) {
   const endRef = useRef(null);
+  const lastMessage = messages[messages.length - 1];
 
+  // Прокручиваем вниз только при новом сообщении, а не при подгрузке старых
   useEffect(() => {
     if (endRef.current) {
       endRef.current.scrollIntoView({ behavior: "smooth" });
     }
-  }, [messages]);
+  }, [lastMessage]);
 
   const handleKeyPress = (e) => {
     if (e.key === "Enter" && !e.shiftKey) {
@@ -44,6 +47,11 @@ export default function ChatBox({ messages, input, setInput, onSend }) {
       <Divider sx={{ borderColor: "#333", mb: 2 }} />
 
       <List sx={{ flexGrow: 1, overflowY: "auto", pr: 1 }}>
+        {hasMore && (
+          <Button size="small" fullWidth onClick={onLoadMore} disabled={loadingMore} sx={{ mb: 1 }}>
+            {loadingMore ? "Загрузка..." : "Показать более ранние сообщения"}
+          </Button>
+        )}
         {messages.map((msg, idx) => (
           <ListItem key={idx} alignItems="flex-start" sx={{ px: 0 }}>
             <Stack direction="row" spacing={2} alignItems="flex-start">
@@ -34,6 +34,10 @@ import ChatBox from "./ChatBox";
 import ParticipantsList from "./ParticipantsList";
 import { WS_BASE_URL, API_BASE_URL, USE_LIVEKIT } from "../config";
 import voiceService from "../services/voiceService";
+import { correctDrift, DRIFT_SEEK_S, SYNC_INTERVAL_MS } from "../services/playbackSync";
+import { applyRosterEvent, ROSTER_EVENTS } from "../services/roster";
+
+const RECONNECT_DELAY_MS = 1000;
 
 function RemoteAudio({ stream }) {
   const audioRef = useRef(null);
@@ -64,12 +68,16 @@ export default function VideoPlayer({ roomId, username, userId }) {
   const [wsReady, setWsReady] = useState(false);
   const [wasKicked, setWasKicked] = useState(false);
   const [users, setUsers] = useState([]);
+  const usersRef = useRef([]);
+  const rosterVersionRef = useRef(null);
   const [myUserId, setMyUserId] = useState(userId || null);
   const myUserIdRef = useRef(userId || null);
   useEffect(() => {
     myUserIdRef.current = myUserId;
   }, [myUserId]);
   const [messages, setMessages] = useState([]);
+  const [historyCursor, setHistoryCursor] = useState(null);
+  const [loadingHistory, setLoadingHistory] = useState(false);
   const [chatInput, setChatInput] = useState("");
   const [videoUrl, setVideoUrl] = useState("/sample.mp4");
 
@@ -137,32 +145,111 @@ export default function VideoPlayer({ roomId, username, userId }) {
   };
 
   useEffect(() => {
-    const ws = new WebSocket(
-      `${WS_BASE_URL}/ws/${roomId}?username=${encodeURIComponent(username)}&user_id=${userId}`
-    );
-    wsRef.current = ws;
+    let ws;
+    let disposed = false;
+    let reconnectTimer = null;
+    // Токен и номер последнего кадра комнаты: по ним после обрыва сервер досылает пропущенное
+    const session = { token: null, lastSeq: 0 };
+
+    const connect = () => {
+      const params = new URLSearchParams({ username, user_id: userId });
+      if (session.token) {
+        params.set("resume", session.token);
+        params.set("last_seq", session.lastSeq);
+      }
+      ws = new WebSocket(`${WS_BASE_URL}/ws/${roomId}?${params}`);
+      wsRef.current = ws;
+      ws.onopen = () => setWsReady(true);
+      ws.onclose = handleClose;
+      ws.onmessage = handleMessage;
+    };
 
-    ws.onopen = () => setWsReady(true);
+    // Периодическая сверка с серверными часами вместо полных seek'ов; период и допуск
+    // рассинхрона сервер подбирает по качеству связи в комнате и присылает в ответе на sync
+    const qos = { intervalMs: SYNC_INTERVAL_MS, seekTolerance: DRIFT_SEEK_S, rttMs: null };
+    let syncTimer = null;
+    const scheduleSync = () => {
+      syncTimer = setTimeout(() => {
+        if (ws.readyState === WebSocket.OPEN) {
+          const message = { type: "sync", client_time: performance.now() };
+          if (qos.rttMs !== null) message.rtt_ms = qos.rttMs;
+          ws.send(JSON.stringify(message));
+        }
+        scheduleSync();
+      }, qos.intervalMs);
+    };
+    scheduleSync();
+
+    const applyPlayback = (playback, rttMs = 0) => {
+      isRemoteAction.current = true;
+      correctDrift(videoRef.current, playback, rttMs, qos.seekTolerance);
+      setTimeout(() => {
+        isRemoteAction.current = false;
+      }, 100);
+    };
 
-    ws.onclose = () => {
-      if (!wasKickedRef.current) {
-        console.warn("WebSocket closed without kicked message");
+    const handleClose = () => {
+      setWsReady(false);
+      if (wasKickedRef.current) return;
+      console.warn("WebSocket closed without kicked message");
+      if (!disposed) {
+        reconnectTimer = setTimeout(connect, RECONNECT_DELAY_MS);
       }
     };
 
-    ws.onmessage = async (event) => {
+    const handleMessage = async (event) => {
       const data = JSON.parse(event.data);
+      if (typeof data.seq === "number") {
+        session.lastSeq = data.seq;
+      }
 
       if (data.type === "joined") {
+        session.token = data.resume_token;
         setMyUserId(data.user_id);
+        applyPlayback(data.playback);
+        return;
+      }
+
+      if (data.type === "resumed") {
+        // Дальше идут пропущенные кадры, а если их уже нет — снимок состава и история
+        setMyUserId(data.user_id);
+        applyPlayback(data.playback);
+        return;
+      }
+
+      if (data.type === "sync") {
+        qos.rttMs = Math.round(performance.now() - data.client_time);
+        if (data.qos) {
+          qos.intervalMs = data.qos.interval_ms;
+          qos.seekTolerance = data.qos.seek_tolerance;
+        }
+        applyPlayback(data.playback, qos.rttMs);
         return;
       }
 
       if (data.type === "users_update") {
+        rosterVersionRef.current = data.version ?? null;
+        usersRef.current = data.users;
         setUsers(data.users);
         return;
       }
 
+      if (ROSTER_EVENTS.includes(data.type)) {
+        // Ждём запрошенный снимок — он уже будет включать эту дельту
+        if (rosterVersionRef.current === null) return;
+        const next = applyRosterEvent(usersRef.current, rosterVersionRef.current, data);
+        if (next === null) {
+          // Пропустили дельту — просим полный снимок
+          rosterVersionRef.current = null;
+          ws.send(JSON.stringify({ type: "get_users" }));
+          return;
+        }
+        rosterVersionRef.current = data.version;
+        usersRef.current = next;
+        setUsers(next);
+        return;
+      }
+
       if (data.type === "video_changed") {
         setVideoUrl(data.video_url);
         return;
@@ -173,11 +260,19 @@ export default function VideoPlayer({ roomId, username, userId }) {
         setWasKicked(true);
         wasKickedRef.current = true;
         wsRef.current?.close();
+        usersRef.current = [];
+        rosterVersionRef.current = null;
         setUsers([]);
         setMyUserId(null);
         return;
       }
 
+      if (data.type === "history") {
+        setMessages(data.messages);
+        setHistoryCursor(data.next_cursor);
+        return;
+      }
+
       if (data.type === "chat") {
         setMessages((prev) => [...prev, data]);
         return;
@@ -203,14 +298,23 @@ export default function VideoPlayer({ roomId, username, userId }) {
         default:
           break;
       }
+      if (data.playback) {
+        videoRef.current.playbackRate = data.playback.rate;
+      }
 
       setTimeout(() => {
         isRemoteAction.current = false;
       }, 100);
     };
 
+    connect();
+
     return () => {
-      ws.close();
+      disposed = true;
+      clearTimeout(reconnectTimer);
+      clearTimeout(syncTimer);
+      // 1000 — уходим насовсем, сервер не держит место под возобновление
+      ws.close(1000);
       voiceService.disconnect();
       setRemoteAudios([]);
       stopMicLevelMonitoring();
@@ -242,6 +346,23 @@ export default function VideoPlayer({ roomId, username, userId }) {
       wsRef.current.send(JSON.stringify(payload));
     };
 
+  const loadOlderMessages = async () => {
+    if (!historyCursor || loadingHistory) return;
+    setLoadingHistory(true);
+    try {
+      const res = await fetch(
+        `${API_BASE_URL}/api/rooms/${roomId}/messages?before=${encodeURIComponent(historyCursor)}`
+      );
+      const data = await res.json();
+      setMessages((prev) => [...data.messages, ...prev]);
+      setHistoryCursor(data.next_cursor);
+    } catch (err) {
+      console.error("Failed to load chat history", err);
+    } finally {
+      setLoadingHistory(false);
+    }
+  };
+
   const startMicLevelMonitoring = (stream) => {
     try {
       const AudioCtx = window.AudioContext || window.webkitAudioContext;
@@ -530,6 +651,9 @@ export default function VideoPlayer({ roomId, username, userId }) {
             {activeTab === "chat" && (
               <ChatBox
                 messages={messages}
+                hasMore={!!historyCursor}
+                loadingMore={loadingHistory}
+                onLoadMore={loadOlderMessages}
                 input={chatInput}
                 setInput={setChatInput}
                 onSend={handleSendChat}
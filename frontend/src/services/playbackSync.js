@@ -0,0 +1,44 @@
+// Подстройка локального плеера под серверные часы комнаты.
+// Небольшой дрейф убирается ускорением/замедлением воспроизведения,
+// полный seek делается только при большом расхождении.
+
+export const SYNC_INTERVAL_MS = 5000;
+const DRIFT_IGNORE_S = 0.15;
+export const DRIFT_SEEK_S = 2;
+const MAX_RATE_NUDGE = 0.1;
+
+// Позиция, на которой должен быть плеер сейчас, с учётом половины RTT
+export function expectedPosition(playback, rttMs = 0) {
+  if (playback.state !== "playing") return playback.position;
+  return playback.position + (rttMs / 2000) * playback.rate;
+}
+
+export function correctDrift(video, playback, rttMs = 0, seekTolerance = DRIFT_SEEK_S) {
+  if (!video || !playback) return;
+
+  const target = expectedPosition(playback, rttMs);
+  const drift = target - video.currentTime;
+
+  if (playback.state === "playing" && video.paused) {
+    video.currentTime = target;
+    video.play().catch(() => {});
+    return;
+  }
+  if (playback.state !== "playing") {
+    if (!video.paused) video.pause();
+    if (Math.abs(drift) > DRIFT_IGNORE_S) video.currentTime = target;
+    video.playbackRate = playback.rate;
+    return;
+  }
+
+  if (Math.abs(drift) > seekTolerance) {
+    video.currentTime = target;
+    video.playbackRate = playback.rate;
+  } else if (Math.abs(drift) > DRIFT_IGNORE_S) {
+    // Догоняем (или ждём) за несколько секунд, не вызывая перебуферизацию
+    const nudge = Math.max(-MAX_RATE_NUDGE, Math.min(MAX_RATE_NUDGE, drift / 4));
+    video.playbackRate = playback.rate * (1 + nudge);
+  } else {
+    video.playbackRate = playback.rate;
+  }
+}
@@ -0,0 +1,19 @@
+// Состав комнаты приходит полным снимком (users_update) при входе,
+// а дальше — дельтами user_joined / user_left / user_updated с номером версии.
+// Если версия пришла не подряд, состав пересобирается по новому снимку.
+
+export const ROSTER_EVENTS = ["user_joined", "user_left", "user_updated"];
+
+// Возвращает новый список участников или null, если версия пришла не подряд
+export function applyRosterEvent(users, version, data) {
+  if (data.version !== version + 1) return null;
+
+  if (data.type === "user_left") {
+    return users.filter((u) => u.id !== data.user_id);
+  }
+  const index = users.findIndex((u) => u.id === data.user.id);
+  if (index === -1) return [...users, data.user];
+  const next = [...users];
+  next[index] = data.user;
+  return next;
+}
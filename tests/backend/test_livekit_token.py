@@ -72,3 +72,55 @@ def test_generate_token_unknown_role(monkeypatch):
 
     resp = client.post('/livekit/token', json={'user_id': 'u1', 'room_id': 'room1', 'role': 'unknown'})
     assert resp.status_code == 500
+
+
+def test_batch_tokens_for_room(monkeypatch):
+    monkeypatch.setenv('LIVEKIT_API_KEY', 'test_key')
+    monkeypatch.setenv('LIVEKIT_API_SECRET', 'test_secret')
+    monkeypatch.setenv('LIVEKIT_URL', 'wss://test.url')
+
+    _reload_backend()
+    from backend.main import app
+    client = TestClient(app)
+
+    resp = client.post('/livekit/tokens', json={
+        'room_id': 'room1',
+        'role': 'subscriber',
+        'participants': [{'user_id': 'host', 'role': 'moderator'}, {'user_id': 'v1'}, {'user_id': 'v2'}],
+    })
+    assert resp.status_code == 200
+    data = resp.json()
+    assert data['url'] == 'wss://test.url'
+    assert set(data['tokens']) == {'host', 'v1', 'v2'}
+    assert _decode_payload(data['tokens']['host'])['video']['room_admin'] is True
+    viewer = _decode_payload(data['tokens']['v1'])
+    assert viewer['sub'] == 'v1' and viewer['video']['can_publish'] is False
+
+    # Тот же участник получает тот же токен и через одиночный запрос
+    single = client.post('/livekit/token', json={'user_id': 'v1', 'room_id': 'room1', 'role': 'subscriber'})
+    assert single.json()['token'] == data['tokens']['v1']
+
+    resp = client.post('/livekit/tokens', json={'room_id': 'room1', 'participants': [{'user_id': 'x', 'role': 'nope'}]})
+    assert resp.status_code == 400
+
+
+def test_token_matches_reference_encoding_and_is_reused_until_near_expiry():
+    import hashlib
+    import hmac
+
+    _reload_backend()
+    from backend.livekit.roles import ROLES
+    from backend.livekit.token_service import TokenService, _b64encode
+
+    service = TokenService('key', 'secret', ttl=3600, refresh_margin=300)
+    token = service.issue('ю"ser', 'room1', 'moderator', now=1_000_000)
+
+    payload = {'iss': 'key', 'sub': 'ю"ser', 'iat': 1_000_000, 'exp': 1_003_600,
+               'video': {**ROLES['moderator'], 'room': 'room1'}}
+    segments = [_b64encode(json.dumps({'alg': 'HS256', 'typ': 'JWT'}, separators=(',', ':')).encode()),
+                _b64encode(json.dumps(payload, separators=(',', ':')).encode())]
+    signature = hmac.new(b'secret', '.'.join(segments).encode(), hashlib.sha256).digest()
+    assert token == '.'.join(segments + [_b64encode(signature)])
+
+    assert service.issue('ю"ser', 'room1', 'moderator', now=1_003_000) == token
+    assert service.issue('ю"ser', 'room1', 'moderator', now=1_003_400) != token
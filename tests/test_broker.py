@@ -0,0 +1,146 @@
+import asyncio
+import json
+import sys
+from datetime import datetime
+from pathlib import Path
+
+import pytest
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from backend.ws.broker import InProcessBroker, InProcessHub, RedisBroker
+from backend.ws.db_manager import DBConnectionManager
+from backend.ws.room_state import RoomState, ParticipantState, ADMIN_PERMISSIONS, GUEST_PERMISSIONS
+
+
+class RecordingWebSocket:
+    def __init__(self):
+        self.sent = []
+
+    async def accept(self, subprotocol: str | None = None):
+        pass
+
+    async def send_text(self, message: str):
+        self.sent.append(message)
+
+    async def close(self, code: int = 1000):
+        pass
+
+
+def _nodes(count: int = 2) -> list[DBConnectionManager]:
+    hub = InProcessHub()
+    return [DBConnectionManager(broker=InProcessBroker(hub)) for _ in range(count)]
+
+
+def test_broadcast_reaches_members_on_other_nodes_once():
+    async def run():
+        node_a, node_b = _nodes()
+        alice, bob = RecordingWebSocket(), RecordingWebSocket()
+        await node_a.connect(alice, "room", "alice")
+        await node_b.connect(bob, "room", "bob")
+
+        await node_a.broadcast("hello", "room", kind="chat")
+        await asyncio.sleep(0.01)
+        return alice.sent, bob.sent
+
+    assert asyncio.run(run()) == (["hello"], ["hello"])
+
+
+def test_send_to_is_routed_to_the_node_hosting_the_target():
+    async def run():
+        node_a, node_b, node_c = _nodes(3)
+        alice, bob, carol = RecordingWebSocket(), RecordingWebSocket(), RecordingWebSocket()
+        await node_a.connect(alice, "room", "alice")
+        await node_b.connect(bob, "room", "bob")
+        await node_c.connect(carol, "room", "carol")
+
+        await node_a.send_to("offer", "room", "bob", kind="voice-offer")
+        await asyncio.sleep(0.01)
+        return alice.sent, bob.sent, carol.sent
+
+    assert asyncio.run(run()) == ([], ["offer"], [])
+
+
+def test_node_unsubscribes_when_its_last_member_leaves():
+    async def run():
+        hub = InProcessHub()
+        node_a, node_b = (DBConnectionManager(broker=InProcessBroker(hub)) for _ in range(2))
+        alice, bob = RecordingWebSocket(), RecordingWebSocket()
+        await node_a.connect(alice, "room", "alice")
+        await node_b.connect(bob, "room", "bob")
+        node_b.disconnect(bob, "room", "bob")
+        await asyncio.sleep(0.01)
+        return hub.subscribers["room"] == {node_a.broker}
+
+    assert asyncio.run(run())
+
+
+def test_users_update_replicates_participants_to_other_nodes():
+    joined = datetime(2025, 1, 1)
+
+    async def run():
+        node_a, node_b = _nodes()
+        alice, bob = RecordingWebSocket(), RecordingWebSocket()
+        await node_a.connect(alice, "room", "alice")
+        await node_b.connect(bob, "room", "bob")
+        node_a.rooms["room"] = RoomState("room", participants={
+            "alice": ParticipantState("alice", "Alice", "admin", dict(ADMIN_PERMISSIONS), True, joined),
+            "bob": ParticipantState("bob", "Bob", "guest", {**GUEST_PERMISSIONS, "kick": True}, True, joined),
+        })
+        node_b.rooms["room"] = RoomState("room", participants={
+            "bob": ParticipantState("bob", "Bob", "guest", dict(GUEST_PERMISSIONS), True, joined),
+        })
+
+        await node_a.broadcast_users("room")
+        await asyncio.sleep(0.01)
+        return node_b, bob.sent
+
+    node_b, sent = asyncio.run(run())
+    assert json.loads(sent[-1])["type"] == "users_update"
+    assert node_b.get_user("room", "alice").name == "Alice"
+    assert node_b.get_participant("room", "bob").permissions["kick"] is True
+
+
+def test_redis_broker_relays_between_nodes():
+    fakeredis = pytest.importorskip("fakeredis")
+
+    async def run():
+        server = fakeredis.FakeServer()
+        node_a, node_b = (
+            DBConnectionManager(broker=RedisBroker(client=fakeredis.FakeAsyncRedis(server=server)))
+            for _ in range(2)
+        )
+        alice, bob = RecordingWebSocket(), RecordingWebSocket()
+        await node_a.connect(alice, "room", "alice")
+        await node_b.connect(bob, "room", "bob")
+        await asyncio.sleep(0.05)
+
+        await node_a.broadcast("hello", "room", kind="chat")
+        for _ in range(50):
+            if bob.sent:
+                break
+            await asyncio.sleep(0.01)
+        await node_a.broker.close()
+        await node_b.broker.close()
+        return alice.sent, bob.sent
+
+    assert asyncio.run(run()) == (["hello"], ["hello"])
+
+
+def test_playback_clock_is_replicated_to_other_nodes():
+    async def run():
+        node_a, node_b = _nodes()
+        alice, bob = RecordingWebSocket(), RecordingWebSocket()
+        await node_a.connect(alice, "room", "alice")
+        await node_b.connect(bob, "room", "bob")
+        node_a.rooms["room"] = RoomState("room")
+        node_b.rooms["room"] = RoomState("room")
+
+        node_a.rooms["room"].playback.apply("play", position=30.0)
+        await node_a.broadcast_playback("room", "play", "alice")
+        await asyncio.sleep(0.01)
+        return node_b.rooms["room"].playback, bob.sent
+
+    playback, sent = asyncio.run(run())
+    assert playback.state == "playing"
+    assert 30.0 <= playback.position_at() < 31.0
+    assert json.loads(sent[-1])["type"] == "play"
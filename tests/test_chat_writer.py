@@ -0,0 +1,115 @@
+import asyncio
+import sys
+from datetime import datetime
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from backend.services.chat import ChatWriter
+
+
+class RecordingSession:
+    """Stand-in for ``AsyncSession`` that records each committed batch."""
+
+    def __init__(self, commits: list, fail: bool = False):
+        self.commits = commits
+        self.fail = fail
+        self.rows = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def execute(self, statement, rows):
+        self.rows.extend(rows)
+
+    async def commit(self):
+        if self.fail:
+            raise RuntimeError("database is locked")
+        self.commits.append([row["text"] for row in self.rows])
+
+
+def _writer(commits: list, **kwargs) -> ChatWriter:
+    return ChatWriter(session_factory=lambda: RecordingSession(commits), **kwargs)
+
+
+def _put(writer: ChatWriter, *texts):
+    for text in texts:
+        writer.put("room", "user", "name", text, datetime.utcnow())
+
+
+def test_burst_is_committed_in_batches():
+    commits = []
+
+    async def run():
+        writer = _writer(commits, batch_size=3, flush_interval=10)
+        _put(writer, *[f"m{i}" for i in range(7)])
+        await asyncio.sleep(0.01)
+        flushed_by_size = list(commits)
+        await writer.stop()
+        return flushed_by_size
+
+    assert asyncio.run(run()) == [["m0", "m1", "m2"], ["m3", "m4", "m5"]]
+    assert commits[-1] == ["m6"]
+
+
+def test_partial_batch_is_committed_after_flush_interval():
+    commits = []
+
+    async def run():
+        writer = _writer(commits, batch_size=100, flush_interval=0.02)
+        _put(writer, "a", "b")
+        await asyncio.sleep(0.005)
+        assert commits == []
+        await asyncio.sleep(0.05)
+        assert commits == [["a", "b"]]
+        await writer.stop()
+
+    asyncio.run(run())
+
+
+def test_stop_flushes_pending_messages():
+    commits = []
+
+    async def run():
+        writer = _writer(commits, batch_size=2, flush_interval=10)
+        _put(writer, "a", "b", "c", "d", "e")
+        await writer.stop()
+        return writer.depth
+
+    assert asyncio.run(run()) == 0
+    assert [text for batch in commits for text in batch] == ["a", "b", "c", "d", "e"]
+
+
+def test_failed_commit_is_retried():
+    commits = []
+    sessions = iter([RecordingSession(commits, fail=True), RecordingSession(commits)])
+
+    async def run():
+        writer = ChatWriter(session_factory=lambda: next(sessions), batch_size=10, flush_interval=0.01,
+                            retry_delay=0.1)
+        _put(writer, "a", "b")
+        # Пока пачка ждёт повтора, история комнаты видит её как несохранённую
+        await asyncio.sleep(0.05)
+        unsaved = [row["text"] for row in writer.unsaved("room")]
+        await writer.stop()
+        return unsaved
+
+    assert asyncio.run(run()) == ["a", "b"]
+    assert commits == [["a", "b"]]
+
+
+def test_full_queue_rejects_and_failed_batch_does_not_stall_writer():
+    commits = []
+    sessions = iter([*(RecordingSession(commits, fail=True) for _ in range(3)), RecordingSession(commits)])
+
+    async def run():
+        writer = ChatWriter(session_factory=lambda: next(sessions), batch_size=1, flush_interval=10, maxsize=2,
+                            retries=2, retry_delay=0)
+        _put(writer, "lost", "kept")
+        assert not writer.put("room", "user", "name", "overflow", datetime.utcnow())
+        await writer.stop()
+
+    asyncio.run(run())
+    assert commits == [["kept"]]
@@ -0,0 +1,73 @@
+import asyncio
+import os
+import sys
+
+from uvicorn.config import Config
+from uvicorn.server import ServerState
+from websockets.extensions.permessage_deflate import PerMessageDeflate
+from websockets.frames import Frame, Opcode
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from backend.main import app
+from backend.ws import compression, frames
+from backend.ws.compression import (
+    CompressionPolicy, CompressingWebSocketProtocol, PolicyDeflateFactory, PolicyPerMessageDeflate, message_type,
+)
+
+POLICY = CompressionPolicy(min_size=256, always=frozenset({"history"}), never=frozenset({"play"}))
+CHAT = {"type": "chat", "user_id": "alice", "username": "Alice", "message": "ha " * 200, "timestamp": "2026-01-01"}
+
+
+def _text(event: dict) -> Frame:
+    return Frame(Opcode.TEXT, frames.encode(event).encode())
+
+
+def _extension() -> PolicyPerMessageDeflate:
+    _, extension = PolicyDeflateFactory(POLICY).process_request_params([], [])
+    return extension
+
+
+def test_message_type_is_read_from_frame_prefix():
+    assert message_type(frames.encode(CHAT).encode(), Opcode.TEXT) == "chat"
+    assert message_type(b'{"user_id":"a","type":"chat"}', Opcode.TEXT) is None
+    assert message_type(b"plain text", Opcode.TEXT) is None
+    if "msgpack" in frames.PROTOCOLS:
+        assert message_type(frames.encode_binary({"type": "history", "messages": []}), Opcode.BINARY) == "history"
+
+
+def test_policy_by_type_then_size():
+    assert POLICY.should_compress(b'{"type":"history"}', Opcode.TEXT)
+    assert not POLICY.should_compress(b'{"type":"play","pad":"' + b"x" * 1000 + b'"}', Opcode.TEXT)
+    assert POLICY.should_compress(frames.encode(CHAT).encode(), Opcode.TEXT)
+    assert not POLICY.should_compress(b'{"type":"chat","message":"hi"}', Opcode.TEXT)
+
+
+def test_skipped_messages_keep_the_deflate_stream_decodable():
+    server = _extension()
+    client = PerMessageDeflate(False, False, server.local_max_window_bits, server.remote_max_window_bits)
+    events = [CHAT, {"type": "play", "timestamp": 1.5}, CHAT, {"type": "chat", "message": "short"}, CHAT]
+
+    before = compression.compression_bytes.labels(stage="in")._value.get()
+    for event in events:
+        frame = _text(event)
+        encoded = server.encode(frame)
+        assert encoded.rsv1 == (event is CHAT)
+        if event is CHAT:
+            assert len(encoded.data) < len(frame.data)
+        assert client.decode(encoded).data == frame.data
+
+    assert compression.compression_bytes.labels(stage="in")._value.get() - before == 3 * len(_text(CHAT).data)
+
+
+def test_protocol_uses_policy_extension():
+    config = Config(app=app, ws=CompressingWebSocketProtocol)
+    config.load()
+    loop = asyncio.new_event_loop()
+    try:
+        protocol = CompressingWebSocketProtocol(config, ServerState(), app_state={}, _loop=loop)
+    finally:
+        loop.close()
+    [factory] = protocol.conn.available_extensions
+    assert isinstance(factory, PolicyDeflateFactory)
+    assert factory.server_max_window_bits == compression.WS_COMPRESSION_WINDOW_BITS
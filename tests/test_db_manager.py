@@ -42,3 +42,62 @@ def test_broadcast_removes_room_if_all_connections_fail():
     asyncio.run(manager.broadcast("hello", room_id))
 
     assert room_id not in manager.active_connections
+
+
+class SlowWebSocket(DummyWebSocket):
+    def __init__(self, delay: float):
+        super().__init__()
+        self.delay = delay
+        self.closed = False
+
+    async def send_text(self, message: str):
+        await asyncio.sleep(self.delay)
+        await super().send_text(message)
+
+    async def close(self, code: int = 1000):
+        self.closed = True
+
+
+def test_broadcast_drops_stalled_connection_without_blocking_room():
+    manager = DBConnectionManager(send_timeout=0.05)
+    room_id = "room"
+    fast_ws = DummyWebSocket()
+    slow_ws = SlowWebSocket(delay=1)
+
+    manager.active_connections[room_id] = {"fast": fast_ws, "slow": slow_ws}
+
+    async def run():
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        await manager.broadcast("hello", room_id)
+        elapsed = loop.time() - started
+        await asyncio.sleep(0)
+        return elapsed
+
+    elapsed = asyncio.run(run())
+
+    assert elapsed < 0.5
+    assert fast_ws.sent == ["hello"]
+    assert "slow" not in manager.active_connections[room_id]
+    assert slow_ws.closed
+
+
+def test_broadcast_in_other_room_is_not_blocked_by_slow_room():
+    manager = DBConnectionManager(send_timeout=0.5)
+    slow_ws = SlowWebSocket(delay=0.3)
+    fast_ws = DummyWebSocket()
+
+    manager.active_connections["slow_room"] = {"slow": slow_ws}
+    manager.active_connections["fast_room"] = {"fast": fast_ws}
+
+    async def run():
+        slow = asyncio.create_task(manager.broadcast("slow", "slow_room"))
+        await asyncio.sleep(0)
+        await manager.broadcast("fast", "fast_room")
+        delivered_before_slow = not slow.done()
+        await slow
+        return delivered_before_slow
+
+    assert asyncio.run(run())
+    assert fast_ws.sent == ["fast"]
+    assert slow_ws.sent == ["slow"]
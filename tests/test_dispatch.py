@@ -0,0 +1,90 @@
+import asyncio
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from backend import ws_endpoint
+from backend.ws import schema
+from backend.ws.dispatch import Connection, Dispatcher, handler_errors, handler_seconds, rejected_frames
+
+
+def _value(metric, **labels) -> float:
+    return metric.labels(**labels)._value.get()
+
+
+def _histogram_count(**labels) -> float:
+    return next((s.value for s in handler_seconds.collect()[0].samples
+                 if s.name.endswith("_count") and s.labels == labels), 0.0)
+
+
+def test_endpoint_handles_every_inbound_message_type():
+    assert set(ws_endpoint.dispatcher.handlers) == set(schema.INBOUND)
+
+
+def test_route_requires_a_schema():
+    with pytest.raises(ValueError):
+        Dispatcher().route("launch_missiles")
+
+
+def test_invalid_frames_never_reach_the_handler():
+    dispatcher = Dispatcher()
+    calls = []
+
+    @dispatcher.route("kick")
+    async def handle(conn, message):
+        calls.append(message)
+
+    conn = Connection(None, "room", "alice")
+    unknown = _value(rejected_frames, type="unknown", reason="unknown_type")
+    invalid = _value(rejected_frames, type="kick", reason="invalid")
+
+    async def run():
+        results = [
+            await dispatcher.dispatch(conn, {"type": "launch_missiles"}),
+            await dispatcher.dispatch(conn, ["kick"]),
+            await dispatcher.dispatch(conn, {"type": "kick", "target_id": ["bob"]}),
+            await dispatcher.dispatch(conn, {"type": "kick", "user_id": "alice", "target_id": "bob"}),
+        ]
+        return results
+
+    assert asyncio.run(run()) == [False, False, False, True]
+    assert calls == [schema.Kick(type="kick", user_id="alice", target_id="bob")]
+    assert _value(rejected_frames, type="unknown", reason="unknown_type") - unknown == 2
+    assert _value(rejected_frames, type="kick", reason="invalid") - invalid == 1
+
+
+def test_handler_failures_are_counted_and_timed():
+    dispatcher = Dispatcher()
+
+    @dispatcher.route("get_users")
+    async def handle(conn, message):
+        raise RuntimeError("boom")
+
+    errors = _value(handler_errors, type="get_users")
+    observed = _histogram_count(type="get_users")
+
+    assert asyncio.run(dispatcher.dispatch(Connection(None, "room", "alice"), {"type": "get_users"}))
+    assert _value(handler_errors, type="get_users") - errors == 1
+    assert _histogram_count(type="get_users") - observed == 1
+
+
+def test_legacy_payload_shapes_are_still_accepted():
+    # Прежние обработчики принимали числовые ID и флаги прав 0/1
+    kick = schema.validate({"type": "kick", "user_id": 1, "target_id": 2})
+    assert (kick.user_id, kick.target_id) == ("1", "2")
+
+    update = schema.validate({"type": "set_permissions", "user_id": "a", "target_id": 7,
+                              "permissions": {"kick": 1, "chat": 0, "seek": "true"}})
+    assert update.target_id == "7"
+    assert update.permissions == {"kick": True, "chat": False, "seek": True}
+
+    for frame in (
+        {"type": "kick", "target_id": True},
+        {"type": "set_permissions", "permissions": {"kick": 2}},
+        {"type": "seek", "timestamp": "42"},
+    ):
+        with pytest.raises(schema.SchemaError):
+            schema.validate(frame)
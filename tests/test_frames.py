@@ -0,0 +1,106 @@
+import os
+import sys
+
+import pytest
+from fastapi.testclient import TestClient
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from backend.main import app
+from backend.ws import frames, schema
+
+
+def test_encode_is_compact_and_round_trips():
+    event = {"type": "chat", "message": "привет", "users": [{"id": "a", "online": True}]}
+    text = frames.encode(event)
+
+    assert isinstance(text, str)
+    assert ", " not in text and "привет" in text
+    assert frames.decode(text) == event
+
+
+def test_decode_rejects_malformed_frames():
+    for raw in ("{", "not json", ""):
+        try:
+            frames.decode(raw)
+        except frames.DecodeError:
+            continue
+        raise AssertionError(f"{raw!r} was decoded")
+
+
+def test_malformed_frame_does_not_drop_connection():
+    room = "room_frames_malformed"
+    with TestClient(app) as client:
+        with client.websocket_connect(f"/ws/{room}?username=alice&user_id=alice") as ws:
+            ws.receive_json()  # joined
+            ws.receive_json()  # users snapshot
+            ws.receive_json()  # history
+
+            ws.send_text("{broken")
+            ws.send_text("[1, 2]")
+            ws.send_json({"type": "sync", "client_time": 1})
+
+            reply = ws.receive_json()
+            assert reply["type"] == "sync"
+            assert reply["client_time"] == 1
+
+
+def test_schema_pack_round_trips_with_extra_fields():
+    offer = {"type": "voice-offer", "user_id": "a", "target_id": "b", "sdp": "v=0"}
+    packed = schema.pack(offer)
+    assert packed == [schema.BY_TYPE["voice-offer"].tag, "a", "b", {"sdp": "v=0"}]
+    assert schema.unpack(packed) == offer
+
+    # Пустые хвостовые поля не передаются
+    assert schema.pack({"type": "chat", "user_id": "a", "message": "hi"}) == [7, "a", None, "hi"]
+
+
+def test_schema_rejects_invalid_client_frames():
+    for frame in (
+        {"type": "users_update", "users": []},
+        {"type": "play", "timestamp": "soon"},
+        {"type": "seek", "timestamp": True},
+        {"type": "seek", "timestamp": float("nan")},
+        {"type": "set_permissions", "target_id": "b"},
+        {"type": "nope"},
+        [1, 2],
+    ):
+        with pytest.raises(schema.SchemaError):
+            schema.validate(frame)
+    message = schema.validate({"type": "play", "timestamp": 1, "extra": "dropped"})
+    assert isinstance(message, schema.SyncEvent)
+    assert message.timestamp == 1.0 and not hasattr(message, "extra")
+
+
+def test_msgpack_clients_share_a_room_with_json_clients():
+    pytest.importorskip("msgpack")
+    room = "room_frames_msgpack"
+    with TestClient(app) as client:
+        with client.websocket_connect(f"/ws/{room}?username=bin&user_id=bin&protocol=msgpack") as bin_ws:
+            joined = frames.decode_binary(bin_ws.receive_bytes())
+            assert joined["type"] == "joined" and joined["user_id"] == "bin"
+            frames.decode_binary(bin_ws.receive_bytes())  # users snapshot
+            frames.decode_binary(bin_ws.receive_bytes())  # history
+
+            with client.websocket_connect(f"/ws/{room}?username=txt&user_id=txt") as text_ws:
+                for _ in range(3):
+                    text_ws.receive_json()
+                assert frames.decode_binary(bin_ws.receive_bytes())["type"] == "user_joined"
+
+                bin_ws.send_bytes(frames.encode_binary({"type": "chat", "user_id": "bin", "message": "hi"}))
+                assert text_ws.receive_json()["message"] == "hi"
+                chat = frames.decode_binary(bin_ws.receive_bytes())
+                assert chat["type"] == "chat" and chat["username"] == "bin"
+
+
+def test_msgpack_subprotocol_is_negotiated():
+    pytest.importorskip("msgpack")
+    with TestClient(app) as client:
+        with client.websocket_connect(
+            "/ws/room_frames_subprotocol?username=a&user_id=a", subprotocols=["cinemate.msgpack"]
+        ) as ws:
+            assert ws.accepted_subprotocol == "cinemate.msgpack"
+            assert frames.decode_binary(ws.receive_bytes())["type"] == "joined"
+
+    assert frames.negotiate("msgpack", ["other"]) == ("msgpack", None)
+    assert frames.negotiate("xml", []) == ("json", None)
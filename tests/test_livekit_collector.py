@@ -0,0 +1,165 @@
+import asyncio
+import hashlib
+import os
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+from prometheus_client import REGISTRY
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from backend.livekit.metrics_collector import LOSS, RTT, MetricsCollector, ScrapeParser, parse_sample
+
+PAGE = """\
+# HELP go_goroutines Number of goroutines
+go_goroutines 42
+# TYPE livekit_participant_rtt_seconds gauge
+livekit_participant_rtt_seconds{room="r1",participant="a"} 0.010
+livekit_participant_rtt_seconds{room="r1",participant="b"} 0.030
+livekit_participant_rtt_seconds{room="r2",participant="c"} 0.100
+livekit_track_packet_loss_percent{room="r1",participant="a",kind="audio"} 1.5
+livekit_track_packet_loss_percent{room="r1",participant="b",kind="audio"} 0.5
+livekit_forward_rtt_seconds_bucket{room="r3",le="0.1"} 4
+livekit_forward_rtt_seconds_sum{room="r3"} 0.2
+livekit_forward_rtt_seconds_count{room="r3"} 4
+"""
+
+
+class FakeLiveKit:
+    """Local stand-in for the LiveKit metrics endpoint, with ETag support."""
+
+    def __init__(self):
+        self.body = PAGE
+        self.status = 200
+        self.requests = []
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                fake.requests.append(dict(self.headers))
+                etag = '"' + hashlib.sha1(fake.body.encode()).hexdigest() + '"'
+                if fake.status != 200:
+                    self.send_response(fake.status)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                if self.headers.get("If-None-Match") == etag:
+                    self.send_response(304)
+                    self.end_headers()
+                    return
+                body = fake.body.encode()
+                self.send_response(200)
+                self.send_header("ETag", etag)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/metrics"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def _polls(collector: MetricsCollector, steps):
+    """Run ``collector.run_once`` after each step (a callable or ``None``); return the delays."""
+    async def run():
+        delays = []
+        async with httpx.AsyncClient() as client:
+            for step in steps:
+                if step is not None:
+                    step()
+                delays.append(await collector.run_once(client))
+        return delays
+
+    return asyncio.run(run())
+
+
+def test_parse_sample_handles_labels_and_junk():
+    assert parse_sample('livekit_x{room="a \\"b\\"",p="1"} 2.5 1700000000') == (
+        "livekit_x", (("p", "1"), ("room", 'a "b"')), 2.5
+    )
+    assert parse_sample("livekit_y 3") == ("livekit_y", (), 3.0)
+    assert parse_sample("# TYPE livekit_y gauge") is None
+    assert parse_sample("livekit_y{room=\"a\"}") is None
+    assert parse_sample("livekit_y NaNx") is None
+
+
+def test_parser_keeps_every_series_and_histogram_mean():
+    parser = ScrapeParser()
+    for line in PAGE.splitlines():
+        parser.feed(line)
+    series = parser.result()
+
+    # Серии с разными метками не затирают друг друга
+    assert len(series[RTT]) == 4
+    assert series[RTT][(("participant", "b"), ("room", "r1"))] == 30.0
+    assert series[RTT][(("room", "r3"),)] == 50.0
+    assert len(series[LOSS]) == 2
+
+
+def test_collector_aggregates_rooms_and_uses_conditional_requests():
+    fake = FakeLiveKit()
+    collector = MetricsCollector(url=fake.url, interval=1, max_interval=4, timeout=2)
+    try:
+        delays = _polls(collector, [None, None, None])
+    finally:
+        fake.close()
+
+    stats = collector.room_stats("r1")
+    assert stats[RTT].count == 2
+    assert stats[RTT].min == 10.0 and stats[RTT].max == 30.0 and stats[RTT].avg == 20.0
+    assert stats[LOSS].p95 == 1.5
+    assert collector.room_stats("r2")[RTT].avg == 100.0
+    assert collector.room_stats("missing") == {}
+    assert REGISTRY.get_sample_value("livekit_room_latency_ms", {"room": "r1", "stat": "max"}) == 30.0
+
+    # Второй и третий запросы условные: 304, данные сохраняются, интервал растёт
+    assert "If-None-Match" not in fake.requests[0]
+    assert fake.requests[1]["If-None-Match"] == fake.requests[2]["If-None-Match"]
+    assert delays == [1, 1.5, 2.25]
+    assert collector.healthy
+
+
+def test_collector_backs_off_on_failure_and_recovers():
+    fake = FakeLiveKit()
+    collector = MetricsCollector(url=fake.url, interval=1, max_interval=4, timeout=2)
+
+    def fail():
+        fake.status = 500
+
+    def recover():
+        fake.status = 200
+        fake.body = PAGE.replace('room="r2"', 'room="r4"')
+
+    try:
+        delays = _polls(collector, [None, fail, None, None, recover])
+    finally:
+        fake.close()
+
+    assert delays == [1, 2, 4, 4, 1]
+    assert collector.healthy and collector.failures == 0
+    assert REGISTRY.get_sample_value("cinemate_livekit_collector_up") == 1
+    # Прежние данные пережили сбой, а исчезнувшая комната ушла из экспорта
+    assert collector.room_stats("r4")[RTT].avg == 100.0
+    assert collector.room_stats("r2") == {}
+    assert REGISTRY.get_sample_value("livekit_room_latency_ms", {"room": "r2", "stat": "avg"}) is None
+
+
+def test_collector_reports_unreachable_endpoint():
+    collector = MetricsCollector(url="http://127.0.0.1:9/metrics", interval=1, max_interval=8, timeout=0.5)
+    before = REGISTRY.get_sample_value("cinemate_livekit_collector_failures_total", {"reason": "ConnectError"}) or 0
+
+    delays = _polls(collector, [None, None])
+
+    assert delays == [2, 4]
+    assert not collector.healthy
+    assert REGISTRY.get_sample_value("cinemate_livekit_collector_up") == 0
+    assert REGISTRY.get_sample_value("cinemate_livekit_collector_failures_total", {"reason": "ConnectError"}) - before == 2
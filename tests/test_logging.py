@@ -0,0 +1,76 @@
+import json
+import logging
+import os
+import queue
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from backend.logging_setup import DroppingQueueHandler, JsonFormatter, SamplingFilter, configure_logging
+
+
+def _record(level: int = logging.INFO, msg: str = "hello %s", args=("world",), **extra) -> logging.LogRecord:
+    record = logging.LogRecord("cinemate.test", level, __file__, 1, msg, args, None)
+    record.__dict__.update(extra)
+    return record
+
+
+def test_json_formatter_includes_extra_fields():
+    entry = json.loads(JsonFormatter().format(_record(room_id="r1", users=3)))
+    assert entry["message"] == "hello world"
+    assert entry["level"] == "INFO"
+    assert entry["logger"] == "cinemate.test"
+    assert entry["room_id"] == "r1" and entry["users"] == 3
+    assert "args" not in entry and "msg" not in entry
+
+
+def test_sampling_filter_passes_every_nth_record_and_all_warnings():
+    sampler = SamplingFilter(rate=0.25)
+    passed = [sampler.filter(_record()) for _ in range(8)]
+    assert passed == [True, False, False, False, True, False, False, False]
+    assert sampler.filter(_record(logging.WARNING))
+    assert not any(SamplingFilter(rate=0).filter(_record()) for _ in range(3))
+
+
+def test_queue_handler_drops_when_full():
+    handler = DroppingQueueHandler(queue.Queue(1))
+    handler.handle(_record())
+    handler.handle(_record())
+    assert handler.queue.qsize() == 1
+    # Сообщение зафиксировано ещё в потоке вызывающего
+    assert handler.queue.get_nowait().msg == "hello world"
+
+
+def test_configure_logging_writes_json_through_queue(tmp_path):
+    name = f"cinemate_test_{time.time_ns()}"
+    (tmp_path / "log.yaml").write_text(f"""
+version: 1
+disable_existing_loggers: false
+formatters:
+  json:
+    (): backend.logging_setup.JsonFormatter
+handlers:
+  file:
+    class: logging.handlers.RotatingFileHandler
+    filename: logs/test.log
+    maxBytes: 1000000
+    backupCount: 1
+    formatter: json
+loggers:
+  {name}:
+    handlers: [file]
+    level: INFO
+    propagate: no
+""")
+    configure_logging(str(tmp_path / "log.yaml"))
+    logger = logging.getLogger(name)
+    assert [type(h) for h in logger.handlers] == [DroppingQueueHandler]
+
+    logger.info("joined %s", "room", extra={"room_id": "r1"})
+    log_file = tmp_path / "logs" / "test.log"
+    deadline = time.monotonic() + 2
+    while not (log_file.exists() and log_file.read_text()) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    entry = json.loads(log_file.read_text().splitlines()[0])
+    assert entry["message"] == "joined room" and entry["room_id"] == "r1"
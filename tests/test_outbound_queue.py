@@ -0,0 +1,109 @@
+import asyncio
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from backend.ws.db_manager import DBConnectionManager
+from backend.ws.outbound import OutboundQueue, parse_policies
+
+
+class BlockedWebSocket:
+    """Socket whose sends wait until ``release`` is set."""
+
+    def __init__(self):
+        self.sent = []
+        self.release = asyncio.Event()
+        self.closed_with = None
+
+    async def accept(self, subprotocol: str | None = None):
+        pass
+
+    async def send_text(self, message: str):
+        await self.release.wait()
+        self.sent.append(message)
+
+    async def close(self, code: int = 1000):
+        self.closed_with = code
+
+
+def _fill(queue: OutboundQueue, *frames):
+    for kind, message in frames:
+        queue.put(message, kind)
+
+
+def test_writer_delivers_frames_in_order():
+    async def run():
+        ws = BlockedWebSocket()
+        ws.release.set()
+        queue = OutboundQueue(ws, maxsize=10, policies=(), send_timeout=1)
+        queue.start()
+        _fill(queue, ("chat", "a"), ("seek", "b"), ("chat", "c"))
+        await asyncio.sleep(0.01)
+        queue.close()
+        return ws.sent
+
+    assert asyncio.run(run()) == ["a", "b", "c"]
+
+
+def test_coalesce_seek_drops_superseded_seeks():
+    async def run():
+        ws = BlockedWebSocket()
+        queue = OutboundQueue(ws, maxsize=3, policies=parse_policies("coalesce_seek"), send_timeout=1)
+        _fill(queue, ("seek", "s1"), ("chat", "c1"), ("seek", "s2"))
+        assert queue.put("s3", "seek")
+        return [message for _, message in queue._items]
+
+    assert asyncio.run(run()) == ["c1", "s3"]
+
+
+def test_drop_oldest_chat_on_overflow():
+    async def run():
+        ws = BlockedWebSocket()
+        queue = OutboundQueue(ws, maxsize=3, policies=parse_policies("drop_oldest_chat"), send_timeout=1)
+        _fill(queue, ("play", "p"), ("chat", "c1"), ("chat", "c2"))
+        assert queue.put("c3", "chat")
+        return [message for _, message in queue._items]
+
+    assert asyncio.run(run()) == ["p", "c2", "c3"]
+
+
+def test_overflow_without_matching_policy_drops_new_frame():
+    async def run():
+        ws = BlockedWebSocket()
+        queue = OutboundQueue(ws, maxsize=1, policies=parse_policies("drop_oldest_chat"), send_timeout=1)
+        _fill(queue, ("play", "p"))
+        assert not queue.put("s", "seek")
+        return [message for _, message in queue._items]
+
+    assert asyncio.run(run()) == ["p"]
+
+
+def test_disconnect_policy_drops_connection_from_room():
+    manager = DBConnectionManager(queue_size=2, overflow_policy="disconnect")
+
+    async def run():
+        slow_ws = BlockedWebSocket()
+        fast_ws = BlockedWebSocket()
+        fast_ws.release.set()
+        await manager.connect(slow_ws, "room", "slow")
+        await manager.connect(fast_ws, "room", "fast")
+
+        for i in range(4):
+            await manager.broadcast(f"m{i}", "room", kind="chat")
+            await asyncio.sleep(0.01)
+        await asyncio.sleep(0.01)
+        return slow_ws, fast_ws
+
+    slow_ws, fast_ws = asyncio.run(run())
+
+    assert fast_ws.sent == ["m0", "m1", "m2", "m3"]
+    assert "slow" not in manager.active_connections["room"]
+    assert slow_ws not in manager.outbound
+    assert slow_ws.closed_with == 1013
+
+
+def test_unknown_policy_rejected():
+    with pytest.raises(ValueError):
+        parse_policies("coalesce_seek,explode")
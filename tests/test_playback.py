@@ -0,0 +1,77 @@
+import os
+import sys
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+from fastapi.testclient import TestClient
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from backend.main import app
+from backend.db.database import Base, engine
+from backend.ws.room_state import PlaybackState, PLAYING, PAUSED
+
+Base.metadata.create_all(bind=engine)
+
+
+def test_clock_advances_only_while_playing():
+    playback = PlaybackState(updated_at=100.0)
+    playback.apply("play", position=10.0, now=100.0)
+    assert playback.position_at(now=104.0) == 14.0
+
+    playback.apply("pause", now=105.0)
+    assert playback.state == PAUSED
+    assert playback.position_at(now=200.0) == 15.0
+
+    playback.apply("seek", position=60.0, now=201.0)
+    assert playback.state == PAUSED
+    assert playback.position_at(now=300.0) == 60.0
+
+
+def test_rate_scales_elapsed_time():
+    playback = PlaybackState(updated_at=0.0)
+    playback.apply("play", position=0.0, rate=2.0, now=0.0)
+    assert playback.position_at(now=3.0) == 6.0
+
+
+def test_loaded_playing_state_accounts_for_time_since_save():
+    room = SimpleNamespace(
+        playback_state=PLAYING,
+        playback_position=30.0,
+        playback_rate=1.0,
+        playback_updated_at=datetime.utcnow() - timedelta(seconds=10),
+    )
+    playback = PlaybackState.from_model(room)
+    assert 39.5 < playback.position_at() < 41.0
+
+
+@contextmanager
+def _connect(client: TestClient, room: str, user_id: str):
+    with client.websocket_connect(f"/ws/{room}?username={user_id}&user_id={user_id}") as ws:
+        joined = ws.receive_json()
+        ws.receive_json()  # users snapshot
+        ws.receive_json()  # history
+        yield ws, joined
+
+
+def test_play_is_stamped_by_server_and_sent_to_joiners():
+    room = "room_playback"
+    with TestClient(app) as client:
+        with _connect(client, room, "host") as (host_ws, joined):
+            assert joined["playback"]["state"] == PAUSED
+
+            host_ws.send_json({"type": "play", "user_id": "host", "timestamp": 42})
+            frame = host_ws.receive_json()
+            assert frame["type"] == "play"
+            assert frame["playback"]["state"] == PLAYING
+            assert frame["timestamp"] >= 42
+
+            host_ws.send_json({"type": "sync", "client_time": 123})
+            sync = host_ws.receive_json()
+            assert sync["client_time"] == 123
+            assert sync["playback"]["position"] >= 42
+
+            with _connect(client, room, "late") as (_, late_joined):
+                assert late_joined["playback"]["state"] == PLAYING
+                assert late_joined["playback"]["position"] >= 42
@@ -0,0 +1,145 @@
+import os
+import sys
+import time
+
+from fastapi.testclient import TestClient
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from backend.main import app
+from backend.db.database import Base, engine as db_engine
+from backend.livekit.metrics_collector import LOSS, RTT, Aggregate
+from backend.routers import config_router
+from backend.services.qos import FAIR, GOOD, LIVEKIT, P2P, POOR, PROFILES, QoSEngine, _hash_split, qos
+
+
+class FakeStats:
+    """Stand-in for the LiveKit collector: per-room aggregates set by the test."""
+
+    def __init__(self):
+        self.rooms = {}
+
+    def set(self, room_id, rtt=None, loss=None):
+        stats = {}
+        if rtt is not None:
+            stats[RTT] = Aggregate.of(rtt)
+        if loss is not None:
+            stats[LOSS] = Aggregate.of(loss)
+        self.rooms[room_id] = stats
+
+    def room_stats(self, room_id):
+        return self.rooms.get(room_id, {})
+
+
+def _engine(**kwargs):
+    stats = FakeStats()
+    kwargs = {"rtt_fair": 150, "rtt_poor": 400, "loss_fair": 2, "loss_poor": 8, "p2p_max_peers": 4,
+              "hold": 60, **kwargs}
+    return QoSEngine(stats, **kwargs), stats
+
+
+def test_profile_follows_heartbeat_latency():
+    engine, _ = _engine()
+
+    assert engine.profile("r") == PROFILES[FAIR]
+    for _ in range(10):
+        profile = engine.observe("r", rtt_ms=40, peers=2)
+    assert profile == PROFILES[GOOD]
+
+    for _ in range(20):
+        profile = engine.observe("r", rtt_ms=900)
+    assert profile == PROFILES[POOR]
+    assert profile.interval_ms < PROFILES[GOOD].interval_ms
+    assert profile.seek_tolerance > PROFILES[GOOD].seek_tolerance
+
+    tiers = [(d["value"], d["reason"]) for d in engine.snapshot("r")["decisions"] if d["kind"] == "tier"]
+    assert tiers[0] == (GOOD, "stable")
+    assert tiers[-1] == (POOR, "latency")
+
+
+def test_livekit_loss_degrades_tier_and_transport():
+    engine, stats = _engine()
+    stats.set("r", rtt=[20.0] * 3, loss=[0.5, 1.0, 12.0])
+
+    assert engine.observe("r", rtt_ms=30, peers=3) == PROFILES[POOR]
+    decision = engine.choose_transport("r")
+    assert (decision.value, decision.reason) == (P2P, "livekit_degraded")
+    assert decision.loss == 12.0
+
+    snapshot = engine.snapshot("r")
+    assert snapshot["transport"]["value"] == P2P
+    assert snapshot["livekit"][LOSS]["max"] == 12.0
+    assert snapshot["decisions"][0]["reason"] == "loss"
+
+
+def test_transport_is_kept_while_the_room_is_occupied():
+    engine, _ = _engine(p2p_max_peers=2, hold=0)
+    room_id = next(f"room_{i}" for i in range(50) if not _hash_split(f"room_{i}"))
+
+    engine.observe(room_id, peers=2)
+    first = engine.choose_transport(room_id)
+    assert (first.value, first.reason) == (P2P, "hash")
+    # Посреди сессии комната переросла порог P2P и задержка стала высокой — транспорт тот же,
+    # иначе новые участники оказались бы в LiveKit, а прежние — в P2P
+    for _ in range(5):
+        engine.observe(room_id, rtt_ms=2000, peers=3)
+    assert engine.choose_transport(room_id) is first
+
+    # Комната опустела — следующая сессия получает свежее решение
+    engine.observe(room_id, peers=0)
+    assert engine.choose_transport(room_id).reason == "high_latency"
+
+
+def test_large_rooms_start_on_livekit():
+    engine, _ = _engine(p2p_max_peers=2)
+    room_id = next(f"room_{i}" for i in range(50) if not _hash_split(f"room_{i}"))
+
+    engine.observe(room_id, peers=3)
+    decision = engine.choose_transport(room_id)
+    assert (decision.value, decision.reason) == (LIVEKIT, "room_size")
+
+
+def test_high_latency_prefers_livekit_once_hold_expires():
+    engine, _ = _engine(hold=0)
+    for room_id in (f"room_{i}" for i in range(50)):
+        if engine.choose_transport(room_id).value == P2P:
+            break
+    for _ in range(5):
+        engine.observe(room_id, rtt_ms=800)
+
+    decision = engine.choose_transport(room_id)
+    assert (decision.value, decision.reason) == (LIVEKIT, "high_latency")
+
+
+def test_config_and_sync_reply_carry_room_profile():
+    Base.metadata.create_all(bind=db_engine)
+    config_router.USE_LIVEKIT = True
+    room = f"room_qos_{time.time_ns()}"
+
+    with TestClient(app) as client:
+        with client.websocket_connect(f"/ws/{room}?username=host&user_id=host") as ws:
+            for _ in range(3):
+                ws.receive_json()
+            for _ in range(5):
+                ws.send_json({"type": "sync", "client_time": 1, "rtt_ms": 900})
+                reply = ws.receive_json()
+            assert reply["qos"] == PROFILES[POOR].as_dict()
+
+            config = client.get("/config", params={"room_id": room}).json()
+            assert config["sync"] == PROFILES[POOR].as_dict()
+            assert config["use_livekit"] is True
+            assert config["transport_reason"] == "high_latency"
+
+            snapshot = client.get(f"/qos/{room}").json()
+            assert snapshot["peers"] == 1
+            assert snapshot["transport"]["reason"] == config["transport_reason"]
+
+        # Участник ушёл — QoS знает, что комната пуста (уход обрабатывается асинхронно)
+        for _ in range(50):
+            if client.get(f"/qos/{room}").json()["peers"] == 0:
+                break
+            time.sleep(0.02)
+        assert client.get(f"/qos/{room}").json()["peers"] == 0
+
+
+    qos._rooms.pop(room, None)
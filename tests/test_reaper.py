@@ -0,0 +1,178 @@
+import asyncio
+import json
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+from fastapi.testclient import TestClient
+from sqlalchemy import select, update
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from backend.main import app
+from backend import ws_endpoint
+from backend.db.database import Base, engine
+from backend.db.models import RoomParticipant
+from backend.ws.broker import InProcessBroker, InProcessHub
+from backend.ws.db_manager import DBConnectionManager
+from backend.ws import sharding
+from backend.ws.reaper import Reaper
+from backend.ws.sharding import HashRing
+
+
+class RecordingWebSocket:
+    def __init__(self):
+        self.sent = []
+        self.close_code = None
+
+    async def accept(self, subprotocol: str | None = None):
+        pass
+
+    async def send_text(self, message: str):
+        self.sent.append(message)
+
+    async def close(self, code: int = 1000):
+        self.close_code = code
+
+
+async def _connected(manager: DBConnectionManager, room: str, user_id: str) -> RecordingWebSocket:
+    await manager.add_user(room, user_id, user_id)
+    ws = RecordingWebSocket()
+    await manager.connect(ws, room, user_id)
+    return ws
+
+
+async def _is_connected(manager: DBConnectionManager, room: str, user_id: str) -> bool:
+    async with manager.get_db() as db:
+        return await db.scalar(select(RoomParticipant.connected).filter_by(room_id=room, user_id=user_id))
+
+
+def test_idle_connection_is_closed_and_announced():
+    Base.metadata.create_all(bind=engine)
+    room = f"room_reaper_idle_{time.time_ns()}"
+
+    async def run():
+        manager = DBConnectionManager()
+        reaper = Reaper(manager, on_leave=manager.leave, interval=3600, idle_timeout=10)
+        admin_ws = await _connected(manager, room, "admin")
+        guest_ws = await _connected(manager, room, "guest")
+        manager.touch(admin_ws)
+        manager.last_seen[guest_ws] -= 60
+
+        await reaper.sweep()
+        await asyncio.sleep(0.05)
+        return manager, admin_ws, guest_ws, await _is_connected(manager, room, "guest")
+
+    manager, admin_ws, guest_ws, guest_connected = asyncio.run(run())
+
+    assert guest_ws.close_code == 1001
+    assert "guest" not in manager.active_connections[room]
+    assert "admin" in manager.active_connections[room]
+    assert guest_connected is False
+    left = {"type": "user_left", "version": 1, "user_id": "guest", "seq": 1}
+    assert any(json.loads(m) == left for m in admin_ws.sent)
+
+
+def test_participant_without_socket_is_marked_disconnected():
+    Base.metadata.create_all(bind=engine)
+    room = f"room_reaper_stale_{time.time_ns()}"
+
+    async def run():
+        manager = DBConnectionManager()
+        reaper = Reaper(manager, on_leave=manager.leave, interval=30, idle_timeout=0)
+        admin_ws = await _connected(manager, room, "admin")
+        # Сокет гостя пропал, не оставив следа: участник connected, но соединения нет
+        await manager.add_user(room, "guest", "ghost")
+        joined_at = datetime.utcnow() - timedelta(minutes=5)
+        manager.rooms[room].participants["ghost"].joined_at = joined_at
+        async with manager.get_db() as db:
+            await db.execute(update(RoomParticipant).filter_by(room_id=room, user_id="ghost").values(joined_at=joined_at))
+            await db.commit()
+
+        await reaper.sweep()
+        return manager, admin_ws, await _is_connected(manager, room, "ghost"), await _is_connected(manager, room, "admin")
+
+    manager, admin_ws, ghost_connected, admin_connected = asyncio.run(run())
+
+    assert ghost_connected is False
+    assert admin_connected is True
+    assert not manager.rooms[room].participants["ghost"].connected
+    assert any(json.loads(m).get("user_id") == "ghost" for m in admin_ws.sent)
+
+
+def test_participants_are_not_reconciled_across_nodes():
+    Base.metadata.create_all(bind=engine)
+    room = f"room_reaper_nodes_{time.time_ns()}"
+
+    async def run():
+        hub = InProcessHub()
+        manager = DBConnectionManager(broker=InProcessBroker(hub))
+        reaper = Reaper(manager, on_leave=manager.leave, interval=30, idle_timeout=0)
+        # Участник другого узла: в этом процессе его сокета нет
+        await manager.add_user(room, "remote", "remote")
+        manager.rooms[room].participants["remote"].joined_at = datetime.utcnow() - timedelta(minutes=5)
+
+        reaped = await reaper.sweep()
+        return reaped, manager
+
+    reaped, manager = asyncio.run(run())
+
+    assert reaped == 0
+    assert manager.rooms[room].participants["remote"].connected
+
+
+def test_worker_reconciles_only_its_own_rooms(monkeypatch):
+    Base.metadata.create_all(bind=engine)
+    monkeypatch.setattr(sharding, "SHARD_COUNT", 2)
+    monkeypatch.setattr(sharding, "SHARD_INDEX", 0)
+    monkeypatch.setattr(sharding, "ring", HashRing(2))
+    stamp = time.time_ns()
+    own, foreign = (next(f"room_reaper_shard_{stamp}_{i}" for i in range(100)
+                         if sharding.ring.owner(f"room_reaper_shard_{stamp}_{i}") == worker) for worker in (0, 1))
+
+    async def run():
+        manager = DBConnectionManager()
+        reaper = Reaper(manager, on_leave=manager.leave, interval=30, idle_timeout=0)
+        joined_at = datetime.utcnow() - timedelta(minutes=5)
+        # У обоих участников нет сокета в этом воркере; живой участник чужой комнаты подключён к другому
+        for room, user_id in ((own, f"ghost-{stamp}"), (foreign, f"remote-{stamp}")):
+            await manager.add_user(room, user_id, user_id)
+            async with manager.get_db() as db:
+                await db.execute(update(RoomParticipant).filter_by(room_id=room, user_id=user_id)
+                                 .values(joined_at=joined_at))
+                await db.commit()
+            manager.release_room(room)
+
+        reaped = await reaper.sweep()
+        return (reaped, await _is_connected(manager, own, f"ghost-{stamp}"),
+                await _is_connected(manager, foreign, f"remote-{stamp}"))
+
+    reaped, ghost_connected, remote_connected = asyncio.run(run())
+
+    assert ghost_connected is False
+    assert remote_connected is True
+    assert reaped >= 1
+
+
+def test_endpoint_cleans_up_when_handling_fails(monkeypatch):
+    room = "room_reaper_crash"
+
+    async def crash(conn, data):
+        raise RuntimeError("boom")
+
+    with TestClient(app) as client:
+        with client.websocket_connect(f"/ws/{room}?username=admin&user_id=admin") as admin_ws:
+            for _ in range(3):
+                admin_ws.receive_json()
+            with client.websocket_connect(f"/ws/{room}?username=guest&user_id=guest") as guest_ws:
+                for _ in range(3):
+                    guest_ws.receive_json()
+                assert admin_ws.receive_json()["type"] == "user_joined"
+
+                monkeypatch.setattr(ws_endpoint.dispatcher, "dispatch", crash)
+                guest_ws.send_json({"type": "chat", "user_id": "guest", "message": "hi"})
+
+                left = admin_ws.receive_json()
+                assert left["type"] == "user_left" and left["user_id"] == "guest"
+                assert "guest" not in ws_endpoint.manager.active_connections.get(room, {})
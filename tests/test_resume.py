@@ -0,0 +1,177 @@
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+
+from fastapi import WebSocket
+from fastapi.testclient import TestClient
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from backend.main import app
+from backend import ws_endpoint
+from backend.ws.room_state import ReplayBuffer
+
+
+def _join(client: TestClient, room: str, user_id: str, query: str = ""):
+    ws = client.websocket_connect(f"/ws/{room}?username={user_id}&user_id={user_id}{query}")
+    return ws.__enter__()
+
+
+def _drop(ws, room: str, user_id: str):
+    # Обрыв без нормального закрытия, как у мобильного клиента при смене сети
+    ws.close(code=1006)
+    deadline = time.monotonic() + 2
+    while user_id in ws_endpoint.manager.active_connections.get(room, {}) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    ws.__exit__(None, None, None)
+
+
+def test_replay_buffer_returns_frames_after_seq():
+    buffer = ReplayBuffer(size=2)
+    first = buffer.record('{"type":"chat","message":"a"}', "chat", None)
+    buffer.record('{"type":"chat","message":"b"}', "chat", "alice")
+    buffer.record('{"type":"chat","message":"c"}', "chat", None)
+
+    assert json.loads(first) == {"type": "chat", "message": "a", "seq": 1}
+    assert [seq for seq, *_ in buffer.since(1)] == [2, 3]
+    assert buffer.since(1)[0][3] == "alice"
+    assert buffer.since(3) == []
+    # Первый кадр уже вытеснен, а номеров из будущего не бывает
+    assert buffer.since(0) is None
+    assert buffer.since(4) is None
+
+
+def test_reconnect_replays_missed_frames_without_roster_churn():
+    room = "room_resume_replay"
+    with TestClient(app) as client:
+        admin_ws = _join(client, room, "admin")
+        for _ in range(3):
+            admin_ws.receive_json()
+        guest_ws = _join(client, room, "guest")
+        joined = guest_ws.receive_json()
+        guest_ws.receive_json()  # users_update
+        guest_ws.receive_json()  # history
+        assert joined["resume_token"]
+        assert admin_ws.receive_json()["type"] == "user_joined"
+
+        _drop(guest_ws, room, "guest")
+        admin_ws.send_json({"type": "chat", "user_id": "admin", "message": "while you were away"})
+        missed = admin_ws.receive_json()
+        assert missed["type"] == "chat"
+
+        guest_ws = _join(client, room, "guest", f"&resume={joined['resume_token']}&last_seq={joined['seq']}")
+        resumed = guest_ws.receive_json()
+        assert resumed["type"] == "resumed" and resumed["replayed"] is True
+        assert resumed["user_id"] == "guest"
+        assert guest_ws.receive_json() == missed
+
+        # Остальные не видели ни ухода, ни повторного входа
+        admin_ws.send_json({"type": "chat", "user_id": "admin", "message": "welcome back"})
+        assert admin_ws.receive_json()["message"] == "welcome back"
+        assert guest_ws.receive_json()["message"] == "welcome back"
+
+        guest_ws.__exit__(None, None, None)
+        assert admin_ws.receive_json()["type"] == "user_left"
+        admin_ws.__exit__(None, None, None)
+
+
+def test_resume_outside_buffer_sends_snapshot():
+    room = "room_resume_snapshot"
+    with TestClient(app) as client:
+        guest_ws = _join(client, room, "guest")
+        joined = guest_ws.receive_json()
+        guest_ws.receive_json()
+        guest_ws.receive_json()
+        _drop(guest_ws, room, "guest")
+
+        guest_ws = _join(client, room, "guest", f"&resume={joined['resume_token']}&last_seq=999")
+        resumed = guest_ws.receive_json()
+        assert resumed["type"] == "resumed" and resumed["replayed"] is False
+        assert guest_ws.receive_json()["type"] == "users_update"
+        assert guest_ws.receive_json()["type"] == "history"
+        guest_ws.__exit__(None, None, None)
+
+
+def test_parked_participant_leaves_after_grace(monkeypatch):
+    monkeypatch.setattr(ws_endpoint, "WS_RESUME_GRACE", 0.05)
+    room = "room_resume_expired"
+    with TestClient(app) as client:
+        admin_ws = _join(client, room, "admin")
+        for _ in range(3):
+            admin_ws.receive_json()
+        guest_ws = _join(client, room, "guest")
+        joined = guest_ws.receive_json()
+        assert admin_ws.receive_json()["type"] == "user_joined"
+
+        _drop(guest_ws, room, "guest")
+        left = admin_ws.receive_json()
+        assert left["type"] == "user_left" and left["user_id"] == "guest"
+
+        # Токен истёкшей сессии больше не действует — обычный вход
+        guest_ws = _join(client, room, "guest", f"&resume={joined['resume_token']}&last_seq={joined['seq']}")
+        assert guest_ws.receive_json()["type"] == "joined"
+        assert admin_ws.receive_json()["type"] == "user_joined"
+        guest_ws.__exit__(None, None, None)
+        admin_ws.__exit__(None, None, None)
+
+
+
+def _slow_resume_accept(monkeypatch, delay: float):
+    accept = WebSocket.accept
+
+    async def slow_accept(self, *args, **kwargs):
+        if "resume" in self.query_params:
+            await asyncio.sleep(delay)
+        await accept(self, *args, **kwargs)
+
+    monkeypatch.setattr(WebSocket, "accept", slow_accept)
+
+
+def test_grace_period_cannot_expire_during_accept(monkeypatch):
+    monkeypatch.setattr(ws_endpoint, "WS_RESUME_GRACE", 0.1)
+    # Срок парковки истёк бы, пока сокет ещё принимается
+    _slow_resume_accept(monkeypatch, 0.4)
+    room = "room_resume_accept_expiry"
+    with TestClient(app) as client:
+        guest_ws = _join(client, room, "guest")
+        joined = guest_ws.receive_json()
+        guest_ws.receive_json()
+        guest_ws.receive_json()
+        _drop(guest_ws, room, "guest")
+
+        guest_ws = _join(client, room, "guest", f"&resume={joined['resume_token']}&last_seq={joined['seq']}")
+        resumed = guest_ws.receive_json()
+        assert resumed["type"] == "resumed" and resumed["replayed"] is True
+        time.sleep(0.2)
+        assert ws_endpoint.manager.get_participant(room, "guest").connected
+        assert not ws_endpoint.manager.sessions.is_parked(room, "guest")
+        guest_ws.__exit__(None, None, None)
+
+
+def test_session_ending_during_accept_falls_back_to_join(monkeypatch):
+    _slow_resume_accept(monkeypatch, 0.3)
+    room = "room_resume_accept_kicked"
+    with TestClient(app) as client:
+        admin_ws = _join(client, room, "admin")
+        for _ in range(3):
+            admin_ws.receive_json()
+        guest_ws = _join(client, room, "guest")
+        joined = guest_ws.receive_json()
+        assert admin_ws.receive_json()["type"] == "user_joined"
+        _drop(guest_ws, room, "guest")
+
+        # Пока новый сокет принимается, сессию закрывает кик
+        kick = threading.Timer(0.1, admin_ws.send_json, [{"type": "kick", "user_id": "admin", "target_id": "guest"}])
+        kick.start()
+        guest_ws = _join(client, room, "guest", f"&resume={joined['resume_token']}&last_seq={joined['seq']}")
+        kick.join()
+        assert admin_ws.receive_json()["type"] == "user_left"
+        rejoined = guest_ws.receive_json()
+        assert rejoined["type"] == "joined" and rejoined["user_id"] == "guest"
+        assert admin_ws.receive_json()["type"] == "user_joined"
+        assert ws_endpoint.manager.get_participant(room, "guest").connected
+        guest_ws.__exit__(None, None, None)
+        admin_ws.__exit__(None, None, None)
@@ -0,0 +1,115 @@
+import os
+import sys
+import time
+from contextlib import contextmanager
+
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from backend.main import app
+from backend.db.database import Base, engine, async_engine
+from backend.ws_endpoint import manager
+
+Base.metadata.create_all(bind=engine)
+
+
+@contextmanager
+def _connect(client: TestClient, room: str, username: str, user_id: str):
+    with client.websocket_connect(f"/ws/{room}?username={username}&user_id={user_id}") as ws:
+        ws.receive_json()  # joined
+        ws.receive_json()  # users snapshot
+        ws.receive_json()  # history
+        yield ws
+
+
+def _wait_for(predicate, timeout: float = 2.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "condition not reached"
+        time.sleep(0.01)
+
+
+@contextmanager
+def _count_queries():
+    statements = []
+
+    def _before_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(async_engine.sync_engine, "before_cursor_execute", _before_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(async_engine.sync_engine, "before_cursor_execute", _before_execute)
+
+
+def test_hot_path_lookups_do_not_query_db():
+    room = "room_state_reads"
+    with TestClient(app) as client:
+        with _connect(client, room, "admin", "admin"):
+            with _count_queries() as statements:
+                assert manager.get_user(room, "admin").name == "admin"
+                assert manager.get_participant(room, "admin").permissions["kick"] is True
+                assert manager.get_participant(room, "missing") is None
+
+    assert statements == []
+
+
+def test_state_is_written_through_and_reloaded():
+    room = "room_state_reload"
+    with TestClient(app) as client:
+        admin_cm = _connect(client, room, "admin", "admin")
+        admin_ws = admin_cm.__enter__()
+        with _connect(client, room, "guest", "guest") as guest_ws:
+            admin_ws.receive_json()  # user_joined
+            admin_ws.send_json({
+                "type": "set_permissions",
+                "user_id": "admin",
+                "target_id": "guest",
+                "permissions": {"change_video": True},
+            })
+            admin_ws.receive_json()
+            guest_ws.receive_json()
+
+            admin_cm.__exit__(None, None, None)
+            left = guest_ws.receive_json()
+            assert left == {"type": "user_left", "version": left["version"], "user_id": "admin", "seq": left["seq"]}
+            promoted = guest_ws.receive_json()  # guest promoted in place of the admin
+            assert promoted["type"] == "user_updated"
+            assert promoted["version"] == left["version"] + 1
+            assert promoted["user"]["id"] == "guest" and promoted["user"]["role"] == "admin"
+        _wait_for(lambda: room not in manager.rooms)
+
+        with _connect(client, room, "guest", "guest"):
+            participant = manager.get_participant(room, "guest")
+            assert participant.permissions["change_video"] is True
+            assert participant.role == "admin"
+
+
+def test_chat_uses_cached_sender_name():
+    room = "room_state_chat"
+    with TestClient(app) as client:
+        with _connect(client, room, "alice", "alice") as ws:
+            ws.send_json({"type": "chat", "user_id": "alice", "message": "hi"})
+            msg = ws.receive_json()
+            assert msg["type"] == "chat"
+            assert msg["username"] == "alice"
+        assert manager.get_participant(room, "alice") is None
+
+
+def test_join_sends_recent_history_in_one_frame():
+    room = "room_state_history"
+    with TestClient(app) as client:
+        with _connect(client, room, "alice", "alice") as ws:
+            for i in range(3):
+                ws.send_json({"type": "chat", "user_id": "alice", "message": f"m{i}"})
+                ws.receive_json()
+
+        with client.websocket_connect(f"/ws/{room}?username=bob&user_id=bob") as ws:
+            ws.receive_json()  # joined
+            ws.receive_json()  # users snapshot
+            history = ws.receive_json()
+            assert history["type"] == "history"
+            assert [m["message"] for m in history["messages"]][-3:] == ["m0", "m1", "m2"]
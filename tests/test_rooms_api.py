@@ -1,5 +1,6 @@
 import os
 import sys
+from datetime import datetime, timedelta
 
 from fastapi.testclient import TestClient
 
@@ -7,7 +8,8 @@ from fastapi.testclient import TestClient
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
 from backend.main import app
-from backend.db.database import Base, engine
+from backend.db.database import Base, SessionLocal, engine
+from backend.db.models import Message
 
 # Ensure a clean database for tests
 Base.metadata.drop_all(bind=engine)
@@ -28,3 +30,32 @@ def test_create_and_get_room():
     resp = client.get(f"/api/rooms/{room_id}")
     assert resp.status_code == 200
     assert resp.json()["room_id"] == room_id
+
+
+def test_message_history_is_paginated_newest_first():
+    room_id = client.post("/api/rooms/create").json()["room_id"]
+    started = datetime(2025, 1, 1)
+    with SessionLocal() as db:
+        db.add_all(
+            Message(room_id=room_id, username="u", text=f"m{i}", timestamp=started + timedelta(seconds=i))
+            for i in range(5)
+        )
+        db.commit()
+
+    resp = client.get(f"/api/rooms/{room_id}/messages", params={"limit": 2})
+    assert resp.status_code == 200
+    page = resp.json()
+    assert [m["message"] for m in page["messages"]] == ["m3", "m4"]
+
+    texts = []
+    while page["next_cursor"]:
+        page = client.get(
+            f"/api/rooms/{room_id}/messages", params={"limit": 2, "before": page["next_cursor"]}
+        ).json()
+        texts = [m["message"] for m in page["messages"]] + texts
+    assert texts == ["m0", "m1", "m2"]
+
+
+def test_message_history_rejects_bad_cursor():
+    resp = client.get("/api/rooms/any/messages", params={"before": "not-a-cursor"})
+    assert resp.status_code == 400
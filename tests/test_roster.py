@@ -0,0 +1,130 @@
+import asyncio
+import json
+import os
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+from fastapi.testclient import TestClient
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from backend.main import app
+from backend import ws_endpoint
+from backend.ws.broker import InProcessBroker, InProcessHub
+from backend.ws.db_manager import DBConnectionManager
+from backend.ws.room_state import RoomState, ParticipantState, ADMIN_PERMISSIONS, GUEST_PERMISSIONS, USER_JOINED
+
+
+@contextmanager
+def _connect(client: TestClient, room: str, username: str, user_id: str):
+    with client.websocket_connect(f"/ws/{room}?username={username}&user_id={user_id}") as ws:
+        ws.receive_json()  # joined
+        snapshot = ws.receive_json()
+        ws.receive_json()  # history
+        yield ws, snapshot
+
+
+class RecordingWebSocket:
+    def __init__(self):
+        self.sent = []
+
+    async def accept(self, subprotocol: str | None = None):
+        pass
+
+    async def send_text(self, message: str):
+        self.sent.append(message)
+
+    async def close(self, code: int = 1000):
+        pass
+
+
+def test_join_and_leave_are_sent_as_versioned_deltas():
+    room = "room_roster_deltas"
+    with TestClient(app) as client:
+        with _connect(client, room, "admin", "admin") as (admin_ws, admin_snapshot):
+            assert admin_snapshot["type"] == "users_update"
+            assert [u["id"] for u in admin_snapshot["users"]] == ["admin"]
+
+            with _connect(client, room, "guest", "guest") as (guest_ws, guest_snapshot):
+                joined = admin_ws.receive_json()
+                assert joined["type"] == "user_joined"
+                assert joined["user"]["id"] == "guest" and joined["user"]["role"] == "guest"
+                assert joined["version"] == admin_snapshot["version"] + 1
+                # Снимок новичка уже включает его самого
+                assert guest_snapshot["version"] == joined["version"]
+                assert [u["id"] for u in guest_snapshot["users"]] == ["admin", "guest"]
+
+            left = admin_ws.receive_json()
+            assert left == {"type": "user_left", "version": joined["version"] + 1, "user_id": "guest",
+                            "seq": joined["seq"] + 1}
+
+
+def test_client_can_request_full_snapshot():
+    room = "room_roster_snapshot"
+    with TestClient(app) as client:
+        with _connect(client, room, "admin", "admin") as (admin_ws, _):
+            with _connect(client, room, "guest", "guest") as (guest_ws, _):
+                joined = admin_ws.receive_json()
+                admin_ws.send_json({"type": "get_users"})
+                snapshot = admin_ws.receive_json()
+                assert snapshot["type"] == "users_update"
+                assert snapshot["version"] == joined["version"]
+                assert {u["id"] for u in snapshot["users"]} == {"admin", "guest"}
+
+
+def test_kicked_user_is_announced_once():
+    room = "room_roster_kick"
+    with TestClient(app) as client:
+        with _connect(client, room, "admin", "admin") as (admin_ws, _):
+            with _connect(client, room, "guest", "guest") as (guest_ws, _):
+                admin_ws.receive_json()  # user_joined
+                admin_ws.send_json({"type": "kick", "user_id": "admin", "target_id": "guest"})
+                assert guest_ws.receive_json()["type"] == "kicked"
+                left = admin_ws.receive_json()
+                assert left["type"] == "user_left" and left["user_id"] == "guest"
+
+            deadline = time.monotonic() + 2
+            while "guest" in ws_endpoint.manager.active_connections.get(room, {}) or ws_endpoint._cleanup_tasks:
+                assert time.monotonic() < deadline, "guest cleanup did not finish"
+                time.sleep(0.01)
+
+            # Уход кикнутого сокета не порождает второй user_left
+            admin_ws.send_json({"type": "get_users"})
+            snapshot = admin_ws.receive_json()
+            assert snapshot["type"] == "users_update"
+            assert snapshot["version"] == left["version"]
+
+
+def test_roster_delta_is_applied_on_other_nodes():
+    joined_at = datetime(2025, 1, 1)
+
+    async def run():
+        hub = InProcessHub()
+        node_a, node_b = (DBConnectionManager(broker=InProcessBroker(hub)) for _ in range(2))
+        alice, bob = RecordingWebSocket(), RecordingWebSocket()
+        await node_a.connect(alice, "room", "alice")
+        await node_b.connect(bob, "room", "bob")
+        node_a.rooms["room"] = RoomState("room", roster_version=3, participants={
+            "alice": ParticipantState("alice", "Alice", "admin", dict(ADMIN_PERMISSIONS), True, joined_at),
+            "carol": ParticipantState("carol", "Carol", "guest", dict(GUEST_PERMISSIONS), True, joined_at),
+        })
+        node_b.rooms["room"] = RoomState("room", roster_version=3, participants={
+            "alice": ParticipantState("alice", "Alice", "admin", dict(ADMIN_PERMISSIONS), True, joined_at),
+        })
+
+        await node_a.broadcast_roster("room", USER_JOINED, "carol")
+        await asyncio.sleep(0.01)
+        return node_b, bob.sent
+
+    node_b, sent = asyncio.run(run())
+    assert json.loads(sent[-1]) == {
+        "type": "user_joined",
+        "version": 4,
+        "user": {"id": "carol", "name": "Carol", "role": "guest", "permissions": GUEST_PERMISSIONS},
+        # Номер кадра у каждого узла свой
+        "seq": 1,
+    }
+    assert node_b.get_user("room", "carol").name == "Carol"
+    assert node_b.rooms["room"].roster_version == 4
@@ -0,0 +1,168 @@
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+from collections import Counter
+
+import pytest
+from fastapi.testclient import TestClient
+from starlette.websockets import WebSocketDisconnect
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(ROOT)
+
+from backend.main import app
+from backend.supervisor import Supervisor, Worker, peek_request_line
+from backend.ws import sharding
+from backend.ws.sharding import HashRing, route_key
+
+
+def test_ring_spreads_rooms_and_moves_few_on_resize():
+    rooms = [f"room_{i}" for i in range(4000)]
+    four, five = HashRing(4), HashRing(5)
+
+    shares = Counter(four.owner(room) for room in rooms)
+    assert set(shares) == {0, 1, 2, 3}
+    assert all(700 < count < 1300 for count in shares.values()), shares
+
+    # Новый воркер забирает комнаты только себе, остальные остаются на месте
+    moved = [room for room in rooms if four.owner(room) != five.owner(room)]
+    assert all(five.owner(room) == 4 for room in moved)
+    assert 500 < len(moved) < 1200
+    assert HashRing(1).owner("anything") == 0
+
+
+def test_route_key_finds_the_room_of_a_request():
+    assert route_key("/ws/room1?username=a&user_id=b") == "room1"
+    assert route_key("/ws/my%20room") == "my room"
+    assert route_key("/qos/room2") == "room2"
+    assert route_key("/config?user_id=u&room_id=room3") == "room3"
+    assert route_key("/rooms/room4/messages") is None
+    assert route_key("/ws/") is None
+    assert route_key("/") is None
+
+
+def test_supervisor_sends_a_room_to_its_owner():
+    supervisor = Supervisor("127.0.0.1", 0, 3)
+    ring = HashRing(3)
+
+    for room in ("a", "b", "room 7"):
+        target = f"/ws/{room.replace(' ', '%20')}?username=x".encode()
+        assert supervisor.pick(b"GET " + target + b" HTTP/1.1").index == ring.owner(room)
+    # Запросы без комнаты — по кругу
+    assert {supervisor.pick(b"GET /config HTTP/1.1").index for _ in range(3)} == {0, 1, 2}
+
+
+def test_peek_request_line_leaves_data_in_socket():
+    async def run():
+        client, server = socket.socketpair()
+        server.setblocking(False)
+        client.sendall(b"GET /ws/r1 HT")
+        peek = asyncio.create_task(peek_request_line(server, timeout=2))
+        await asyncio.sleep(0.02)
+        client.sendall(b"TP/1.1\r\nHost: x\r\n\r\n")
+        line = await peek
+        data = server.recv(1024)
+        client.close()
+        closed = await peek_request_line(server, timeout=1)
+        server.close()
+        return line, data, closed
+
+    line, data, closed = asyncio.run(run())
+    assert line == b"GET /ws/r1 HTTP/1.1"
+    assert data.startswith(b"GET /ws/r1 HTTP/1.1\r\n")
+    assert closed is None
+
+
+def test_connection_waits_for_a_starting_worker():
+    async def run():
+        worker = Worker(0, 1)
+        client, server = socket.socketpair()
+        handed = asyncio.create_task(worker.hand_over(server))
+        await asyncio.sleep(0.05)
+        assert not handed.done()
+
+        # Воркер запустился: канал открыт, соединение уходит в него
+        parent, child = socket.socketpair(socket.AF_UNIX, socket.SOCK_SEQPACKET)
+        parent.setblocking(False)
+        worker.channel = parent
+        worker.ready.set()
+        await asyncio.wait_for(handed, 1)
+        _, fds, _, _ = socket.recv_fds(child, 16, 4)
+        passed = socket.socket(fileno=fds[0])
+        client.sendall(b"ping")
+        received = passed.recv(4)
+        for sock in (client, server, parent, child, passed):
+            sock.close()
+        return received
+
+    assert asyncio.run(run()) == b"ping"
+
+
+def test_worker_refuses_rooms_it_does_not_own(monkeypatch):
+    monkeypatch.setattr(sharding, "SHARD_COUNT", 2)
+    monkeypatch.setattr(sharding, "SHARD_INDEX", 0)
+    monkeypatch.setattr(sharding, "ring", HashRing(2))
+    foreign = next(f"room_{i}" for i in range(100) if sharding.ring.owner(f"room_{i}") == 1)
+
+    with TestClient(app) as client:
+        with pytest.raises(WebSocketDisconnect) as exc:
+            with client.websocket_connect(f"/ws/{foreign}?username=a&user_id=a") as ws:
+                ws.receive_json()
+    assert exc.value.code == 1008
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def test_supervisor_routes_rooms_to_worker_processes(tmp_path):
+    websockets = pytest.importorskip("websockets.asyncio.client")
+    env = {**os.environ, "PYTHONPATH": ROOT, "METRICS_PORT": "0", "SHARD_BASE_PORT": "0",
+           "LOG_CONFIG": str(tmp_path / "missing.yaml")}
+    # Отдельная база в рабочем каталоге процессов
+    subprocess.run([sys.executable, "-c", "import backend.db.models\n"
+                    "from backend.db.database import Base, engine\nBase.metadata.create_all(bind=engine)"],
+                   cwd=tmp_path, env=env, check=True)
+    port = _free_port()
+    proc = subprocess.Popen([sys.executable, "-m", "backend.supervisor", "--workers", "2", "--port", str(port),
+                             "--host", "127.0.0.1"], cwd=tmp_path, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    ring = HashRing(2)
+    rooms = [next(f"room_{i}" for i in range(100) if ring.owner(f"room_{i}") == worker) for worker in (0, 1)]
+
+    async def chat(room: str) -> str:
+        url = f"ws://127.0.0.1:{port}/ws/{room}"
+        # ID пользователя глобален в общей базе воркеров
+        async with websockets.connect(f"{url}?username=a&user_id={room}-a") as alice:
+            for _ in range(3):
+                await alice.recv()
+            async with websockets.connect(f"{url}?username=b&user_id={room}-b") as bob:
+                for _ in range(3):
+                    await bob.recv()
+                await alice.send(json.dumps({"type": "chat", "user_id": f"{room}-a", "message": f"hi {room}"}))
+                while True:
+                    message = json.loads(await bob.recv())
+                    if message["type"] == "chat":
+                        return message["message"]
+
+    async def run():
+        deadline = time.monotonic() + 30
+        while True:
+            try:
+                return await asyncio.wait_for(asyncio.gather(*(chat(room) for room in rooms)), 10)
+            except (OSError, asyncio.TimeoutError):
+                if time.monotonic() > deadline:
+                    raise
+                await asyncio.sleep(0.2)
+
+    try:
+        assert asyncio.run(run()) == [f"hi {room}" for room in rooms]
+    finally:
+        proc.terminate()
+        proc.wait(15)
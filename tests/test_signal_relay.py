@@ -0,0 +1,181 @@
+import asyncio
+import os
+import sys
+
+import pytest
+from fastapi.testclient import TestClient
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from backend.main import app
+from backend.ws import frames
+from backend.ws.signal_relay import CANDIDATE, OFFER, SignalRelay, peek_header
+from backend.ws_endpoint import signal_relay
+
+CANDIDATE_TEXT = '{"type":"voice-candidate","user_id":"a","target_id":"b","candidate":{"sdpMLineIndex":0}}'
+
+
+def test_peek_header_reads_only_canonical_signalling_frames():
+    assert peek_header(CANDIDATE_TEXT) == (CANDIDATE, "b")
+    assert peek_header('{"type":"voice-offer","target_id":"bob","sdp":"v=0 \\"target\\""}') == (OFFER, "bob")
+
+    for frame in (
+        '{"type":"chat","message":"{\\"type\\":\\"voice-offer\\",\\"target_id\\":\\"b\\"}"}',
+        '{"target_id":"b","type":"voice-offer"}',  # необычный порядок — обычный путь
+        '{"type":"voice-offer","sdp":"x"}',
+        '{"type":"voice-offer","target_id":"b","x":{"target_id":"c"}}',
+        '{"type":"voice-offerz","target_id":"b"}',
+        '{"type":"voice-offer","target_id":""}',
+        "",
+    ):
+        assert peek_header(frame) is None, frame
+
+
+def test_peek_header_rejects_spoofed_and_injected_frames():
+    for frame in (
+        # Второй "type": парсер получателя увидел бы kicked
+        '{"type":"voice-offer","target_id":"B","type":"kicked"}',
+        '{"type":"voice-candidate","target_id":"B","candidate":{}],"type":"chat","x":[{}}',
+        # Два объекта подряд, незакрытая строка, мусор после объекта
+        '{"type":"voice-offer","target_id":"B"}{"type":"kicked"}',
+        '{"type":"voice-offer","target_id":"B","sdp":"}',
+        '{"type":"voice-offer","target_id":"B"} }',
+        '{"type":"voice-offer","target_id":"B","sdp":x}',
+    ):
+        assert peek_header(frame) is None, frame
+
+    pytest.importorskip("msgpack")
+    offer = frames.encode_binary({"type": "voice-offer", "user_id": "a", "target_id": "b", "sdp": "v=0"})
+    kicked = frames.encode_binary({"type": "kicked"})
+    assert peek_header(offer + kicked) is None
+    assert peek_header(offer[:-1]) is None
+    # Лишние элементы массива после словаря полей
+    packer = frames.msgpack.Packer()
+    assert peek_header(packer.pack([14, "a", "b", {"sdp": "v=0"}, "kicked"])) is None
+    assert peek_header(packer.pack([14, "a", "b", "kicked"])) is None
+
+
+def test_peek_header_reads_binary_frames():
+    pytest.importorskip("msgpack")
+    offer = frames.encode_binary({"type": "voice-offer", "user_id": "a", "target_id": "b", "sdp": "v=0"})
+    assert peek_header(offer) == (OFFER, "b")
+    assert peek_header(frames.encode_binary({"type": "chat", "user_id": "a", "message": "hi"})) is None
+    assert peek_header(b"\xc1") is None
+
+
+def test_signal_frame_embeds_frames_in_the_batch():
+    second = CANDIDATE_TEXT.replace("0}", "1}")
+    batch = frames.signal_frame([CANDIDATE_TEXT, second], binary=False)
+
+    assert frames.decode(batch) == {"type": "voice-candidates",
+                                    "frames": [frames.decode(CANDIDATE_TEXT), frames.decode(second)]}
+    assert frames.signal_frame([CANDIDATE_TEXT], binary=False) is CANDIDATE_TEXT
+
+    pytest.importorskip("msgpack")
+    binary = frames.signal_frame([CANDIDATE_TEXT, frames.to_binary(second)], binary=True)
+    decoded = frames.decode_binary(binary)
+    assert decoded["type"] == "voice-candidates"
+    # Внутри пачки — кадры в позиционной форме протокола получателя
+    assert decoded["frames"] == [frames.msgpack.unpackb(frames.to_binary(f)) for f in (CANDIDATE_TEXT, second)]
+
+
+def test_relay_batches_candidates_and_keeps_order():
+    delivered = []
+
+    async def deliver(room_id, target_id, batch, kind):
+        delivered.append((target_id, kind, list(batch)))
+
+    async def run():
+        relay = SignalRelay(0.05, deliver)
+        for i in range(3):
+            await relay.submit("r", "a", CANDIDATE, "b", f"c{i}")
+        await relay.submit("r", "a", CANDIDATE, "c", "to-c")
+        # Предложение не ждёт окна, но отложенные кандидаты уходят раньше него
+        await relay.submit("r", "a", OFFER, "b", "offer")
+        await relay.submit("r", "a", CANDIDATE, "b", "c3")
+        await asyncio.sleep(0.1)
+        return relay
+
+    relay = asyncio.run(run())
+
+    assert delivered == [
+        ("b", CANDIDATE, ["c0", "c1", "c2"]),
+        ("b", OFFER, ["offer"]),
+        ("c", CANDIDATE, ["to-c"]),
+        ("b", CANDIDATE, ["c3"]),
+    ]
+    counters = relay.peer("r", "a")
+    assert (counters.offers, counters.candidates, counters.bytes) == (1, 5, len("c0c1c2to-cofferc3"))
+
+    relay.forget("r", "a")
+    assert ("r", "a") not in relay.peers
+
+
+def test_forged_frames_take_the_validated_path():
+    delivered = []
+
+    async def deliver(room_id, target_id, batch, kind):
+        delivered.append(batch)
+
+    async def run():
+        relay = SignalRelay(0, deliver)
+        return [
+            await relay.forward("r", "a", '{"type":"voice-offer","target_id":"b","type":"kicked"}'),
+            await relay.forward("r", "a", '{"type":"voice-candidate","target_id":"b","c":{}],"type":"chat","x":[{}}'),
+            await relay.forward("r", "a", CANDIDATE_TEXT),
+        ]
+
+    assert asyncio.run(run()) == [False, False, True]
+    assert delivered == [[CANDIDATE_TEXT]]
+
+
+def test_relay_without_window_forwards_each_frame():
+    delivered = []
+
+    async def deliver(room_id, target_id, batch, kind):
+        delivered.append(batch)
+
+    async def run():
+        relay = SignalRelay(0, deliver)
+        for i in range(3):
+            await relay.submit("r", "a", CANDIDATE, "b", f"c{i}")
+
+    asyncio.run(run())
+    assert delivered == [["c0"], ["c1"], ["c2"]]
+
+
+def test_signalling_frames_reach_target_unchanged():
+    room = "room_signal_relay"
+    # Формат, который повторное кодирование изменило бы: пробел, порядок полей, 1.50
+    offer = '{"type":"voice-offer","target_id":"bob","sdp":"v=0", "user_id":"alice","weight":1.50}'
+    with TestClient(app) as client:
+        with client.websocket_connect(f"/ws/{room}?username=alice&user_id=alice") as alice:
+            for _ in range(3):
+                alice.receive_json()
+            with client.websocket_connect(f"/ws/{room}?username=bob&user_id=bob") as bob:
+                for _ in range(3):
+                    bob.receive_json()
+                alice.receive_json()  # user_joined
+
+                alice.send_text(offer)
+                assert bob.receive_text() == offer
+
+                # Необычная форма идёт обычным путём и доходит перекодированной
+                alice.send_json({"target_id": "bob", "type": "voice-answer", "sdp": "v=0"})
+                answer = bob.receive_json()
+                assert answer == {"type": "voice-answer", "target_id": "bob", "sdp": "v=0"}
+
+                # Поддельный кадр с двумя "type" не доходит: его отбрасывает обычный путь
+                alice.send_text('{"type":"voice-offer","target_id":"bob","type":"kicked"}')
+
+                # Одиночный кандидат по окончании окна уходит исходным кадром
+                candidate = CANDIDATE_TEXT.replace('"b"', '"bob"')
+                alice.send_text(candidate)
+                assert bob.receive_text() == candidate
+
+                bob.send_text('{"type":"voice-answer","target_id":"alice","sdp":"v=0"}')
+                assert alice.receive_json()["type"] == "voice-answer"
+
+                counters = signal_relay.peer(room, "alice")
+                assert (counters.offers, counters.answers, counters.candidates) == (1, 1, 1)
+                assert counters.received == 1
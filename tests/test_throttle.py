@@ -0,0 +1,60 @@
+import asyncio
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from backend.ws.throttle import RateLimiter, SyncCoalescer, TokenBucket
+
+
+def test_token_bucket_allows_burst_then_refills():
+    bucket = TokenBucket(rate=2, burst=3)
+    bucket.updated_at = 0.0
+    assert [bucket.allow(now=0.0) for _ in range(4)] == [True, True, True, False]
+    assert bucket.allow(now=0.5)
+    assert not bucket.allow(now=0.5)
+
+
+def test_rate_limiter_is_per_user_and_category():
+    limiter = RateLimiter({"chat": (1, 2), "sync": (0, 0)})
+    assert limiter.allow("room", "alice", "chat")
+    assert limiter.allow("room", "alice", "chat")
+    assert not limiter.allow("room", "alice", "chat")
+    assert limiter.allow("room", "bob", "chat")
+    assert all(limiter.allow("room", "alice", "sync") for _ in range(100))
+
+    limiter.forget("room", "alice")
+    assert limiter.allow("room", "alice", "chat")
+
+
+def test_coalescer_forwards_first_and_latest_event_per_window():
+    forwarded = []
+
+    async def flush(room_id, event):
+        forwarded.append((room_id, event))
+
+    async def run():
+        coalescer = SyncCoalescer(0.05, flush)
+        for i in range(20):
+            await coalescer.submit("room", f"seek{i}")
+        await coalescer.submit("other", "play")
+        await asyncio.sleep(0.12)
+        await coalescer.submit("room", "pause")
+        await asyncio.sleep(0.01)
+
+    asyncio.run(run())
+    assert forwarded == [("room", "seek0"), ("other", "play"), ("room", "seek19"), ("room", "pause")]
+
+
+def test_coalescer_without_window_forwards_everything():
+    forwarded = []
+
+    async def flush(room_id, event):
+        forwarded.append(event)
+
+    async def run():
+        coalescer = SyncCoalescer(0, flush)
+        for event in ("seek", "seek", "play"):
+            await coalescer.submit("room", event)
+
+    asyncio.run(run())
+    assert forwarded == ["seek", "seek", "play"]
@@ -14,7 +14,8 @@ from contextlib import contextmanager
 def _connect(client: TestClient, room: str, username: str, user_id: str):
     with client.websocket_connect(f"/ws/{room}?username={username}&user_id={user_id}") as ws:
         ws.receive_json()  # joined
-        ws.receive_json()  # users update
+        ws.receive_json()  # users snapshot
+        ws.receive_json()  # history
         yield ws
 
 
@@ -23,7 +24,7 @@ def test_set_permissions_authorized():
     with TestClient(app) as client:
         with _connect(client, room, "admin", "admin") as admin_ws:
             with _connect(client, room, "guest", "guest") as guest_ws:
-                admin_ws.receive_json()  # users update after guest joins
+                admin_ws.receive_json()  # user_joined
 
                 admin_ws.send_json({
                     "type": "set_permissions",
@@ -32,8 +33,8 @@ def test_set_permissions_authorized():
                     "permissions": {"kick": True},
                 })
 
-                admin_ws.receive_json()  # users update broadcast
-                guest_ws.receive_json()  # users update broadcast
+                admin_ws.receive_json()  # user_updated
+                guest_ws.receive_json()  # user_updated
 
                 participant = manager.get_participant(room, "guest")
                 assert participant.permissions.get("kick") is True